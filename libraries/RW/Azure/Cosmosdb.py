@@ -2,15 +2,212 @@
 Azure Cosmos DB Python library for Robot Framework.
 
 This library provides keywords for executing SQL queries against Azure Cosmos DB using the Python SDK.
+
+Clients, credentials and keys retrieved from the management API are cached
+process-wide, so repeated connects to the same account (e.g. an SLI running
+every minute) reuse the TLS connection pool and the credential's token cache
+instead of repeating AAD token acquisition and ``list_keys``.
+
+Query results can optionally be cached as well (``result_cache_ttl_seconds``),
+so an SLI and a runbook issuing the same query seconds apart in one process
+pay for it once.
 """
 
 from azure.cosmos import CosmosClient, exceptions
 from azure.identity import DefaultAzureCredential, EnvironmentCredential, ChainedTokenCredential, AzureCliCredential
 from azure.mgmt.cosmosdb import CosmosDBManagementClient
-from typing import Optional
+from collections import OrderedDict
+from typing import Callable, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait
+import hashlib
 import json
 import os
 import re
+import threading
+import time
+
+DEFAULT_KEY_CACHE_TTL_SECONDS = 900
+DEFAULT_QUERY_WORKERS = 8
+DEFAULT_RESULT_CACHE_MAX_BYTES = 32 * 1024 * 1024
+DEFAULT_SAMPLE_SIZE = 50
+
+# Process-wide caches shared by every Cosmosdb instance
+_cache_lock = threading.Lock()
+_client_cache: dict = {}      # (endpoint, auth mode, secret fingerprint) -> CosmosClient
+_credential_cache: dict = {}  # (auth mode, AZURE_TENANT_ID, AZURE_CLIENT_ID) -> credential
+_key_cache: dict = {}         # (subscription, resource group, account) -> (key, expires at)
+
+
+# COUNT( or COUNT ( with optional whitespace, case-insensitive; a regex avoids substring matches
+_COUNT_PATTERN = re.compile(r'\bCOUNT\s*\(', re.IGNORECASE)
+# String literals, kept verbatim, or runs of whitespace outside them
+_QUERY_WHITESPACE_PATTERN = re.compile(r'(\'(?:[^\'\\]|\\.)*\'|"(?:[^"\\]|\\.)*")|\s+')
+# Plain "SELECT <projection> FROM <source>" queries that can be counted server-side
+_SELECT_FROM_PATTERN = re.compile(r'^\s*SELECT\s+(?P<projection>.+?)\s+FROM\s+(?P<source>.+)$', re.IGNORECASE | re.DOTALL)
+# Clauses that change the row count, or that this simple rewrite cannot reason about
+_NOT_COUNTABLE_PATTERN = re.compile(
+    r'\b(?:SELECT|JOIN|DISTINCT|TOP|OFFSET|LIMIT|GROUP\s+BY|VALUE|COUNT|SUM|MIN|MAX|AVG)\b', re.IGNORECASE
+)
+# A trailing ORDER BY (without literals or calls) does not affect the count
+_TRAILING_ORDER_BY_PATTERN = re.compile(r'\s+ORDER\s+BY\s+[^\'"()]+$', re.IGNORECASE)
+
+
+def _server_side_count_query(query: str) -> Optional[str]:
+    """Rewrite ``SELECT ... FROM c WHERE ...`` to ``SELECT VALUE COUNT(1) FROM c WHERE ...``.
+
+    Returns None when the query is not a plain select whose row count the
+    rewrite is known to preserve.
+    """
+    match = _SELECT_FROM_PATTERN.match(query.strip())
+    if not match or _NOT_COUNTABLE_PATTERN.search(query, match.start("projection")):
+        return None
+    source = _TRAILING_ORDER_BY_PATTERN.sub("", match.group("source").rstrip())
+    return f"SELECT VALUE COUNT(1) FROM {source}"
+
+
+class _QueryMetrics:
+    """Request charge, paging and timing figures of one query, collected through the SDK's response_hook."""
+
+    def __init__(self, database_name: str, container_name: str, query: str):
+        self.database_name = database_name
+        self.container_name = container_name
+        self.query = query
+        self.request_charge = 0.0
+        self.pages = 0
+        self.response_bytes = 0
+        self.server_duration_ms = 0.0
+        self.cached = False
+        self._started = time.monotonic()
+
+    def on_response(self, headers, *_):
+        self.pages += 1
+        self.request_charge += float(headers.get("x-ms-request-charge") or 0)
+        self.server_duration_ms += float(headers.get("x-ms-request-duration-ms") or 0)
+        self.response_bytes += int(headers.get("Content-Length") or 0)
+
+    def finish(self, items: int) -> dict:
+        return {
+            "database": self.database_name,
+            "container": self.container_name,
+            "query": self.query,
+            "request_charge": round(self.request_charge, 2),
+            "pages": self.pages,
+            "items": items,
+            "bytes": self.response_bytes,
+            "server_duration_ms": round(self.server_duration_ms, 2),
+            "wall_time_ms": round((time.monotonic() - self._started) * 1000, 1),
+            "cached": self.cached,
+        }
+
+
+def _normalize_query(query: str) -> str:
+    """Collapse whitespace outside string literals so reformatted queries share a cache entry."""
+    return _QUERY_WHITESPACE_PATTERN.sub(lambda m: m.group(1) or " ", query).strip()
+
+
+class _ResultCache:
+    """LRU cache of query results bounded by their total size, with entries expiring after a TTL."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> (value, size, stored at)
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: Tuple, ttl_seconds: float):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, _, stored_at = entry
+            if time.monotonic() - stored_at > ttl_seconds:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def put(self, key: Tuple, value, size: int) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (value, size, time.monotonic())
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def _remove(self, key: Tuple) -> None:
+        _, size, _ = self._entries.pop(key)
+        self._bytes -= size
+
+
+_result_cache = _ResultCache(DEFAULT_RESULT_CACHE_MAX_BYTES)
+
+
+def _fingerprint(secret: str) -> str:
+    return hashlib.sha256(secret.encode()).hexdigest()
+
+
+def _identity() -> Tuple:
+    """Return the identity the environment signs in as, with the client secret hashed.
+
+    It is part of every credential, client and retrieved-key cache key, so a
+    connection made as one service principal is never reused by another.
+    """
+    secret = os.environ.get("AZURE_CLIENT_SECRET")
+    return (
+        os.environ.get("AZURE_TENANT_ID"), os.environ.get("AZURE_CLIENT_ID"),
+        _fingerprint(secret) if secret else None, os.environ.get("AZURE_CLIENT_CERTIFICATE_PATH"),
+    )
+
+
+def _cached_credential(cache_key: Tuple, factory: Callable):
+    """Return the credential for this auth mode and identity, creating it once.
+
+    Reusing the credential object reuses its token cache, which refreshes
+    tokens itself shortly before they expire.
+    """
+    with _cache_lock:
+        credential = _credential_cache.get(cache_key)
+        if credential is None:
+            credential = _credential_cache[cache_key] = factory()
+        return credential
+
+
+def _cached_client(cache_key: Tuple, factory: Callable, use_cache: bool = True) -> CosmosClient:
+    if not use_cache:
+        return factory()
+    with _cache_lock:
+        client = _client_cache.get(cache_key)
+    if client is None:
+        # Build outside the lock: CosmosClient() makes a network round trip
+        client = factory()
+        with _cache_lock:
+            client = _client_cache.setdefault(cache_key, client)
+    return client
+
+
+def _get_cached_key(key_id: Tuple) -> Optional[str]:
+    with _cache_lock:
+        entry = _key_cache.get(key_id)
+        if entry is None:
+            return None
+        key, expires_at = entry
+        if time.monotonic() >= expires_at:
+            del _key_cache[key_id]
+            return None
+        return key
+
+
+def _store_key(key_id: Tuple, key: str, ttl_seconds: float) -> None:
+    with _cache_lock:
+        _key_cache[key_id] = (key, time.monotonic() + ttl_seconds)
 
 
 class Cosmosdb:
@@ -24,17 +221,128 @@ class Cosmosdb:
     ROBOT_LIBRARY_SCOPE = "GLOBAL"
     ROBOT_LIBRARY_VERSION = "1.0.0"
 
-    def __init__(self):
+    def __init__(
+        self, key_cache_ttl_seconds: int = DEFAULT_KEY_CACHE_TTL_SECONDS, result_cache_ttl_seconds: int = 0,
+        result_cache_max_bytes: Optional[int] = None
+    ):
         self.client: Optional[CosmosClient] = None
         self.endpoint: Optional[str] = None
+        self.key_cache_ttl_seconds = int(key_cache_ttl_seconds)
+        # Results are cached only when a TTL is set, in the cache shared by all instances
+        # unless this one is given its own size ceiling
+        self.result_cache_ttl_seconds = int(result_cache_ttl_seconds)
+        self._result_cache = _result_cache if result_cache_max_bytes is None \
+            else _ResultCache(int(result_cache_max_bytes))
+        # Endpoint, auth mode and identity of the current connection
+        self._connection_id: Optional[Tuple] = None
+        # Cache entries behind the current connection, dropped on an auth failure
+        self._client_cache_key: Optional[Tuple] = None
+        self._credential_key: Optional[Tuple] = None
+        self._key_id: Optional[Tuple] = None
+        self._reconnect: Optional[Callable] = None
+        # Serializes connection changes; reentrant because a reconnect goes through _use_client
+        self._connection_lock = threading.RLock()
+        self.last_query_metrics: Optional[dict] = None
+
+    def _use_client(self, endpoint: str, cache_key: Tuple, factory: Callable, use_cache: bool,
+                    key_id: Optional[Tuple] = None, reconnect: Optional[Callable] = None,
+                    credential_key: Optional[Tuple] = None) -> None:
+        with self._connection_lock:
+            self.endpoint = endpoint
+            self.client = _cached_client(cache_key, factory, use_cache)
+            self._connection_id = cache_key
+            self._client_cache_key = cache_key if use_cache else None
+            self._credential_key = credential_key if use_cache else None
+            self._key_id = key_id
+            self._reconnect = reconnect
 
-    def connect_to_cosmosdb(self, endpoint: str, key: Optional[str] = None) -> str:
+    def _invalidate_connection(self) -> bool:
+        """Drop cached entries behind the current connection after an auth failure.
+
+        Returns True if the connection was re-established (a retrieved key is
+        fetched again), so the caller can retry once.
+        """
+        with _cache_lock:
+            if self._client_cache_key is not None:
+                _client_cache.pop(self._client_cache_key, None)
+            if self._credential_key is not None:
+                _credential_cache.pop(self._credential_key, None)
+            if self._key_id is not None:
+                _key_cache.pop(self._key_id, None)
+        if self._reconnect is None:
+            return False
+        self._reconnect()
+        return True
+
+    def _with_auth_retry(self, operation: Callable):
+        """Run ``operation``; on 401/403 invalidate the cached connection and retry once if possible.
+
+        Safe to call from several threads: the first one to see the failure
+        reconnects, the others retry on the connection it made.
+        """
+        client = self.client
+        try:
+            return operation()
+        except exceptions.CosmosHttpResponseError as e:
+            if e.status_code not in (401, 403):
+                raise
+            with self._connection_lock:
+                if self.client is client and not self._invalidate_connection():
+                    raise
+            return operation()
+
+    def clear_cosmosdb_connection_cache(self) -> None:
+        """
+        Drop all cached Cosmos DB clients, credentials and retrieved keys in this process.
+        
+        Example:
+            | Clear Cosmosdb Connection Cache |
+        """
+        with _cache_lock:
+            _client_cache.clear()
+            _credential_cache.clear()
+            _key_cache.clear()
+
+    def clear_cosmosdb_result_cache(self) -> None:
+        """
+        Drop the query results cached in this process, and in this instance's
+        own cache if it was given a ``result_cache_max_bytes``.
+        
+        Example:
+            | Clear Cosmosdb Result Cache |
+        """
+        _result_cache.clear()
+        self._result_cache.clear()
+
+    def _result_cache_key(self, kind: Tuple, database_name: str, container_name: str, query: str,
+                          parameters) -> Optional[Tuple]:
+        """Return the result cache key for a call, or None when results are not cached."""
+        if self.result_cache_ttl_seconds <= 0:
+            return None
+        if parameters and isinstance(parameters, str):
+            parameters = json.loads(parameters)
+        # The connection id holds the identity (or key fingerprint), so principals never share results
+        return (
+            kind, self._connection_id, database_name, container_name, _normalize_query(query),
+            json.dumps(parameters or None, sort_keys=True, default=str),
+        )
+
+    def _cached_result(self, cache_key: Optional[Tuple], metrics: _QueryMetrics):
+        if cache_key is None:
+            return None
+        value = self._result_cache.get(cache_key, self.result_cache_ttl_seconds)
+        if value is not None:
+            metrics.cached = True
+        return value
+
+    def connect_to_cosmosdb(self, endpoint: str, key: Optional[str] = None, use_cache: bool = True) -> str:
         """
         Connect to an Azure Cosmos DB account using key-based authentication.
         
         Args:
             endpoint: The Cosmos DB account endpoint URL
             key: The Cosmos DB account key (optional if using Azure AD)
+            use_cache: Reuse a cached client for this endpoint and key (default: True)
             
         Returns:
             Success message
@@ -43,20 +351,29 @@ class Cosmosdb:
             | Connect To Cosmosdb | https://myaccount.documents.azure.com:443/ | mykey |
         """
         try:
-            self.endpoint = endpoint
             if key and key.strip():
                 # Key-based authentication
-                self.client = CosmosClient(self.endpoint, key)
+                self._use_client(
+                    endpoint, (endpoint, "key", _fingerprint(key)),
+                    lambda: CosmosClient(endpoint, key), use_cache
+                )
                 return f"Successfully connected to Cosmos DB account at {endpoint} using key authentication"
             else:
                 # Azure AD authentication (service principal, managed identity, etc.)
-                credential = DefaultAzureCredential()
-                self.client = CosmosClient(self.endpoint, credential)
+                identity = _identity()
+                credential_key = ("default",) + identity
+                credential = _cached_credential(credential_key, DefaultAzureCredential) if use_cache \
+                    else DefaultAzureCredential()
+                self._use_client(
+                    endpoint, (endpoint, "default", identity),
+                    lambda: CosmosClient(endpoint, credential), use_cache,
+                    credential_key=credential_key,
+                )
                 return f"Successfully connected to Cosmos DB account at {endpoint} using Azure AD authentication"
         except Exception as e:
             raise Exception(f"Failed to connect to Cosmos DB: {str(e)}")
 
-    def connect_to_cosmosdb_with_azure_credentials(self, endpoint: str) -> str:
+    def connect_to_cosmosdb_with_azure_credentials(self, endpoint: str, use_cache: bool = True) -> str:
         """
         Connect to an Azure Cosmos DB account using Azure AD authentication.
         Prioritizes service principal credentials from environment variables (AZURE_CLIENT_ID, AZURE_TENANT_ID, AZURE_CLIENT_SECRET)
@@ -67,6 +384,7 @@ class Cosmosdb:
         
         Args:
             endpoint: The Cosmos DB account endpoint URL
+            use_cache: Reuse a cached credential and client for this endpoint (default: True)
             
         Returns:
             Success message
@@ -75,21 +393,29 @@ class Cosmosdb:
             | Connect To Cosmosdb With Azure Credentials | https://myaccount.documents.azure.com:443/ |
         """
         try:
-            self.endpoint = endpoint
             # Use ChainedTokenCredential to prioritize EnvironmentCredential (service principal)
             # over Azure CLI credential. This prevents managed identity from being used when
             # service principal credentials are available in environment variables.
-            credential = ChainedTokenCredential(
-                EnvironmentCredential(),
-                AzureCliCredential()
+            identity = _identity()
+            credential = self._service_principal_credential(identity, use_cache)
+            self._use_client(
+                endpoint, (endpoint, "service_principal", identity),
+                lambda: CosmosClient(endpoint, credential), use_cache,
+                credential_key=("service_principal",) + identity,
             )
-            self.client = CosmosClient(self.endpoint, credential)
             return f"Successfully connected to Cosmos DB account at {endpoint} using Azure AD authentication"
         except Exception as e:
             raise Exception(f"Failed to connect to Cosmos DB with Azure credentials: {str(e)}")
     
+    @staticmethod
+    def _service_principal_credential(identity: Tuple, use_cache: bool = True):
+        def factory():
+            return ChainedTokenCredential(EnvironmentCredential(), AzureCliCredential())
+        return _cached_credential(("service_principal",) + identity, factory) if use_cache else factory()
+
     def connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(
-        self, endpoint: str, subscription_id: str, resource_group: str, account_name: str
+        self, endpoint: str, subscription_id: str, resource_group: str, account_name: str,
+        use_cache: bool = True
     ) -> str:
         """
         Connect to Cosmos DB by using service principal to retrieve the account key from Azure,
@@ -101,11 +427,17 @@ class Cosmosdb:
         - Service principal with Microsoft.DocumentDB/databaseAccounts/listKeys/action permission
           (e.g., "Cosmos DB Account Reader" or "Contributor" role)
         
+        The retrieved key is cached for ``key_cache_ttl_seconds`` (a library
+        argument, 900 by default). If a query is later rejected with 401/403,
+        for example because the key was rotated, the cached key and client are
+        dropped, a fresh key is retrieved and the query is retried once.
+        
         Args:
             endpoint: The Cosmos DB account endpoint URL
             subscription_id: Azure subscription ID
             resource_group: Resource group name
             account_name: Cosmos DB account name
+            use_cache: Reuse a cached key, credential and client (default: True)
             
         Returns:
             Success message
@@ -116,35 +448,101 @@ class Cosmosdb:
             | ... | sub-id | my-rg | my-cosmosdb-account |
         """
         try:
-            self.endpoint = endpoint
             # Use ChainedTokenCredential to prioritize EnvironmentCredential (service principal)
             # over Azure CLI credential. This prevents managed identity from being used.
-            credential = ChainedTokenCredential(
-                EnvironmentCredential(),
-                AzureCliCredential()
-            )
+            identity = _identity()
+            credential = self._service_principal_credential(identity, use_cache)
             
-            # Use Azure Management API to retrieve the key
-            cosmos_mgmt_client = CosmosDBManagementClient(credential, subscription_id)
-            keys = cosmos_mgmt_client.database_accounts.list_keys(resource_group, account_name)
+            # The identity is part of the key id: another principal must list the keys itself
+            key_id = (subscription_id, resource_group, account_name) + identity
+            key = _get_cached_key(key_id) if use_cache else None
+            if key is None:
+                # Use Azure Management API to retrieve the key
+                cosmos_mgmt_client = CosmosDBManagementClient(credential, subscription_id)
+                keys = cosmos_mgmt_client.database_accounts.list_keys(resource_group, account_name)
+                key = keys.primary_master_key
+                if use_cache:
+                    _store_key(key_id, key, self.key_cache_ttl_seconds)
             
             # Connect using the retrieved key
-            self.client = CosmosClient(self.endpoint, keys.primary_master_key)
+            self._use_client(
+                endpoint, (endpoint, "retrieved_key", _fingerprint(key)),
+                lambda: CosmosClient(endpoint, key), use_cache,
+                key_id=key_id if use_cache else None,
+                credential_key=("service_principal",) + identity,
+                reconnect=lambda: self.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(
+                    endpoint, subscription_id, resource_group, account_name, use_cache
+                ),
+            )
             return f"Successfully connected to Cosmos DB account at {endpoint} using key retrieved via Azure AD (control plane)"
         except Exception as e:
             raise Exception(f"Failed to retrieve Cosmos DB key using Azure credentials: {str(e)}")
 
+    def _get_container(self, database_name: str, container_name: str):
+        database = self.client.get_database_client(database_name)
+        return database.get_container_client(container_name)
+
+    def _query_items(
+        self, database_name: str, container_name: str, query: str, query_params: Optional[list],
+        metrics: Optional[_QueryMetrics] = None, **options
+    ):
+        if metrics is not None:
+            options["response_hook"] = metrics.on_response
+        return self._get_container(database_name, container_name).query_items(
+            query=query,
+            parameters=query_params,
+            enable_cross_partition_query=True,
+            **options
+        )
+
+    def get_last_query_metrics(self) -> Optional[dict]:
+        """
+        Return the metrics of the last Query Container, Query Container Paged or Count Query Results call.
+        
+        The dictionary holds ``request_charge`` (RU, summed over all responses),
+        ``pages`` (responses received), ``items``, ``bytes`` (response bodies,
+        as reported by Content-Length), ``server_duration_ms`` (summed
+        x-ms-request-duration-ms), ``wall_time_ms`` (client-side, including
+        retries), ``cached`` (answered from the result cache) and the
+        ``database``, ``container`` and ``query``. It is None if the last call
+        failed.
+        
+        Returns:
+            Dictionary of query metrics, or None
+            
+        Example:
+            | ${metrics}= | Get Last Query Metrics |
+            | RW.Core.Push Metric | ${metrics}[request_charge] | sub_name=request_charge |
+        """
+        return self.last_query_metrics
+
+    @staticmethod
+    def _query_params(parameters) -> Optional[list]:
+        """Convert query parameters (a JSON object string or a dict) to the SDK's name/value list."""
+        query_params = []
+        if parameters:
+            params_dict = json.loads(parameters) if isinstance(parameters, str) else parameters
+            for key, value in params_dict.items():
+                query_params.append({"name": key, "value": value})
+        return query_params if query_params else None
+
     def query_container(
-        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None
+        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None,
+        use_result_cache: bool = True
     ) -> str:
         """
         Execute a SQL query on a Cosmos DB container.
         
+        When the library is imported with ``result_cache_ttl_seconds``, the
+        same query with the same parameters against the same container is
+        answered from the cache within that TTL.
+        
         Args:
             database_name: Name of the database
             container_name: Name of the container
             query: SQL query string
             parameters: Optional JSON string of query parameters (e.g., '{"@status": "error"}')
+            use_result_cache: Use the result cache if it is enabled (default: True)
             
         Returns:
             JSON string containing query results
@@ -152,26 +550,153 @@ class Cosmosdb:
         Example:
             | ${results}= | Query Container | mydb | mycontainer | SELECT * FROM c WHERE c.status = 'error' |
             | ${results}= | Query Container | mydb | mycontainer | SELECT * FROM c WHERE c.id = @id | {"@id": "123"} |
+            | ${results}= | Query Container | mydb | mycontainer | SELECT * FROM c | use_result_cache=False |
         """
         if not self.client:
             raise Exception("Not connected to Cosmos DB. Call 'Connect To Cosmosdb' first.")
         
+        self.last_query_metrics = None
+        metrics = _QueryMetrics(database_name, container_name, query)
         try:
-            database = self.client.get_database_client(database_name)
-            container = database.get_container_client(container_name)
+            cache_key = self._result_cache_key(
+                ("items",), database_name, container_name, query, parameters
+            ) if use_result_cache else None
+            cached = self._cached_result(cache_key, metrics)
+            if cached is not None:
+                results, item_count = cached
+                self.last_query_metrics = metrics.finish(item_count)
+                return results
             
-            query_params = []
-            if parameters:
-                params_dict = json.loads(parameters)
-                for key, value in params_dict.items():
-                    query_params.append({"name": key, "value": value})
+            query_params = self._query_params(parameters)
+            items = self._with_auth_retry(lambda: list(
+                self._query_items(database_name, container_name, query, query_params, metrics)
+            ))
+            self.last_query_metrics = metrics.finish(len(items))
+            results = json.dumps(items, indent=2, default=str)
+            if cache_key is not None:
+                self._result_cache.put(cache_key, (results, len(items)), len(results))
+            return results
+        except exceptions.CosmosResourceNotFoundError as e:
+            raise Exception(f"Resource not found: {str(e)}")
+        except exceptions.CosmosHttpResponseError as e:
+            raise Exception(f"Cosmos DB query error: {str(e)}")
+        except Exception as e:
+            raise Exception(f"Failed to query container: {str(e)}")
+
+    def _read_pages(
+        self, database_name: str, container_name: str, query: str, query_params: Optional[list],
+        max_item_count: Optional[int], max_items: Optional[int], max_bytes: Optional[int],
+        continuation_token: Optional[str], output_file: Optional[str], timeout: Optional[float] = None,
+        metrics: Optional[_QueryMetrics] = None
+    ) -> dict:
+        # The SDK applies ``timeout`` to each request; the deadline bounds the whole read
+        request_options = {"timeout": timeout} if timeout else {}
+        deadline = time.monotonic() + timeout if timeout else None
+        pager = self._query_items(
+            database_name, container_name, query, query_params, metrics,
+            max_item_count=max_item_count, **request_options
+        ).by_page(continuation_token)
+        items = [] if output_file is None else None
+        count = total_bytes = pages = 0
+        truncated = False
+        # Token from which the current page can be fetched again
+        resume_token = continuation_token
+        out = open(output_file, "w", encoding="utf-8") if output_file else None
+        try:
+            for page in pager:
+                pages += 1
+                if deadline and time.monotonic() > deadline:
+                    raise TimeoutError(f"Query exceeded {timeout}s after {pages - 1} pages")
+                for item in page:
+                    line = json.dumps(item, separators=(",", ":"), default=str) if out or max_bytes else None
+                    if (max_items and count >= max_items) or \
+                            (max_bytes and total_bytes + len(line) + 1 > max_bytes):
+                        truncated = True
+                        break
+                    if out:
+                        out.write(line + "\n")
+                    else:
+                        items.append(item)
+                    count += 1
+                    if line is not None:
+                        total_bytes += len(line) + 1
+                if truncated:
+                    break
+                resume_token = pager.continuation_token
+                if resume_token and max_items and count >= max_items:
+                    truncated = True
+                    break
+        finally:
+            if out:
+                out.close()
+
+        result = {
+            "count": count,
+            "pages": pages,
+            "bytes": total_bytes,
+            "truncated": truncated,
+            "continuation_token": resume_token if truncated else None,
+        }
+        if out:
+            result["output_file"] = output_file
+        else:
+            result["items"] = items
+        return result
+
+    def query_container_paged(
+        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None,
+        max_item_count: Optional[int] = None, max_items: Optional[int] = None, max_bytes: Optional[int] = None,
+        continuation_token: Optional[str] = None, output_file: Optional[str] = None
+    ) -> dict:
+        """
+        Execute a SQL query page by page and return the results as native data.
+        
+        Unlike ``Query Container`` no indented JSON string is built, so callers
+        do not need to parse the results again. With ``output_file`` the items
+        are written as compact NDJSON (one document per line) instead of being
+        kept in memory.
+        
+        Reading stops once ``max_items`` documents or ``max_bytes`` of compact
+        JSON were collected. The result then has ``truncated`` set and a
+        ``continuation_token`` to pass back in for the rest. When the budget ran
+        out in the middle of a page, the token points at that page, so the next
+        call may repeat up to one page of documents.
+        
+        Args:
+            database_name: Name of the database
+            container_name: Name of the container
+            query: SQL query string
+            parameters: Optional JSON string of query parameters (e.g., '{"@status": "error"}')
+            max_item_count: Documents requested per page (default: service default)
+            max_items: Stop after this many documents (default: no limit)
+            max_bytes: Stop after this many bytes of compact JSON (default: no limit)
+            continuation_token: Token from a previous truncated call to resume from
+            output_file: Write NDJSON to this path instead of returning the items
             
-            items = list(container.query_items(
-                query=query, 
-                parameters=query_params if query_params else None,
-                enable_cross_partition_query=True
+        Returns:
+            Dictionary with ``items`` (or ``output_file``), ``count``, ``pages``,
+            ``bytes`` (only measured with ``max_bytes`` or ``output_file``),
+            ``truncated`` and ``continuation_token``
+            
+        Example:
+            | ${page}= | Query Container Paged | mydb | mycontainer | SELECT * FROM c | max_items=500 |
+            | ${next}= | Query Container Paged | mydb | mycontainer | SELECT * FROM c | max_items=500 | continuation_token=${page}[continuation_token] |
+            | ${page}= | Query Container Paged | mydb | mycontainer | SELECT * FROM c | output_file=${OUTPUT_DIR}/results.jsonl |
+        """
+        if not self.client:
+            raise Exception("Not connected to Cosmos DB. Call 'Connect To Cosmosdb' first.")
+        
+        self.last_query_metrics = None
+        metrics = _QueryMetrics(database_name, container_name, query)
+        try:
+            query_params = self._query_params(parameters)
+            result = self._with_auth_retry(lambda: self._read_pages(
+                database_name, container_name, query, query_params,
+                max_item_count, max_items, max_bytes, continuation_token or None, output_file or None,
+                metrics=metrics
             ))
-            return json.dumps(items, indent=2, default=str)
+            self.last_query_metrics = metrics.finish(result["count"])
+            return result
         except exceptions.CosmosResourceNotFoundError as e:
             raise Exception(f"Resource not found: {str(e)}")
         except exceptions.CosmosHttpResponseError as e:
@@ -179,17 +704,214 @@ class Cosmosdb:
         except Exception as e:
             raise Exception(f"Failed to query container: {str(e)}")
 
+    @staticmethod
+    def _parse_query_spec(spec) -> dict:
+        if isinstance(spec, dict):
+            spec = dict(spec)
+        else:
+            spec = dict(zip(("database", "container", "query", "parameters"), spec))
+        missing = [field for field in ("database", "container", "query") if not spec.get(field)]
+        if missing:
+            raise ValueError(f"Query spec {spec} is missing {', '.join(missing)}")
+        return spec
+
+    @staticmethod
+    def _spec_result(spec: dict, **fields) -> dict:
+        result = {
+            "database": spec["database"],
+            "container": spec["container"],
+            "query": spec["query"],
+            "items": None,
+            "count": None,
+            "truncated": False,
+            "latency_ms": None,
+            "metrics": None,
+            "error": None,
+        }
+        result.update(fields)
+        return result
+
+    def _run_query_spec(self, spec: dict, max_items: Optional[int], query_timeout: Optional[float]) -> dict:
+        started = time.monotonic()
+        result = self._spec_result(spec)
+        metrics = _QueryMetrics(spec["database"], spec["container"], spec["query"])
+        try:
+            query_params = self._query_params(spec.get("parameters"))
+            page = self._with_auth_retry(lambda: self._read_pages(
+                spec["database"], spec["container"], spec["query"], query_params,
+                None, max_items, None, None, None, timeout=query_timeout, metrics=metrics
+            ))
+            result["items"] = page["items"]
+            result["truncated"] = page["truncated"]
+            result["count"] = self._extract_count(spec["query"], page["items"])
+            result["metrics"] = metrics.finish(page["count"])
+        except Exception as e:
+            result["error"] = str(e)
+        result["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return result
+
+    def query_containers_concurrently(
+        self, specs, max_workers: int = DEFAULT_QUERY_WORKERS, timeout: Optional[float] = None,
+        query_timeout: Optional[float] = None, max_items: Optional[int] = None
+    ) -> list:
+        """
+        Run several queries, possibly against different databases and containers, concurrently.
+        
+        The queries share the current connection and its connection pool and
+        run on a pool of at most ``max_workers`` threads. A failing query does
+        not stop the others; its error is reported in its result instead.
+        
+        Queries still running when ``timeout`` expires are reported as timed
+        out and left to finish in the background, since a running query
+        cannot be interrupted. Their results are discarded. ``query_timeout``
+        defaults to ``timeout``, so those threads stop within one more
+        ``timeout`` instead of running as long as the query does.
+        
+        Each spec is a dictionary with ``database``, ``container``, ``query``
+        and optional ``parameters`` (a dictionary or a JSON object string), or a
+        list in that order. ``specs`` may also be given as a JSON string.
+        
+        Args:
+            specs: List of query specs, or a JSON string of one
+            max_workers: Maximum number of queries in flight (default: 8)
+            timeout: Seconds to wait for all queries; unfinished ones are reported as timed out
+            query_timeout: Seconds allowed for each query (default: timeout)
+            max_items: Keep at most this many documents per query
+            
+        Returns:
+            List of dictionaries in spec order with ``database``, ``container``,
+            ``query``, ``items``, ``count``, ``truncated``, ``latency_ms``, ``metrics``
+            (see Get Last Query Metrics) and ``error``
+            
+        Example:
+            | ${specs}= | Evaluate | [{"database": "db", "container": "orders", "query": "SELECT VALUE COUNT(1) FROM c WHERE c.status = 'error'"}, {"database": "db", "container": "events", "query": "SELECT * FROM c WHERE c.level = @level", "parameters": {"@level": "error"}}] |
+            | ${results}= | Query Containers Concurrently | ${specs} | timeout=60 | query_timeout=20 |
+        """
+        if not self.client:
+            raise Exception("Not connected to Cosmos DB. Call 'Connect To Cosmosdb' first.")
+        
+        if isinstance(specs, str):
+            specs = json.loads(specs)
+        specs = [self._parse_query_spec(spec) for spec in specs]
+        if not specs:
+            return []
+        if query_timeout is None:
+            # Bounds how long queries abandoned at the overall timeout keep a thread busy
+            query_timeout = timeout
+        
+        executor = ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), len(specs))))
+        try:
+            futures = [executor.submit(self._run_query_spec, spec, max_items, query_timeout) for spec in specs]
+            wait(futures, timeout=timeout)
+        finally:
+            # Do not wait for queries still running past the overall timeout
+            executor.shutdown(wait=False, cancel_futures=True)
+        
+        results = []
+        for spec, future in zip(specs, futures):
+            if future.done() and not future.cancelled():
+                results.append(future.result())
+            else:
+                results.append(self._spec_result(spec, error=f"Timed out after {timeout}s"))
+        return results
+
+    @staticmethod
+    def _is_count_query(query: str) -> bool:
+        return bool(_COUNT_PATTERN.search(query))
+
+    @classmethod
+    def _extract_count(cls, query: str, items: list) -> int:
+        """Return the COUNT value of an aggregate query's results, or the number of rows otherwise."""
+        if not cls._is_count_query(query):
+            return len(items)
+        if items and len(items) > 0:
+            first_item = items[0]
+            # Handle SELECT VALUE COUNT(1) which returns just a number
+            if isinstance(first_item, (int, float)):
+                return int(first_item)
+            # Handle SELECT COUNT(1) which returns an object
+            elif isinstance(first_item, dict):
+                # Try different count field names
+                if "$1" in first_item:
+                    return int(first_item["$1"])
+                elif "count" in first_item:
+                    return int(first_item["count"])
+                elif "Count" in first_item:
+                    return int(first_item["Count"])
+                else:
+                    # Try to extract numeric value from first field if dict is not empty
+                    values = list(first_item.values())
+                    if values and isinstance(values[0], (int, float)):
+                        return int(values[0])
+                    else:
+                        # If first value is not numeric or dict is empty, fall back to counting items
+                        return len(items)
+            else:
+                # Fallback for unexpected types - try to convert to int
+                try:
+                    return int(first_item)
+                except (ValueError, TypeError):
+                    # If conversion fails, fall back to counting items
+                    return len(items)
+        return 0
+
+    def _count_rows(
+        self, database_name: str, container_name: str, query: str, query_params: Optional[list],
+        stop_after: Optional[int], metrics: Optional[_QueryMetrics] = None,
+        sample: Optional[list] = None, sample_size: int = 0
+    ) -> Tuple[int, bool]:
+        """Count result rows page by page, keeping at most ``sample_size`` of them in ``sample``.
+
+        Counting stops after the page on which ``stop_after`` is reached.
+        Returns the count and whether it is complete.
+        """
+        # Cap the page size at the threshold so a small threshold does not pull a full page
+        page_size = min(stop_after, 1000) if stop_after else None
+        pages = self._query_items(
+            database_name, container_name, query, query_params, metrics, max_item_count=page_size
+        ).by_page()
+        count = 0
+        for page in pages:
+            if sample is not None and len(sample) < sample_size:
+                for item in page:
+                    if len(sample) < sample_size:
+                        sample.append(item)
+                    count += 1
+            else:
+                count += sum(1 for _ in page)
+            if stop_after and count >= stop_after:
+                return count, not pages.continuation_token
+        return count, True
+
     def count_query_results(
-        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None
+        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None,
+        server_side_count: bool = False, stop_after: Optional[int] = None, use_result_cache: bool = True
     ) -> int:
         """
         Execute a query and return the count of results.
         
+        Queries without COUNT are counted page by page rather than loaded in full.
+        With ``server_side_count`` a plain ``SELECT ... FROM c WHERE ...`` is
+        rewritten to ``SELECT VALUE COUNT(1) FROM c WHERE ...`` so only the count
+        crosses the network; queries using JOIN, DISTINCT, TOP, OFFSET/LIMIT,
+        GROUP BY, VALUE or aggregates are left as they are.
+        
+        ``stop_after`` serves threshold checks: counting stops as soon as that
+        many rows were seen, so the returned count is then a lower bound. Use
+        1 for "any results", N + 1 for "more than N" and N for "fewer than N".
+        It has no effect on COUNT queries.
+        
+        Counts are cached like Query Container results when the result cache
+        is enabled.
+        
         Args:
             database_name: Name of the database
             container_name: Name of the container
             query: SQL query string (if it doesn't contain COUNT, will return number of rows)
             parameters: Optional JSON string of query parameters
+            server_side_count: Rewrite eligible queries to a server-side COUNT (default: False)
+            stop_after: Stop paging once this many rows were counted (default: count all)
+            use_result_cache: Use the result cache if it is enabled (default: True)
             
         Returns:
             Integer count of results
@@ -197,64 +919,127 @@ class Cosmosdb:
         Example:
             | ${count}= | Count Query Results | mydb | mycontainer | SELECT * FROM c WHERE c.status = 'error' |
             | ${count}= | Count Query Results | mydb | mycontainer | SELECT COUNT(1) FROM c WHERE c.status = 'error' |
+            | ${count}= | Count Query Results | mydb | mycontainer | SELECT * FROM c WHERE c.status = 'error' | server_side_count=True |
+            | ${count}= | Count Query Results | mydb | mycontainer | SELECT * FROM c WHERE c.status = 'error' | stop_after=101 |
         """
         if not self.client:
             raise Exception("Not connected to Cosmos DB. Call 'Connect To Cosmosdb' first.")
         
+        self.last_query_metrics = None
+        metrics = _QueryMetrics(database_name, container_name, query)
         try:
-            database = self.client.get_database_client(database_name)
-            container = database.get_container_client(container_name)
+            cache_key = self._result_cache_key(
+                ("count", bool(server_side_count), stop_after), database_name, container_name, query, parameters
+            ) if use_result_cache else None
+            cached = self._cached_result(cache_key, metrics)
+            if cached is not None:
+                count, rows = cached
+                self.last_query_metrics = metrics.finish(rows)
+                return count
             
-            query_params = []
-            if parameters:
-                params_dict = json.loads(parameters)
-                for key, value in params_dict.items():
-                    query_params.append({"name": key, "value": value})
+            query_params = self._query_params(parameters)
             
-            items = list(container.query_items(
-                query=query,
-                parameters=query_params if query_params else None,
-                enable_cross_partition_query=True
-            ))
+            is_count_query = self._is_count_query(query)
             
-            # Check if query is a COUNT aggregate query using regex to avoid substring matches
-            # Matches COUNT( or COUNT ( with optional whitespace, case-insensitive
-            count_pattern = re.compile(r'\bCOUNT\s*\(', re.IGNORECASE)
-            is_count_query = bool(count_pattern.search(query))
+            if not is_count_query and server_side_count:
+                count_query = _server_side_count_query(query)
+                if count_query:
+                    query, is_count_query = count_query, True
+                    metrics.query = query
             
-            if is_count_query:
-                if items and len(items) > 0:
-                    first_item = items[0]
-                    # Handle SELECT VALUE COUNT(1) which returns just a number
-                    if isinstance(first_item, (int, float)):
-                        return int(first_item)
-                    # Handle SELECT COUNT(1) which returns an object
-                    elif isinstance(first_item, dict):
-                        # Try different count field names
-                        if "$1" in first_item:
-                            return int(first_item["$1"])
-                        elif "count" in first_item:
-                            return int(first_item["count"])
-                        elif "Count" in first_item:
-                            return int(first_item["Count"])
-                        else:
-                            # Try to extract numeric value from first field if dict is not empty
-                            values = list(first_item.values())
-                            if values and isinstance(values[0], (int, float)):
-                                return int(values[0])
-                            else:
-                                # If first value is not numeric or dict is empty, fall back to counting items
-                                return len(items)
-                    else:
-                        # Fallback for unexpected types - try to convert to int
-                        try:
-                            return int(first_item)
-                        except (ValueError, TypeError):
-                            # If conversion fails, fall back to counting items
-                            return len(items)
-                return 0
-            else:
+            if not is_count_query:
                 # Just return the number of items returned
-                return len(items)
+                count, _ = self._with_auth_retry(lambda: self._count_rows(
+                    database_name, container_name, query, query_params, stop_after, metrics
+                ))
+                rows = count
+            else:
+                items = self._with_auth_retry(lambda: list(
+                    self._query_items(database_name, container_name, query, query_params, metrics)
+                ))
+                count, rows = self._extract_count(query, items), len(items)
+            
+            self.last_query_metrics = metrics.finish(rows)
+            if cache_key is not None:
+                self._result_cache.put(cache_key, (count, rows), len(cache_key[4]) + 64)
+            return count
+        except Exception as e:
+            raise Exception(f"Failed to count query results: {str(e)}")
+
+    def count_query_results_with_sample(
+        self, database_name: str, container_name: str, query: str, parameters: Optional[str] = None,
+        sample_size: int = DEFAULT_SAMPLE_SIZE, stop_after: Optional[int] = None, use_result_cache: bool = True
+    ) -> dict:
+        """
+        Execute a query once and return its count together with the first results.
+        
+        Replaces running Query Container and then extracting the count from the
+        parsed JSON: COUNT queries return their value, other queries are counted
+        page by page while only the first ``sample_size`` documents are kept.
+        ``stop_after`` ends paging early as in Count Query Results; ``complete``
+        is then False and ``count`` is a lower bound.
+        
+        Args:
+            database_name: Name of the database
+            container_name: Name of the container
+            query: SQL query string (if it doesn't contain COUNT, the rows are counted)
+            parameters: Optional JSON string of query parameters
+            sample_size: Maximum number of documents to return (default: 50)
+            stop_after: Stop paging once this many rows were counted (default: count all)
+            use_result_cache: Use the result cache if it is enabled (default: True)
+            
+        Returns:
+            Dictionary with ``count``, ``complete``, ``sample`` (list of documents)
+            and ``sample_json`` (the sample as indented JSON, for reports)
+            
+        Example:
+            | ${result}= | Count Query Results With Sample | mydb | mycontainer | SELECT * FROM c WHERE c.status = 'error' |
+            | RW.Core.Push Metric | ${result}[count] |
+            | RW.Core.Add Pre To Report | ${result}[sample_json] |
+        """
+        if not self.client:
+            raise Exception("Not connected to Cosmos DB. Call 'Connect To Cosmosdb' first.")
+        
+        sample_size = int(sample_size)
+        self.last_query_metrics = None
+        metrics = _QueryMetrics(database_name, container_name, query)
+        try:
+            cache_key = self._result_cache_key(
+                ("count_sample", sample_size, stop_after), database_name, container_name, query, parameters
+            ) if use_result_cache else None
+            cached = self._cached_result(cache_key, metrics)
+            if cached is not None:
+                result, rows = cached
+                self.last_query_metrics = metrics.finish(rows)
+                return dict(result, sample=list(result["sample"]))
+            
+            query_params = self._query_params(parameters)
+            if self._is_count_query(query):
+                items = self._with_auth_retry(lambda: list(
+                    self._query_items(database_name, container_name, query, query_params, metrics)
+                ))
+                count, complete, sample, rows = self._extract_count(query, items), True, items[:sample_size], len(items)
+            else:
+                def scan():
+                    sample = []
+                    count, complete = self._count_rows(
+                        database_name, container_name, query, query_params, stop_after, metrics,
+                        sample, sample_size
+                    )
+                    return count, complete, sample
+                count, complete, sample = self._with_auth_retry(scan)
+                rows = count
+            
+            result = {
+                "count": count,
+                "complete": complete,
+                "sample": sample,
+                "sample_json": json.dumps(sample, indent=2, default=str),
+            }
+            self.last_query_metrics = metrics.finish(rows)
+            if cache_key is not None:
+                self._result_cache.put(cache_key, (result, rows), len(result["sample_json"]))
+                result = dict(result, sample=list(sample))
+            return result
         except Exception as e:
             raise Exception(f"Failed to count query results: {str(e)}")
@@ -8,21 +8,747 @@ This library provides two methods for issue generation:
 Author: RunWhen
 """
 
+import codecs
+import fnmatch
+import functools
+import hashlib
 import json
 import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+import jmespath
 from robot.api import logger
 from robot.libraries.BuiltIn import BuiltIn
 
 
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = ' \t\n\r'
+_STREAM_CHUNK_SIZE = 64 * 1024
+# A decode error this close to the end of the buffer may just be a value cut
+# off by the read (a partial literal such as 'fals' or escape such as '\u12')
+_JSON_INCOMPLETE_TAIL = 8
+
+
+# Directory names skipped while searching for issues files; cloned repos and
+# dependency trees can hold hundreds of thousands of entries that never contain
+# an issues.json the script meant to publish.
+DEFAULT_IGNORE_GLOBS = (
+    '.git', '.hg', '.svn', 'node_modules', 'vendor', '.venv', 'venv',
+    '__pycache__', '.tox', '.terraform', 'site-packages',
+)
+
+
+def _to_bool(value):
+    """Coerce a Robot argument (bool or 'true'/'false' string) to bool."""
+    if isinstance(value, str):
+        return value.strip().lower() in ('true', 'yes', '1', 'on')
+    return bool(value)
+
+
+def _to_limit(value):
+    """Coerce a Robot size/count argument to a positive int, or None for unlimited."""
+    if value is None or value == '':
+        return None
+    value = int(value)
+    return value if value > 0 else None
+
+
+def _to_globs(value):
+    """
+    Coerce an ignore-globs argument to a tuple of patterns.
+
+    None means the default set; an empty string or 'none' disables pruning;
+    a string is split on commas.
+    """
+    if value is None:
+        return DEFAULT_IGNORE_GLOBS
+    if isinstance(value, str):
+        if value.strip().lower() in ('', 'none'):
+            return ()
+        value = value.split(',')
+    return tuple(g.strip() for g in value if g and g.strip())
+
+
+def _scan_tree(top, file_names, ignore_re, max_depth, depth=0):
+    """
+    Return the paths of ``file_names`` under ``top`` in ``os.walk`` top-down order.
+
+    Uses ``os.scandir`` directly so each directory costs one syscall batch and
+    no per-entry ``stat``. Directories whose name matches ``ignore_re`` are
+    not entered, nor are those deeper than ``max_depth``. Like ``os.walk``,
+    symlinked directories are not followed and unreadable directories are
+    skipped.
+    """
+    found = []
+    stack = [(top, depth)]
+    while stack:
+        path, level = stack.pop()
+        try:
+            with os.scandir(path) as it:
+                entries = list(it)
+        except OSError:
+            continue
+        files = set()
+        subdirs = []
+        for entry in entries:
+            try:
+                is_dir = entry.is_dir()
+            except OSError:
+                is_dir = False
+            if not is_dir:
+                files.add(entry.name)
+            elif (max_depth is None or level < max_depth) and not entry.is_symlink() \
+                    and not (ignore_re and ignore_re.match(entry.name)):
+                subdirs.append(entry.path)
+        for name in file_names:
+            if name in files:
+                found.append(os.path.join(path, name))
+        stack.extend((sub, level + 1) for sub in reversed(subdirs))
+    return found
+
+
+def _find_issues_files(temp_dir, file_names=('issues.json',), ignore_globs=None,
+                      max_depth=None, workers=None):
+    """
+    Find issues files under ``temp_dir``, pruning ignored directories.
+
+    Returns the same list, in the same order, that a top-down ``os.walk`` of
+    the unpruned directories would. With ``workers`` > 1 the top-level
+    subdirectories are scanned concurrently on a thread pool (``scandir``
+    releases the GIL, so this helps on slow or network filesystems).
+
+    Args:
+        temp_dir: Root directory to search
+        file_names: File names to collect in each directory
+        ignore_globs: Directory-name globs to prune (None = DEFAULT_IGNORE_GLOBS, '' = no pruning)
+        max_depth: Maximum directory depth below temp_dir to enter (None = unlimited)
+        workers: Thread-pool size for the top-level fan-out (None/1 = serial)
+    """
+    globs = _to_globs(ignore_globs)
+    ignore_re = re.compile('|'.join(fnmatch.translate(g) for g in globs)) if globs else None
+    max_depth = None if max_depth in (None, '') else int(max_depth)
+    workers = _to_limit(workers) or 1
+
+    if workers == 1 or max_depth == 0:
+        return _scan_tree(temp_dir, file_names, ignore_re, max_depth)
+
+    # Scan the root level only, then fan the top-level subtrees out to the pool
+    found = _scan_tree(temp_dir, file_names, ignore_re, 0)
+    try:
+        with os.scandir(temp_dir) as it:
+            subdirs = [
+                entry.path for entry in it
+                if entry.is_dir() and not entry.is_symlink()
+                and not (ignore_re and ignore_re.match(entry.name))
+            ]
+    except OSError:
+        return found
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for subtree in pool.map(lambda sub: _scan_tree(sub, file_names, ignore_re, max_depth, 1), subdirs):
+            found.extend(subtree)
+    return found
+
+
+# An opening bracket that can start a JSON value: '{' before a key or '}', '['
+# before a value or ']'. Log prefixes such as '[INFO]' or '{phase 1}' are skipped.
+_JSON_START_RE = re.compile(r'\{\s*["}]|\[\s*[-\d"\[{\]tfn]')
+# Text a candidate is first decoded in; it doubles while the value runs past it
+_EMBEDDED_JSON_WINDOW = 1024
+
+
+def _decode_embedded(text, start, grow):
+    """
+    Decode the JSON value starting at ``text[start]`` within a bounded window.
+    
+    Decoding a window rather than the whole buffer keeps the cost of a
+    failure (including the line count JSONDecodeError computes) local to the
+    candidate. The window doubles only while the value runs past its end,
+    and only if ``grow``.
+    
+    Returns ``(value, end, unterminated)``: ``end`` is None if no value
+    starts there, and ``unterminated`` is True if it failed only because the
+    text ended.
+    """
+    size = _EMBEDDED_JSON_WINDOW
+    while True:
+        window = text[start:start + size]
+        try:
+            value, end = _JSON_DECODER.raw_decode(window)
+            return value, start + end, False
+        except json.JSONDecodeError as e:
+            if not _json_error_at_end(e, window):
+                return None, None, False
+            if start + size >= len(text):
+                return None, None, True
+            if not grow:
+                return None, None, False
+            size *= 2
+
+
+def _iter_embedded_json(text):
+    """
+    Yield every top-level JSON object or array embedded in ``text``.
+    
+    Each candidate ``{``/``[`` is decoded on its own (see _decode_embedded);
+    a successful decode resumes scanning after the value, and a failed one
+    moves on to the next candidate. Values may span multiple lines. Once a
+    value turns out to be cut off by the end of the text, later candidates
+    (which all lie inside it) are only decoded within the initial window, so
+    truncated output cannot make the scan quadratic. A value nested too
+    deeply to decode skips the rest of its line.
+    """
+    pos = 0
+    grow = True
+    while True:
+        match = _JSON_START_RE.search(text, pos)
+        if match is None:
+            return
+        start = match.start()
+        try:
+            value, end, unterminated = _decode_embedded(text, start, grow)
+        except RecursionError:
+            newline = text.find('\n', start)
+            pos = len(text) if newline == -1 else newline + 1
+            continue
+        except ValueError:
+            # e.g. an integer longer than the int conversion limit
+            value, end, unterminated = None, None, False
+        if end is None:
+            grow = grow and not unterminated
+            pos = start + 1
+            continue
+        yield value
+        pos = end
+
+
+def _coerce_trigger_value(trigger_value):
+    """Convert a string trigger value to bool, int or float where it looks like one."""
+    if isinstance(trigger_value, str):
+        if trigger_value.lower() == 'true':
+            return True
+        if trigger_value.lower() == 'false':
+            return False
+        # Try to convert to number (int or float)
+        try:
+            # Try integer first
+            if '.' not in trigger_value:
+                return int(trigger_value)
+            return float(trigger_value)
+        except ValueError:
+            # Keep as string if not a valid number
+            pass
+    return trigger_value
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_query(expression):
+    """Compile a JMESPath expression once per distinct expression string."""
+    return jmespath.compile(expression)
+
+
+class _IssueSelector:
+    """
+    Decides whether a parsed JSON document triggers issues, and which ones.
+    
+    By default the trigger is ``document[trigger_key] == trigger_value`` and
+    the issues live under ``document[issues_key]``. Either can be replaced by
+    a JMESPath expression, and ``field_queries`` maps issue fields (title,
+    severity, details, ...) to expressions evaluated against each issue.
+    """
+    
+    def __init__(self, trigger_key, trigger_value, issues_key,
+                 trigger_query=None, issues_query=None, field_queries=None):
+        self.trigger_key = trigger_key
+        self.trigger_value = _coerce_trigger_value(trigger_value)
+        self.issues_key = issues_key
+        self.trigger_query = trigger_query or None
+        self.issues_query = issues_query or None
+        self._trigger = _compile_query(trigger_query) if self.trigger_query else None
+        self._issues = _compile_query(issues_query) if self.issues_query else None
+        if isinstance(field_queries, str):
+            field_queries = json.loads(field_queries) if field_queries.strip() else {}
+        self._fields = {name: _compile_query(expr) for name, expr in (field_queries or {}).items()}
+    
+    def describe_trigger(self):
+        if self._trigger is not None:
+            return f"{self.trigger_query} == {self.trigger_value}"
+        return f"{self.trigger_key}={self.trigger_value}"
+    
+    def describe_issues(self):
+        return self.issues_query or self.issues_key
+    
+    def triggered(self, data):
+        if self._trigger is not None:
+            return self._trigger.search(data) == self.trigger_value
+        return isinstance(data, dict) and self.trigger_key in data and data[self.trigger_key] == self.trigger_value
+    
+    def select(self, data):
+        """Return the issues value for a triggered document, or None if there is none."""
+        if self._issues is not None:
+            return self._issues.search(data)
+        if isinstance(data, dict):
+            return data.get(self.issues_key)
+        return None
+    
+    def map_fields(self, issue):
+        if not self._fields:
+            return issue
+        mapped = dict(issue)
+        for name, expression in self._fields.items():
+            value = expression.search(issue)
+            if value is not None:
+                mapped[name] = value
+        return mapped
+
+
+class _BoundedReader:
+    """Reads a binary file as decoded text chunks, stopping at a byte budget."""
+
+    def __init__(self, fh, max_bytes=None):
+        self._fh = fh
+        self._decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self._remaining = max_bytes
+        self.eof = False
+        self.truncated = False
+
+    def read(self, size=_STREAM_CHUNK_SIZE):
+        if self.eof:
+            return ''
+        if self._remaining is not None:
+            size = min(size, self._remaining)
+        raw = self._fh.read(size) if size > 0 else b''
+        if raw:
+            if self._remaining is not None:
+                self._remaining -= len(raw)
+            return self._decoder.decode(raw)
+        self.eof = True
+        if self._remaining is not None and self._remaining <= 0 and self._fh.read(1):
+            self.truncated = True
+        return self._decoder.decode(b'', final=True)
+
+
+def _json_error_at_end(error, buf):
+    """Return True if a decode error may only mean the value runs past the end of ``buf``."""
+    if error.msg.startswith('Unterminated string'):
+        # Reported at the opening quote, but only raised once the scan hits the end
+        return True
+    return error.pos >= len(buf) - _JSON_INCOMPLETE_TAIL
+
+
+def _iter_json_array(reader):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only the current element (plus one read chunk) is held in memory. A file
+    holding a single top-level value instead of an array yields that value.
+    If the byte budget cuts an element in half, iteration stops quietly and
+    ``reader.truncated`` tells the caller why. A malformed element raises
+    JSONDecodeError as soon as it is read; the rest of the file is not.
+    """
+    buf = ''
+    pos = 0
+    want = _STREAM_CHUNK_SIZE
+    state = 'start'
+    while True:
+        while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+            pos += 1
+        if pos >= len(buf):
+            if reader.eof:
+                if state in ('start', 'sep_or_end', 'done') or reader.truncated:
+                    return
+                raise json.JSONDecodeError('Unterminated array', buf, pos)
+            buf = reader.read(want)
+            pos = 0
+            continue
+
+        char = buf[pos]
+        if state == 'start':
+            if char == '[':
+                state = 'first'
+                pos += 1
+                continue
+            state = 'single'
+        elif state == 'sep_or_end':
+            if char == ']':
+                return
+            if char != ',':
+                raise json.JSONDecodeError("Expecting ',' delimiter", buf, pos)
+            state = 'value'
+            pos += 1
+            continue
+        elif state == 'first' and char == ']':
+            return
+        elif state == 'done':
+            return
+
+        try:
+            value, end = _JSON_DECODER.raw_decode(buf, pos)
+            complete = end < len(buf) or reader.eof
+        except json.JSONDecodeError as e:
+            if reader.eof:
+                if reader.truncated:
+                    return
+                raise
+            if not _json_error_at_end(e, buf):
+                raise
+            complete = False
+        if not complete:
+            # Element spans the chunk boundary: grow the read so retries stay linear
+            buf = buf[pos:] + reader.read(want)
+            pos = 0
+            want *= 2
+            continue
+
+        yield value
+        want = _STREAM_CHUNK_SIZE
+        pos = end
+        state = 'done' if state == 'single' else 'sep_or_end'
+        if pos >= _STREAM_CHUNK_SIZE:
+            buf = buf[pos:]
+            pos = 0
+
+
+def _iter_json_lines(reader, source, on_error=None):
+    """
+    Yield one parsed value per non-blank line of an NDJSON stream.
+
+    Lines that are not valid JSON are logged and skipped, or handed to
+    ``on_error(line)`` when given. A line longer than one read is collected
+    as a list of pieces, and each piece is searched for a newline once.
+    """
+    pending = []
+    line_no = 0
+    while not reader.eof:
+        chunk = reader.read()
+        lines = chunk.split('\n')
+        if reader.eof and not reader.truncated:
+            # The last line needs no newline; a line cut off by the byte budget is dropped
+            lines.append('')
+        pending.append(lines[0])
+        for index in range(1, len(lines)):
+            line = ''.join(pending)
+            pending = [lines[index]]
+            line_no += 1
+            if not line.strip():
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                if on_error is not None:
+                    on_error(line)
+                else:
+                    logger.warn(f"Skipping malformed line {line_no} in {source}: {str(e)}")
+
+
+# Field defaults used when an issue object omits a key. A ``details`` default
+# of None means "render the issue object itself as the details".
+_FILE_ISSUE_DEFAULTS = {
+    'title': 'Issue Detected',
+    'severity': 3,
+    'expected': 'No issues should be present',
+    'actual': 'Issue was detected',
+    'reproduce_hint': 'Review the issue details',
+    'next_steps': 'Investigate and resolve the issue',
+    'details': '',
+}
+_JSON_ISSUE_DEFAULTS = {
+    'title': 'Issue Detected from JSON Query',
+    'severity': 3,
+    'expected': 'No issues should be present',
+    'actual': 'Issue was detected in output',
+    'reproduce_hint': 'Review the command output',
+    'next_steps': 'Investigate and resolve the issue',
+    'details': None,
+}
+
+# RW.Core.Add Issue arguments the tool-builder codebundles give every issue
+# their script reports; only these keys of a reported issue are read.
+_TOOL_BUILDER_ISSUE_TEXT = {
+    'expected': 'The script should produce no issues, indicating no errors were found.',
+    'actual': 'Found issues output produced by the provided script, indicating errors were found.',
+    'reproduce_hint': 'look at the SLX description for more details.',
+}
+DEFAULT_TOOL_BUILDER_SEVERITY = 4
+
+DEFAULT_BATCH_SIZE = 500
+
+# How command output (report_data) is attached to issues:
+#   inline    - appended in full to every issue's details (original behaviour)
+#   reference - stored once per keyword call in the report; each issue carries a reference to it
+#   excerpt   - as reference, plus a head/tail excerpt within a byte budget
+REPORT_MODES = ('inline', 'reference', 'excerpt')
+DEFAULT_EXCERPT_BYTES = 2048
+
+
+def _normalize_issue(issue, defaults):
+    """Build the RW.Core.Add Issue arguments for one issue object."""
+    fields = {key: issue.get(key, default) for key, default in defaults.items()}
+    if fields['details'] is None:
+        fields['details'] = json.dumps(issue, indent=2)
+    return fields
+
+
+def _tool_builder_issue(item):
+    """Add Issue arguments for one tool-builder issue, or None if it has no 'issue title'."""
+    title = item.get('issue title') if isinstance(item, dict) else None
+    if title is None:
+        return None
+    fields = {
+        'title': title,
+        'severity': item.get('issue severity', DEFAULT_TOOL_BUILDER_SEVERITY),
+        **_TOOL_BUILDER_ISSUE_TEXT,
+        'next_steps': item.get('issue next steps', ''),
+        'details': item.get('issue description', ''),
+    }
+    observed_at = item.get('issue observed at')
+    if observed_at is not None:
+        fields['observed_at'] = observed_at
+    return fields
+
+
+class _MalformedItems:
+    """Counts rejected tool-builder items, keeping only the first for the failure message."""
+
+    def __init__(self):
+        self.count = 0
+        self.first = None
+
+    def add(self, item):
+        if self.count == 0:
+            self.first = item
+        self.count += 1
+
+
+# Issue fields that must all match for two issues to count as duplicates
+_DEDUPE_FIELDS = ('title', 'severity', 'expected', 'actual', 'reproduce_hint', 'next_steps', 'details')
+
+
+def _issue_key(fields):
+    """Stable content hash of an issue's text fields (see _DEDUPE_FIELDS)."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in (fields.get(name) for name in _DEDUPE_FIELDS):
+        digest.update(str(part).encode('utf-8', 'surrogateescape'))
+        digest.update(b'\x00')
+    return digest.digest()
+
+
+def _excerpt(text, budget):
+    """Return ``text`` if it fits in ``budget`` UTF-8 bytes, else its head and tail."""
+    data = text.encode('utf-8', 'surrogateescape')
+    if len(data) <= budget:
+        return text
+    half = budget // 2
+    head = data[:half].decode('utf-8', 'ignore')
+    tail = data[len(data) - half:].decode('utf-8', 'ignore')
+    return f"{head}\n... [{len(data) - 2 * half} bytes omitted] ...\n{tail}"
+
+
+def _severity_rank(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return 4
+
+
+class _IssueEmitter:
+    """
+    Collects normalized issues and hands them to RW.Core.
+    
+    When the RW.Core library instance is reachable its ``add_issue`` method is
+    called directly, once per issue, which skips Robot's keyword dispatch,
+    argument parsing and per-call logging. That also means no listener sees
+    an ``RW.Core.Add Issue`` keyword start or end for these issues, and the
+    arguments are converted here instead of by Robot: every field is passed
+    as the string the keyword call would have received, and ``severity`` as
+    an int (see _core_arguments). Otherwise each issue falls back to a
+    ``RW.Core.Add Issue`` keyword call, exactly as before. RW.Core has no
+    bulk API, so ``batch_size`` only sets how many issues are buffered
+    between these per-issue calls and the progress log line.
+    
+    With ``dedupe``, issues identical in every text field to one already seen
+    during this emitter's lifetime are dropped. Once ``max_issues`` have been accepted,
+    further issues are only counted and reported by a single summary issue
+    from ``finish``.
+    
+    Outside ``inline`` report mode the command output is added to the report
+    once, the first time an issue needs it, and every issue gets the same
+    fixed-size suffix (see REPORT_MODES).
+    """
+    
+    def __init__(self, builtin, batch_size=DEFAULT_BATCH_SIZE, report_data=None,
+                 dedupe=False, max_issues=None, report_mode='inline',
+                 excerpt_bytes=DEFAULT_EXCERPT_BYTES):
+        self._builtin = builtin
+        self._batch_size = max(1, int(batch_size))
+        self._report_data = report_data
+        self._report_mode = report_mode
+        self._excerpt_bytes = excerpt_bytes
+        self._report_suffix = None
+        self._seen = set() if dedupe else None
+        self._max_issues = max_issues
+        self._accepted = 0
+        self._pending = []
+        self._core = None
+        self._core_resolved = False
+        self.duplicates = 0
+        self.suppressed = 0
+        self._suppressed_severity = None
+        self.emitted = 0
+    
+    def add(self, fields, source):
+        if self._seen is not None:
+            key = _issue_key(fields)
+            if key in self._seen:
+                self.duplicates += 1
+                logger.debug(f"Skipping duplicate issue from {source}: {fields['title']}")
+                return
+            self._seen.add(key)
+        if self._max_issues is not None and self._accepted >= self._max_issues:
+            self.suppressed += 1
+            rank = _severity_rank(fields['severity'])
+            if self._suppressed_severity is None or rank < self._suppressed_severity:
+                self._suppressed_severity = rank
+            return
+        self._accepted += 1
+        
+        # Append report data if provided
+        if self._report_data:
+            details = fields['details']
+            suffix = self._command_output_suffix()
+            if details:
+                details = f"{details}\n\n--- Command Output ---\n{suffix}"
+            else:
+                details = f"--- Command Output ---\n{suffix}"
+            fields = dict(fields, details=details)
+        
+        self._pending.append(fields)
+        logger.debug(f"Queued issue from {source}: {fields['title']}")
+        if len(self._pending) >= self._batch_size:
+            self.flush()
+    
+    def _command_output_suffix(self):
+        """Text appended to each issue's details; built once per emitter."""
+        if self._report_suffix is None:
+            report = str(self._report_data)
+            if self._report_mode not in ('reference', 'excerpt'):
+                self._report_suffix = report
+            else:
+                digest = hashlib.sha256(report.encode('utf-8', 'surrogateescape')).hexdigest()[:12]
+                label = f"Command Output sha256:{digest}"
+                self._attach(f"=== {label} ===\n{report}")
+                size = len(report.encode('utf-8', 'surrogateescape'))
+                suffix = f"Full output ({size} bytes) is attached once to the report as '{label}'."
+                if self._report_mode == 'excerpt':
+                    suffix = f"{suffix}\n{_excerpt(report, self._excerpt_bytes)}"
+                self._report_suffix = suffix
+        return self._report_suffix
+    
+    def _attach(self, text):
+        core = self._resolve_core()
+        if core is not None:
+            core.add_pre_to_report(text)
+        else:
+            self._builtin.run_keyword('RW.Core.Add Pre To Report', text)
+    
+    def flush(self):
+        if not self._pending:
+            return
+        batch, self._pending = self._pending, []
+        core = self._resolve_core()
+        if core is not None:
+            for fields in batch:
+                core.add_issue(**self._core_arguments(fields))
+                self.emitted += 1
+        else:
+            for fields in batch:
+                self._builtin.run_keyword(
+                    'RW.Core.Add Issue',
+                    *[f'{key}={value}' for key, value in fields.items()]
+                )
+                self.emitted += 1
+        logger.info(f"Created {len(batch)} issue(s) ({self.emitted} total)")
+    
+    def finish(self):
+        """Flush remaining issues and add the suppression summary, if any."""
+        if self.duplicates:
+            logger.info(f"Skipped {self.duplicates} duplicate issue(s)")
+        if self.suppressed:
+            logger.warn(f"Issue cap of {self._max_issues} reached; suppressed {self.suppressed} more issue(s)")
+            self._pending.append({
+                'title': f"{self.suppressed} more issues suppressed",
+                'severity': self._suppressed_severity,
+                'expected': f"No more than {self._max_issues} issues should be reported by one run",
+                'actual': f"{self._max_issues + self.suppressed} distinct issues were detected",
+                'reproduce_hint': 'Review the command output',
+                'next_steps': 'Resolve the reported issues, or raise the max_issues limit to see the rest',
+                'details': f"Only the first {self._max_issues} issues were created; "
+                           f"{self.suppressed} more were suppressed.",
+            })
+        self.flush()
+        return self.emitted
+    
+    def _resolve_core(self):
+        if not self._core_resolved:
+            self._core_resolved = True
+            try:
+                self._core = self._builtin.get_library_instance('RW.Core')
+            except Exception as e:
+                logger.debug(f"RW.Core instance unavailable, using keyword calls: {str(e)}")
+                self._core = None
+        return self._core
+    
+    @staticmethod
+    def _core_arguments(fields):
+        """Convert issue fields the way ``RW.Core.Add Issue`` keyword dispatch would."""
+        arguments = {}
+        for key, value in fields.items():
+            if value is None:
+                arguments[key] = None
+            elif key == 'severity':
+                # Keyword dispatch converts "severity=2" to int
+                try:
+                    arguments[key] = int(value)
+                except (TypeError, ValueError):
+                    arguments[key] = str(value)
+            else:
+                # The keyword call passes f'{key}={value}', so the library sees str(value)
+                arguments[key] = str(value)
+        return arguments
+
+
 class DynamicIssues:
     """Library for dynamically generating issues from multiple sources"""
     
     ROBOT_LIBRARY_SCOPE = 'GLOBAL'
     
-    def __init__(self):
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, dedupe=False, max_issues=None,
+                 report_mode='inline', report_excerpt_bytes=DEFAULT_EXCERPT_BYTES):
+        """
+        Args:
+            batch_size: Issues handed to RW.Core per flush
+            dedupe: Drop issues identical in every field (title, severity, expected, actual,
+                reproduce_hint, next_steps, details) within one keyword call; off by default
+            max_issues: Cap on issues created per keyword call; the rest are summarized in one issue
+            report_mode: How report_data is attached to issues: inline, reference or excerpt
+            report_excerpt_bytes: Byte budget of the head/tail excerpt in excerpt mode
+        """
+        if report_mode not in REPORT_MODES:
+            raise ValueError(f"report_mode must be one of {', '.join(REPORT_MODES)}, got '{report_mode}'")
         self.builtin = BuiltIn()
+        self.batch_size = int(batch_size)
+        self.dedupe = _to_bool(dedupe)
+        self.max_issues = _to_limit(max_issues)
+        self.report_mode = report_mode
+        self.report_excerpt_bytes = int(report_excerpt_bytes)
+    
+    def _new_emitter(self, report_data=None):
+        return _IssueEmitter(self.builtin, self.batch_size, report_data, self.dedupe, self.max_issues,
+                             self.report_mode, self.report_excerpt_bytes)
     
-    def process_file_based_issues(self, temp_dir=None, report_data=None):
+    def process_file_based_issues(self, temp_dir=None, report_data=None, streaming=False,
+                                  max_file_bytes=None, max_items=None, ignore_globs=None,
+                                  max_depth=None, scan_workers=None):
         """
         Check for issues.json file and create issues from it.
         
@@ -30,88 +756,117 @@ class DynamicIssues:
         and creates one issue per item found. This handles cases where users
         git clone repos and issues.json is in a subdirectory.
         
+        In streaming mode each file is parsed one array element at a time, so
+        peak memory stays flat regardless of file size. NDJSON ``issues.jsonl``
+        files (one issue object per line) are also picked up, and the per-file
+        byte and item caps are enforced.
+        
+        Directories such as .git, node_modules and vendor are not searched
+        (see DEFAULT_IGNORE_GLOBS); pass ignore_globs to change the set.
+        
         Args:
             temp_dir: Directory to search for files (defaults to CODEBUNDLE_TEMP_DIR)
             report_data: Optional report data (stdout, stderr, history) to append to issue details
+            streaming: Parse files incrementally and accept issues.jsonl (default: False)
+            max_file_bytes: Streaming only - stop reading a file after this many bytes (default: unlimited)
+            max_items: Streaming only - stop after this many items per file (default: unlimited)
+            ignore_globs: Comma-separated directory-name globs to skip ('' searches everything)
+            max_depth: Maximum directory depth below temp_dir to search (default: unlimited)
+            scan_workers: Threads used to scan top-level subdirectories in parallel (default: 1)
         
         Returns:
             Number of issues created
         """
         if temp_dir is None:
             temp_dir = os.environ.get('CODEBUNDLE_TEMP_DIR', '.')
+        streaming = _to_bool(streaming)
+        max_file_bytes = _to_limit(max_file_bytes)
+        max_items = _to_limit(max_items)
         
-        issues_created = 0
+        emitter = self._new_emitter(report_data)
         
-        # Search recursively for all issues.json files
-        issues_files = []
-        for root, dirs, files in os.walk(temp_dir):
-            if 'issues.json' in files:
-                issues_files.append(os.path.join(root, 'issues.json'))
+        # Search recursively for all issues.json (and, when streaming, issues.jsonl) files
+        file_names = ('issues.json', 'issues.jsonl') if streaming else ('issues.json',)
+        issues_files = _find_issues_files(temp_dir, file_names, ignore_globs, max_depth, scan_workers)
         
-        # Process each issues.json file found
+        # Process each issues file found
         for issues_file in issues_files:
             try:
-                with open(issues_file, 'r') as f:
-                    issues_data = json.load(f)
+                if streaming:
+                    issues_data = self._stream_issues_file(issues_file, max_file_bytes, max_items)
+                else:
+                    with open(issues_file, 'r') as f:
+                        issues_data = json.load(f)
                     
                     # Handle both list and single object
                     if isinstance(issues_data, dict):
                         issues_data = [issues_data]
-                    
-                    for issue in issues_data:
-                        if isinstance(issue, dict):
-                            # Create issue with provided fields or defaults
-                            title = issue.get('title', 'Issue Detected')
-                            severity = issue.get('severity', 3)
-                            expected = issue.get('expected', 'No issues should be present')
-                            actual = issue.get('actual', 'Issue was detected')
-                            reproduce_hint = issue.get('reproduce_hint', 'Review the issue details')
-                            next_steps = issue.get('next_steps', 'Investigate and resolve the issue')
-                            details = issue.get('details', '')
-                            
-                            # Append report data if provided
-                            if report_data:
-                                if details:
-                                    details = f"{details}\n\n--- Command Output ---\n{report_data}"
-                                else:
-                                    details = f"--- Command Output ---\n{report_data}"
-                            
-                            self.builtin.run_keyword(
-                                'RW.Core.Add Issue',
-                                f'title={title}',
-                                f'severity={severity}',
-                                f'expected={expected}',
-                                f'actual={actual}',
-                                f'reproduce_hint={reproduce_hint}',
-                                f'next_steps={next_steps}',
-                                f'details={details}'
-                            )
-                            issues_created += 1
-                            logger.info(f"Created issue from {issues_file}: {title}")
+                
+                for issue in issues_data:
+                    if isinstance(issue, dict):
+                        emitter.add(_normalize_issue(issue, _FILE_ISSUE_DEFAULTS), issues_file)
+                # Hand this file's issues to RW.Core here, so a failing sink is reported per file
+                emitter.flush()
                     
             except json.JSONDecodeError as e:
                 logger.warn(f"Failed to parse {issues_file}: {str(e)}")
             except Exception as e:
                 logger.warn(f"Failed to process {issues_file}: {str(e)}")
         
+        try:
+            issues_created = emitter.finish()
+        except Exception as e:
+            logger.warn(f"Failed to create issues: {str(e)}")
+            issues_created = emitter.emitted
         if issues_files:
-            logger.info(f"Processed {len(issues_files)} issues.json file(s), created {issues_created} issue(s)")
+            logger.info(f"Processed {len(issues_files)} issues file(s), created {issues_created} issue(s)")
         
         return issues_created
     
-    def process_json_query_issues(self, output_text, trigger_key, trigger_value, issues_key, report_data=None):
+    def _stream_issues_file(self, issues_file, max_file_bytes=None, max_items=None):
+        """Yield issue items from one file incrementally, honouring the byte and item caps."""
+        with open(issues_file, 'rb') as f:
+            reader = _BoundedReader(f, max_file_bytes)
+            if issues_file.endswith('.jsonl'):
+                items = _iter_json_lines(reader, issues_file)
+            else:
+                items = _iter_json_array(reader)
+            
+            count = 0
+            for item in items:
+                if max_items is not None and count >= max_items:
+                    logger.warn(f"Stopped reading {issues_file} after {max_items} item(s) (max_items)")
+                    return
+                count += 1
+                yield item
+            
+            if reader.truncated:
+                logger.warn(f"Stopped reading {issues_file} after {max_file_bytes} bytes (max_file_bytes)")
+    
+    def process_json_query_issues(self, output_text, trigger_key, trigger_value, issues_key, report_data=None,
+                                  trigger_query=None, issues_query=None, field_queries=None):
         """
         Search for configurable patterns in JSON output and create issues.
         
         This method searches for a trigger pattern (e.g., "issuesIdentified":"true")
         and then looks for an issues array/object under the specified key.
         
+        For nested or differently shaped output, JMESPath expressions can stand
+        in for the flat keys, which removes the need to reshape stdout with jq
+        first. Compiled expressions are cached by expression string.
+        
         Args:
             output_text: The text output to search (usually stdout)
             trigger_key: The JSON key to check (e.g., "issuesIdentified" or "storeIssues")
             trigger_value: The value that triggers issue creation (e.g., "true" or True)
             issues_key: The JSON key containing the issues list (e.g., "issues")
             report_data: Optional report data (stdout, stderr, history) to append to issue details
+            trigger_query: Optional JMESPath expression compared to trigger_value instead of trigger_key
+                (e.g., "summary.failed > `0`" with trigger_value "true")
+            issues_query: Optional JMESPath expression selecting the issues instead of issues_key
+                (e.g., "results[?status=='FAIL']")
+            field_queries: Optional JSON object (or dict) mapping issue fields to JMESPath expressions
+                evaluated against each issue (e.g., '{"title": "name", "severity": "level"}')
         
         Returns:
             Number of issues created
@@ -120,162 +875,157 @@ class DynamicIssues:
             logger.info("No output text provided for JSON query processing")
             return 0
         
+        try:
+            selector = _IssueSelector(trigger_key, trigger_value, issues_key,
+                                      trigger_query, issues_query, field_queries)
+        except (jmespath.exceptions.JMESPathError, ValueError) as e:
+            logger.warn(f"Invalid JSON query configuration: {str(e)}")
+            return 0
+        
         issues_created = 0
         
         try:
             # Try to parse the entire output as JSON
             data = json.loads(output_text)
             
-            # Convert trigger_value to appropriate type
-            if isinstance(trigger_value, str):
-                if trigger_value.lower() == 'true':
-                    trigger_value = True
-                elif trigger_value.lower() == 'false':
-                    trigger_value = False
-                else:
-                    # Try to convert to number (int or float)
-                    try:
-                        # Try integer first
-                        if '.' not in trigger_value:
-                            trigger_value = int(trigger_value)
-                        else:
-                            trigger_value = float(trigger_value)
-                    except ValueError:
-                        # Keep as string if not a valid number
-                        pass
-            
             # Check if trigger condition is met
-            if trigger_key in data and data[trigger_key] == trigger_value:
-                logger.info(f"Trigger condition met: {trigger_key}={trigger_value}")
+            if selector.triggered(data):
+                logger.info(f"Trigger condition met: {selector.describe_trigger()}")
                 
                 # Look for issues
-                if issues_key in data:
-                    issues_data = data[issues_key]
-                    
-                    # Handle both list and single object
-                    if isinstance(issues_data, dict):
-                        issues_data = [issues_data]
-                    
-                    if isinstance(issues_data, list):
-                        for issue in issues_data:
-                            if isinstance(issue, dict):
-                                # Create issue with provided fields or defaults
-                                title = issue.get('title', 'Issue Detected from JSON Query')
-                                severity = issue.get('severity', 3)
-                                expected = issue.get('expected', 'No issues should be present')
-                                actual = issue.get('actual', 'Issue was detected in output')
-                                reproduce_hint = issue.get('reproduce_hint', 'Review the command output')
-                                next_steps = issue.get('next_steps', 'Investigate and resolve the issue')
-                                details = issue.get('details', json.dumps(issue, indent=2))
-                                
-                                # Append report data if provided
-                                if report_data:
-                                    if details:
-                                        details = f"{details}\n\n--- Command Output ---\n{report_data}"
-                                    else:
-                                        details = f"--- Command Output ---\n{report_data}"
-                                
-                                self.builtin.run_keyword(
-                                    'RW.Core.Add Issue',
-                                    f'title={title}',
-                                    f'severity={severity}',
-                                    f'expected={expected}',
-                                    f'actual={actual}',
-                                    f'reproduce_hint={reproduce_hint}',
-                                    f'next_steps={next_steps}',
-                                    f'details={details}'
-                                )
-                                issues_created += 1
-                                logger.info(f"Created issue from JSON query: {title}")
-                    else:
-                        logger.warn(f"Issues key '{issues_key}' does not contain a list or object")
+                issues_data = selector.select(data)
+                if isinstance(issues_data, (dict, list)):
+                    emitter = self._new_emitter(report_data)
+                    self._queue_json_issues(issues_data, selector, emitter, 'JSON query')
+                    issues_created = emitter.finish()
+                elif issues_data is not None:
+                    logger.warn(f"Issues key '{selector.describe_issues()}' does not contain a list or object")
                 else:
-                    logger.info(f"Trigger met but no '{issues_key}' key found in JSON output")
+                    logger.info(f"Trigger met but no '{selector.describe_issues()}' key found in JSON output")
             else:
-                logger.info(f"Trigger condition not met: {trigger_key} != {trigger_value}")
+                logger.info(f"Trigger condition not met: {selector.describe_trigger()}")
                     
-        except json.JSONDecodeError:
+        except (json.JSONDecodeError, RecursionError):
             # Try to find JSON objects in the text
             logger.info("Output is not valid JSON, attempting to find JSON objects in text")
-            issues_created = self._extract_json_from_text(output_text, trigger_key, trigger_value, issues_key, report_data)
+            try:
+                issues_created = self._extract_json_from_text(output_text, selector, report_data)
+            except Exception as e:
+                logger.warn(f"Failed to process JSON query: {str(e)}")
         except Exception as e:
             logger.warn(f"Failed to process JSON query: {str(e)}")
         
         return issues_created
     
-    def _extract_json_from_text(self, text, trigger_key, trigger_value, issues_key, report_data=None):
-        """Helper method to extract JSON objects from text that may contain non-JSON content"""
-        issues_created = 0
+    def _queue_json_issues(self, issues_data, selector, emitter, source):
+        """Queue every issue object found under the issues key (a list or a single object)."""
+        if isinstance(issues_data, dict):
+            issues_data = [issues_data]
+        for issue in issues_data:
+            if isinstance(issue, dict):
+                emitter.add(_normalize_issue(selector.map_fields(issue), _JSON_ISSUE_DEFAULTS), source)
+    
+    def _extract_json_from_text(self, text, selector, report_data=None):
+        """
+        Helper method to extract JSON objects from text that may contain non-JSON content.
         
-        # Look for JSON-like structures in the text
-        lines = text.split('\n')
-        for line in lines:
-            line = line.strip()
-            if line.startswith('{') or line.startswith('['):
-                try:
-                    data = json.loads(line)
-                    
-                    # Convert trigger_value to appropriate type
-                    if isinstance(trigger_value, str):
-                        if trigger_value.lower() == 'true':
-                            trigger_value = True
-                        elif trigger_value.lower() == 'false':
-                            trigger_value = False
-                        else:
-                            # Try to convert to number (int or float)
-                            try:
-                                # Try integer first
-                                if '.' not in trigger_value:
-                                    trigger_value = int(trigger_value)
-                                else:
-                                    trigger_value = float(trigger_value)
-                            except ValueError:
-                                # Keep as string if not a valid number
-                                pass
-                    
-                    # Check trigger condition
-                    if isinstance(data, dict) and trigger_key in data and data[trigger_key] == trigger_value:
-                        if issues_key in data:
-                            issues_data = data[issues_key]
-                            
-                            if isinstance(issues_data, dict):
-                                issues_data = [issues_data]
-                            
-                            if isinstance(issues_data, list):
-                                for issue in issues_data:
-                                    if isinstance(issue, dict):
-                                        title = issue.get('title', 'Issue Detected from JSON Query')
-                                        severity = issue.get('severity', 3)
-                                        expected = issue.get('expected', 'No issues should be present')
-                                        actual = issue.get('actual', 'Issue was detected in output')
-                                        reproduce_hint = issue.get('reproduce_hint', 'Review the command output')
-                                        next_steps = issue.get('next_steps', 'Investigate and resolve the issue')
-                                        details = issue.get('details', json.dumps(issue, indent=2))
-                                        
-                                        # Append report data if provided
-                                        if report_data:
-                                            if details:
-                                                details = f"{details}\n\n--- Command Output ---\n{report_data}"
-                                            else:
-                                                details = f"--- Command Output ---\n{report_data}"
-                                        
-                                        self.builtin.run_keyword(
-                                            'RW.Core.Add Issue',
-                                            f'title={title}',
-                                            f'severity={severity}',
-                                            f'expected={expected}',
-                                            f'actual={actual}',
-                                            f'reproduce_hint={reproduce_hint}',
-                                            f'next_steps={next_steps}',
-                                            f'details={details}'
-                                        )
-                                        issues_created += 1
-                                        logger.info(f"Created issue from extracted JSON: {title}")
-                except json.JSONDecodeError:
-                    continue
-                except Exception as e:
-                    logger.debug(f"Error processing line as JSON: {str(e)}")
-                    continue
+        Every top-level JSON object in the text is found, including pretty-printed
+        ones spanning several lines, in a single pass over the buffer.
+        """
+        emitter = self._new_emitter(report_data)
         
-        return issues_created
-
+        for data in _iter_embedded_json(text):
+            try:
+                # Check trigger condition
+                if selector.triggered(data):
+                    issues_data = selector.select(data)
+                    if isinstance(issues_data, (dict, list)):
+                        self._queue_json_issues(issues_data, selector, emitter, 'extracted JSON')
+            except Exception as e:
+                logger.debug(f"Error processing embedded JSON value: {str(e)}")
+        
+        return emitter.finish()
+    
+    def process_tool_builder_issues(self, output_file):
+        """
+        Create issues from a tool-builder script's JSON output in one call.
+        
+        The file must hold a JSON list of issue objects in the tool-builder
+        contract ('issue title', 'issue severity', 'issue description',
+        'issue next steps', 'issue observed at'); a missing or empty file means
+        no issues. Every item with an 'issue title' becomes an issue, with
+        severity 4 when none is given. Other items are skipped and counted as
+        malformed, so the valid findings are still recorded. Issues are
+        neither deduplicated nor capped, as in the codebundle's own loop.
+        
+        A file that is not JSON, or does not hold a list, fails the keyword.
+        This replaces a Robot FOR loop over the list, which cost several
+        keyword dispatches per issue.
+        
+        Args:
+            output_file: Path of the JSON file the script wrote
+        
+        Returns:
+            Dictionary with ``issues`` (number created), ``malformed`` (number
+            skipped) and ``first_malformed`` (the first skipped item, or None)
+        """
+        issues_data = []
+        if os.path.exists(output_file) and os.path.getsize(output_file) > 0:
+            try:
+                with open(output_file) as f:
+                    issues_data = json.load(f)
+            except Exception as e:
+                raise Exception(
+                    "Task script output could not be read as JSON. The script must write a JSON list of "
+                    f"issue objects (use [] for no issues). Parser error: {type(e).__name__}: {e}"
+                )
+        if not isinstance(issues_data, list):
+            raise Exception(
+                f"Task script did not return a JSON list of issues (got a {type(issues_data).__name__}). "
+                "Return a list of issue objects; use [] for no issues."
+            )
+        return self._emit_tool_builder_issues(issues_data, output_file)
+    
+    def process_tool_builder_issues_stream(self, output_file):
+        """
+        Create issues from a tool-builder script's NDJSON output, one line at a time.
+        
+        Each non-blank line is one issue object in the tool-builder contract
+        ('issue title', 'issue severity', 'issue description', 'issue next steps',
+        'issue observed at'). Lines are parsed, validated and handed to RW.Core
+        as they are read, so the whole output is never held in memory, and
+        lines a script wrote before it crashed or timed out are still ingested.
+        
+        A line that is not JSON, or not an object with an 'issue title', is
+        malformed: it is skipped and counted, and the valid issues are still
+        created. Issues are neither deduplicated nor capped, as in the
+        codebundle's own loop. A missing or empty file means no issues.
+        
+        Args:
+            output_file: Path of the NDJSON file the script wrote
+        
+        Returns:
+            Dictionary with ``issues`` (number created), ``malformed`` (number
+            skipped) and ``first_malformed`` (the first skipped item, or None)
+        """
+        malformed = _MalformedItems()
+        if not (os.path.exists(output_file) and os.path.getsize(output_file) > 0):
+            return self._emit_tool_builder_issues([], output_file, malformed)
+        with open(output_file, 'rb') as f:
+            items = _iter_json_lines(_BoundedReader(f), output_file, malformed.add)
+            return self._emit_tool_builder_issues(items, output_file, malformed)
+    
+    def _emit_tool_builder_issues(self, items, source, malformed=None):
+        """Emit every valid tool-builder issue in ``items``; count the rest as malformed."""
+        malformed = malformed if malformed is not None else _MalformedItems()
+        emitter = _IssueEmitter(self.builtin, self.batch_size, dedupe=False)
+        for item in items:
+            fields = _tool_builder_issue(item)
+            if fields is None:
+                malformed.add(item)
+                continue
+            emitter.add(fields, source)
+        created = emitter.finish()
+        if malformed.count:
+            logger.warn(f"Skipped {malformed.count} malformed issue(s) in {source}")
+        return {'issues': created, 'malformed': malformed.count, 'first_malformed': malformed.first}
@@ -0,0 +1,98 @@
+"""
+RW.GenCmd - Library for decoding the GEN_CMD script of generic codebundles
+
+The tool-builder and generics-editor codebundles receive the user's bash or
+python script base64-encoded in GEN_CMD. Decoding it here replaces the
+``echo '<b64>' | base64 -d`` shell those codebundles used to fork on every
+run. The decoded text is what that shell handed back through RW.CLI, so the
+same script reaches the interpreter.
+
+Author: RunWhen
+"""
+
+import base64
+import binascii
+import hashlib
+import threading
+from collections import OrderedDict
+
+
+DEFAULT_CACHE_ENTRIES = 32
+
+_BASE64_WHITESPACE = str.maketrans('', '', ' \t\r\n')
+
+# Decoded scripts keyed by the SHA-256 of the compacted base64 text
+_decoded_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _decode(gen_cmd):
+    """Decode and validate base64 script text.
+
+    Whitespace and missing ``=`` padding are tolerated, as ``base64 -d`` does.
+    The bytes must be UTF-8; line endings are normalized to ``\\n`` the way
+    RW.CLI's text-mode read of the shell's stdout did.
+    """
+    compact = (gen_cmd or '').translate(_BASE64_WHITESPACE)
+    if not compact:
+        raise ValueError('GEN_CMD is empty')
+    compact += '=' * (-len(compact) % 4)
+    try:
+        raw = base64.b64decode(compact, validate=True)
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f'GEN_CMD is not valid base64: {e}')
+    try:
+        text = raw.decode('utf-8')
+    except UnicodeDecodeError as e:
+        raise ValueError(f'GEN_CMD does not decode to UTF-8 text: {e}')
+    return text.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class GenCmd:
+    """Decode base64 GEN_CMD scripts in-process, caching them by content hash."""
+
+    ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+
+    def __init__(self, cache_entries=DEFAULT_CACHE_ENTRIES):
+        self.cache_entries = int(cache_entries)
+
+    def decode_gen_cmd(self, gen_cmd):
+        """Decode a base64 GEN_CMD into the script text.
+
+        Fails with a clear message when GEN_CMD is empty, is not base64 or
+        does not decode to UTF-8, instead of running a partly decoded script.
+
+        Args:
+            gen_cmd: base64-encoded script
+
+        Returns:
+            The script text
+
+        Example:
+            | ${script}= | RW.GenCmd.Decode Gen Cmd | ${GEN_CMD} |
+        """
+        key = hashlib.sha256((gen_cmd or '').translate(_BASE64_WHITESPACE).encode()).hexdigest()
+        with _cache_lock:
+            script = _decoded_cache.get(key)
+            if script is not None:
+                _decoded_cache.move_to_end(key)
+                return script
+        try:
+            script = _decode(gen_cmd)
+        except ValueError as e:
+            raise Exception(str(e))
+        if self.cache_entries > 0:
+            with _cache_lock:
+                _decoded_cache[key] = script
+                while len(_decoded_cache) > self.cache_entries:
+                    _decoded_cache.popitem(last=False)
+        return script
+
+    def clear_gen_cmd_cache(self):
+        """Drop every cached decoded script.
+
+        Example:
+            | RW.GenCmd.Clear Gen Cmd Cache |
+        """
+        with _cache_lock:
+            _decoded_cache.clear()
@@ -0,0 +1,775 @@
+"""
+Grafana HTTP client library for Robot Framework.
+
+Queries Grafana datasources (Loki, Prometheus and compatible backends) over a
+pooled ``requests.Session`` instead of building ``echo <b64> | base64 -d |
+curl`` shell pipelines. Responses are parsed in-process and returned as
+Python data, so no process is forked and no stdout string has to be parsed
+again.
+
+Two Grafana APIs are supported, matching the QUERY_MODE of the Grafana
+codebundles:
+
+- ``Datasource Proxy Get``: GET /api/datasources/proxy/{uid/<uid>|<id>}/<path>
+- ``Datasource Query``: POST /api/ds/query (the API Grafana Explore uses)
+
+``Loki Query Range Paged`` builds on the proxy API to read more log lines than
+one Loki ``limit`` allows, writing them to an NDJSON file.
+
+``Reduce Query Result`` turns a metric query response into a single number
+for ``RW.Core.Push Metric``, without a ``jq`` post-processing step.
+
+``Cluster Loki Log Lines`` groups error lines by template (numbers, UUIDs, IPs
+and hex IDs masked) in bounded memory, so a runbook can raise one issue per
+frequent error pattern.
+
+Authentication headers are read from the HEADERS secret, which holds a cURL
+``-K`` config file such as::
+
+    header = "Authorization: Bearer GRAFANA_TOKEN"
+    header = "X-Grafana-Org-Id: 1"
+
+``header``, ``user``, ``insecure``, ``cacert``/``capath`` and ``proxy`` lines
+are applied to the session request, which verifies TLS against the system CA
+bundle as cURL does. If the config uses any other cURL option, the request is
+sent with the ``curl`` command instead, so the option still takes effect.
+"""
+
+import heapq
+import json
+import os
+import re
+import shlex
+import shutil
+import ssl
+import subprocess
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from itertools import chain
+from typing import Dict, Iterable, List, Optional, Tuple, Union
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from robot.api import logger
+
+DEFAULT_TIMEOUT_SECONDS = 60
+DEFAULT_POOL_SIZE = 10
+DEFAULT_LOKI_PAGE_LIMIT = 1000
+DEFAULT_LOKI_SHARDS = 8
+DEFAULT_LOKI_WORKERS = 4
+DEFAULT_LOKI_MAX_LINES = 100000
+DEFAULT_LOKI_MAX_BYTES = 64 * 1024 * 1024
+# Loki's default max_entries_limit_per_query; larger limits are rejected
+LOKI_MAX_ENTRIES_PER_QUERY = 5000
+DEFAULT_PERCENTILE = 95
+
+REDUCERS = ("last", "max", "min", "avg", "sum", "count", "percentile")
+
+DEFAULT_ERROR_PATTERN = r"(?i)\b(error|err|fatal|panic|exception|fail(ed|ure)?|crit(ical)?)\b"
+DEFAULT_TOP_CLUSTERS = 10
+DEFAULT_CLUSTER_CAPACITY = 1000
+DEFAULT_CLUSTER_EXAMPLES = 3
+# Templates and example lines are cut to this many characters
+MAX_CLUSTER_LINE_CHARS = 500
+# Count-min sketch size: relative overcount is at most ~e/width of the matched lines, with high probability
+SKETCH_WIDTH = 4096
+SKETCH_DEPTH = 4
+
+_ERROR_LEVELS = {"error", "err", "fatal", "panic", "critical", "crit", "emergency", "alert"}
+# (pattern, placeholder, character the pattern needs); passes whose character is absent are skipped
+_MASKS = (
+    (re.compile(r"\b[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}\b"), "<UUID>", "-"),
+    (re.compile(r"\b(?:\d{1,3}\.){3}\d{1,3}(?::\d+)?\b"), "<IP>", "."),
+    # IPv6: four or more groups, or "::" compression; clock times like 12:30:45 are left to <NUM>
+    (re.compile(r"\b(?:[0-9a-fA-F]{1,4}:){3,7}[0-9a-fA-F]{1,4}\b|\b(?:[0-9a-fA-F]{1,4}:)+:(?:[0-9a-fA-F]{1,4}\b)?"), "<IP>", ":"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b(?=[0-9a-fA-F]*\d)[0-9a-fA-F]{12,}\b"), "<HEX>", ""),
+    (re.compile(r"\d+(?:\.\d+)?"), "<NUM>", ""),
+)
+
+# cURL config options that map onto the request; with any other option the request is sent with cURL
+_CURL_HEADER_OPTIONS = ("header", "H")
+_CURL_USER_OPTIONS = ("user", "u")
+_CURL_INSECURE_OPTIONS = ("insecure", "k")
+_CURL_CA_OPTIONS = ("cacert", "capath")
+_CURL_PROXY_OPTIONS = ("proxy", "x")
+
+
+def _parse_curl_config(text: str) -> Tuple[dict, List[str]]:
+    """Parse a cURL ``-K`` config into requests options, and the options that have no equivalent.
+
+    Each line is ``option = value``, ``option: value`` or ``option value``,
+    with an optional leading ``-``/``--`` and an optionally quoted value.
+    ``header``, ``user``, ``insecure``, ``cacert``/``capath`` and ``proxy``
+    become ``headers``, ``auth``, ``verify`` and ``proxies``.
+    """
+    headers: Dict[str, str] = {}
+    options: dict = {"headers": headers}
+    unsupported: List[str] = []
+    insecure = False
+    for raw_line in text.splitlines():
+        line = raw_line.strip()
+        if not line or line.startswith("#"):
+            continue
+        option, _, value = line.partition(" ")
+        if "=" in option or ":" in option:
+            option, _, rest = line.partition("=" if "=" in option else ":")
+            value = rest
+        option = option.strip().lstrip("-")
+        value = value.strip().lstrip("=:").strip()
+        if value[:1] in ("'", '"'):
+            value = shlex.split(value)[0] if value else value
+        if option in _CURL_HEADER_OPTIONS:
+            name, _, header_value = value.partition(":")
+            headers[name.strip()] = header_value.strip()
+        elif option in _CURL_USER_OPTIONS:
+            user, _, password = value.partition(":")
+            options["auth"] = (user, password)
+        elif option in _CURL_INSECURE_OPTIONS:
+            insecure = True
+        elif option in _CURL_CA_OPTIONS:
+            options["verify"] = value
+        elif option in _CURL_PROXY_OPTIONS:
+            options["proxies"] = {"http": value, "https": value}
+        else:
+            unsupported.append(option)
+    if insecure:
+        # As with cURL, --insecure wins over a CA bundle
+        options["verify"] = False
+    return options, unsupported
+
+
+def _system_ca_bundle() -> Union[str, bool]:
+    """Return the system CA bundle cURL verifies against, or True for the requests default."""
+    paths = ssl.get_default_verify_paths()
+    for path in (paths.cafile, paths.capath):
+        if path and os.path.exists(path):
+            return path
+    return True
+
+
+def _loki_stream_entries(data) -> List[Tuple[int, str]]:
+    """Return (timestamp_ns, NDJSON line) for every entry of a Loki streams response, newest first."""
+    result = data.get("data", {}) if isinstance(data, dict) else {}
+    if result.get("resultType", "streams") != "streams":
+        raise Exception(f"Expected a Loki log query, got resultType '{result.get('resultType')}'")
+    entries = []
+    for stream in result.get("result") or []:
+        labels = stream.get("stream", {})
+        for ts, line in stream.get("values", []):
+            entries.append((int(ts), json.dumps({"ts": str(ts), "labels": labels, "line": line})))
+    entries.sort(key=lambda entry: entry[0], reverse=True)
+    return entries
+
+
+def _number_column(column) -> List[float]:
+    """Convert sample values to floats, dropping nulls and NaN."""
+    values = [float(v) for v in column if v is not None]
+    return [v for v in values if v == v]
+
+
+def _last_number(column) -> Optional[float]:
+    """Return the latest sample of a column that is not null or NaN."""
+    for v in reversed(column):
+        if v is not None and float(v) == float(v):
+            return float(v)
+    return None
+
+
+def _query_series(data) -> List[list]:
+    """Return the raw sample values of each series of a Prometheus/Loki API or /api/ds/query response."""
+    if isinstance(data, (str, bytes)):
+        data = json.loads(data)
+    if not isinstance(data, dict):
+        raise Exception(f"Expected a query response object, got {type(data).__name__}")
+    if "results" in data:
+        # /api/ds/query: one data frame per series, value columns are the number fields
+        series = []
+        for ref_id, ref in data["results"].items():
+            if ref.get("error"):
+                raise Exception(f"Query {ref_id} failed: {ref['error']}")
+            for frame in ref.get("frames") or []:
+                columns = frame.get("data", {}).get("values", [])
+                fields = frame.get("schema", {}).get("fields")
+                if fields:
+                    columns = [c for f, c in zip(fields, columns) if f.get("type") == "number"]
+                else:
+                    columns = columns[1:]
+                series.extend(columns)
+        return series
+    if data.get("status") == "error":
+        raise Exception(f"Query failed: {data.get('error')}")
+    result = data.get("data", {})
+    kind = result.get("resultType")
+    if kind == "matrix":
+        return [[v for _, v in s["values"]] for s in result["result"]]
+    if kind == "vector":
+        return [[s["value"][1]] for s in result["result"]]
+    if kind == "scalar":
+        return [[result["result"][1]]]
+    raise Exception(f"Cannot reduce a '{kind}' result; use a metric query")
+
+
+def _percentile(values: Iterable[float], percentile: float) -> float:
+    """Percentile with linear interpolation between the closest ranks."""
+    values = sorted(values)
+    rank = (len(values) - 1) * percentile / 100
+    low = int(rank)
+    high = min(low + 1, len(values) - 1)
+    return values[low] + (values[high] - values[low]) * (rank - low)
+
+
+def _reduce_series(series: List[list], reducer: str, percentile: float) -> Optional[float]:
+    """Reduce the sample columns of a response with the builtins, which loop in C.
+
+    Samples arrive as JSON strings, so each one costs a float() call whatever
+    reduces them afterwards; numpy would not remove that and is not a
+    dependency of this package.
+    """
+    if reducer == "count":
+        return float(len(series))
+    if reducer == "last":
+        lasts = [v for v in map(_last_number, series) if v is not None]
+        return float(sum(lasts)) if lasts else None
+    series = [s for s in map(_number_column, series) if s]
+    if not series:
+        return None
+    if reducer == "max":
+        return max(map(max, series))
+    if reducer == "min":
+        return min(map(min, series))
+    if reducer == "sum":
+        return float(sum(map(sum, series)))
+    if reducer == "avg":
+        return sum(map(sum, series)) / sum(map(len, series))
+    return _percentile(chain.from_iterable(series), percentile)
+
+
+def _mask_line(line: str) -> str:
+    """Replace variable tokens (UUIDs, IPs, hex IDs, numbers) with placeholders."""
+    template = line[:MAX_CLUSTER_LINE_CHARS * 2]
+    for pattern, placeholder, needs in _MASKS:
+        if needs in template:
+            template = pattern.sub(placeholder, template)
+    return template[:MAX_CLUSTER_LINE_CHARS]
+
+
+def _iter_loki_lines(source):
+    """Yield (labels, line) from an NDJSON file path, a Loki streams response or /api/ds/query log frames."""
+    if isinstance(source, str) and "\n" not in source and os.path.isfile(source):
+        with open(source, encoding="utf-8") as f:
+            for raw in f:
+                if raw.strip():
+                    entry = json.loads(raw)
+                    yield entry.get("labels") or {}, entry.get("line", "")
+        return
+    if isinstance(source, (str, bytes)):
+        source = json.loads(source)
+    if "results" in source:
+        for ref in source["results"].values():
+            for frame in ref.get("frames") or []:
+                fields = [f.get("name", "") for f in frame.get("schema", {}).get("fields", [])]
+                columns = dict(zip(fields, frame.get("data", {}).get("values", [])))
+                lines = columns.get("Line") or columns.get("line") or columns.get("body") or []
+                labels = columns.get("labels") or [{}] * len(lines)
+                for label_set, line in zip(labels, lines):
+                    yield (json.loads(label_set) if isinstance(label_set, str) else label_set or {}), line or ""
+        return
+    for stream in source.get("data", {}).get("result") or []:
+        labels = stream.get("stream", {})
+        for _, line in stream.get("values", []):
+            yield labels, line
+
+
+class _CountMinSketch:
+    """Fixed-size frequency estimates; never undercounts."""
+
+    def __init__(self, width: int = SKETCH_WIDTH, depth: int = SKETCH_DEPTH):
+        self.width = width
+        self.rows = [[0] * width for _ in range(depth)]
+
+    def add(self, key: str) -> int:
+        estimate = None
+        for seed, row in enumerate(self.rows):
+            i = hash((seed, key)) % self.width
+            row[i] += 1
+            estimate = row[i] if estimate is None else min(estimate, row[i])
+        return estimate
+
+
+class _TopTemplates:
+    """The most frequent templates, in at most ``capacity`` entries.
+
+    Counts come from a count-min sketch over every template, so a template
+    first seen after the table filled up still competes on its full count.
+    A min-heap holds one (count, template) pair per entry. Counts only grow,
+    so a pair's count is a lower bound: a stale minimum is pushed back with
+    its current count before anything is evicted, and eviction costs
+    O(log capacity) rather than a scan of the table.
+    """
+
+    def __init__(self, capacity: int, max_examples: int):
+        self.capacity = capacity
+        self.max_examples = max_examples
+        self.sketch = _CountMinSketch()
+        self.entries: Dict[str, dict] = {}
+        self._heap: List[Tuple[int, str]] = []
+
+    def add(self, template: str, line: str, labels: dict):
+        count = self.sketch.add(template)
+        entry = self.entries.get(template)
+        if entry is None:
+            if len(self.entries) >= self.capacity:
+                if count <= self._heap[0][0]:
+                    return
+                while True:
+                    stale, smallest = self._heap[0]
+                    current = self.entries[smallest]["count"]
+                    if stale == current:
+                        break
+                    heapq.heapreplace(self._heap, (current, smallest))
+                if count <= current:
+                    return
+                heapq.heapreplace(self._heap, (count, template))
+                del self.entries[smallest]
+            else:
+                heapq.heappush(self._heap, (count, template))
+            entry = self.entries[template] = {"template": template, "count": 0, "examples": [], "labels": labels}
+        entry["count"] = count
+        if len(entry["examples"]) < self.max_examples:
+            entry["examples"].append(line[:MAX_CLUSTER_LINE_CHARS])
+
+    def top(self, k: int) -> List[dict]:
+        return sorted(self.entries.values(), key=lambda e: e["count"], reverse=True)[:k]
+
+
+class _Budget:
+    """Line and byte budget shared by concurrently fetched shards."""
+
+    def __init__(self, max_lines: int, max_bytes: int):
+        self.lines_left = max_lines
+        self.bytes_left = max_bytes
+        self.exhausted = False
+        self._lock = threading.Lock()
+
+    def take(self, entries: List[Tuple[int, str]]) -> int:
+        """Reserve room for as many entries as fit, in order, and return how many did."""
+        with self._lock:
+            taken = 0
+            for _, line in entries:
+                size = len(line) + 1
+                if self.lines_left < 1 or self.bytes_left < size:
+                    self.exhausted = True
+                    break
+                self.lines_left -= 1
+                self.bytes_left -= size
+                taken += 1
+            return taken
+
+
+class Grafana:
+    """
+    Library for querying Grafana datasources over HTTP.
+
+    One connection pool is kept per library instance and reused by every
+    call, so repeated queries against the same Grafana reuse TLS connections.
+    """
+
+    ROBOT_LIBRARY_SCOPE = "GLOBAL"
+    ROBOT_LIBRARY_VERSION = "1.0.0"
+
+    def __init__(self, timeout: int = DEFAULT_TIMEOUT_SECONDS, pool_size: int = DEFAULT_POOL_SIZE):
+        self.timeout = float(timeout)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=int(pool_size), pool_maxsize=int(pool_size))
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        # Verify against the same CA bundle as cURL rather than certifi's
+        self.session.verify = _system_ca_bundle()
+
+    @staticmethod
+    def _request_options(headers) -> dict:
+        """Build headers/auth/verify/proxies from the HEADERS secret (a secret, a file path or the file content).
+
+        Parsed once per keyword call. If the config uses an option the session
+        cannot apply, ``curl_config`` holds the config so the request goes
+        through cURL.
+        """
+        if not headers:
+            return {}
+        content = getattr(headers, "value", headers)
+        if isinstance(content, str) and "\n" not in content and os.path.isfile(content):
+            with open(content, encoding="utf-8") as f:
+                content = f.read()
+        options, unsupported = _parse_curl_config(str(content))
+        if unsupported:
+            logger.info(f"HEADERS uses cURL options {', '.join(unsupported)}; sending requests with cURL")
+            return {"curl_config": str(content)}
+        return options
+
+    def _request(self, method: str, url: str, options: dict, **kwargs) -> Union[dict, list, str]:
+        if "curl_config" in options:
+            return self._curl_request(method, url, options["curl_config"], **kwargs)
+        options = dict(options)
+        request_headers = dict(options.pop("headers", {}))
+        request_headers.update(kwargs.pop("extra_headers", {}))
+        try:
+            response = self.session.request(
+                method, url, headers=request_headers, timeout=self.timeout, **options, **kwargs
+            )
+        except requests.RequestException as e:
+            raise Exception(f"Request to {url} failed: {str(e)}")
+        if response.status_code >= 400:
+            raise Exception(f"Grafana returned HTTP {response.status_code} for {url}: {response.text[:1000]}")
+        try:
+            return response.json()
+        except ValueError:
+            return response.text
+
+    def _curl_request(
+        self, method: str, url: str, config: str, params: Optional[dict] = None, data: Optional[bytes] = None,
+        extra_headers: Optional[dict] = None
+    ) -> Union[dict, list, str]:
+        """Send the request with ``curl -K <config>``, for configs the session cannot apply."""
+        target = f"{url}?{urlencode(params)}" if params else url
+        command = ["curl", "-sS", "-X", method, "--max-time", str(self.timeout), "-w", "\n%{http_code}"]
+        for name, value in (extra_headers or {}).items():
+            command += ["-H", f"{name}: {value}"]
+        if data is not None:
+            command += ["--data-binary", "@-"]
+        # The config holds credentials: write it to a private file rather than the command line
+        fd, config_path = tempfile.mkstemp(prefix="grafana-headers-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(config)
+            result = subprocess.run(command + ["-K", config_path, target], input=data or b"", capture_output=True)
+        except OSError as e:
+            raise Exception(f"Request to {url} failed: {str(e)}")
+        finally:
+            os.remove(config_path)
+        if result.returncode != 0:
+            raise Exception(f"Request to {url} failed: {result.stderr.decode('utf-8', 'replace').strip()}")
+        text, _, status = result.stdout.decode("utf-8", "replace").rpartition("\n")
+        if int(status) >= 400:
+            raise Exception(f"Grafana returned HTTP {status} for {url}: {text[:1000]}")
+        try:
+            return json.loads(text)
+        except ValueError:
+            return text
+
+    def datasource_proxy_get(
+        self, grafana_url: str, datasource: str, path: str, params: Optional[dict] = None, headers=None
+    ) -> Union[dict, list, str]:
+        """
+        GET a datasource API through Grafana's datasource proxy and return the parsed JSON.
+
+        Args:
+            grafana_url: Base URL of Grafana (e.g. https://my-grafana.org)
+            datasource: Numeric datasource ID, or ``uid/<uid>``
+            path: Datasource API path (e.g. api/v1/query_range or loki/api/v1/query_range)
+            params: Query string parameters
+            headers: HEADERS secret in cURL -K format (optional)
+
+        Returns:
+            Parsed JSON response (or the raw text if it is not JSON)
+
+        Example:
+            | &{params}= | Create Dictionary | query=up | start=${start} | end=${end} | step=30s |
+            | ${data}= | RW.Grafana.Datasource Proxy Get | ${GRAFANA_URL} | uid/${DATASOURCE_UID} | api/v1/query_range | ${params} | headers=${HEADERS} |
+        """
+        url = f"{grafana_url.rstrip('/')}/api/datasources/proxy/{datasource.strip('/')}/{path.lstrip('/')}"
+        return self._request("GET", url, self._request_options(headers), params=params or {})
+
+    def datasource_query(
+        self, grafana_url: str, body: Union[str, dict], ds_type: str, datasource_uid: str, headers=None
+    ) -> Union[dict, list, str]:
+        """
+        POST a query to Grafana's /api/ds/query and return the parsed JSON.
+
+        Args:
+            grafana_url: Base URL of Grafana (e.g. https://my-grafana.org)
+            body: Request body, as a dictionary or a JSON string
+            ds_type: Datasource type (e.g. loki, prometheus)
+            datasource_uid: UID of the datasource
+            headers: HEADERS secret in cURL -K format (optional)
+
+        Returns:
+            Parsed JSON response (or the raw text if it is not JSON)
+
+        Example:
+            | ${data}= | RW.Grafana.Datasource Query | ${GRAFANA_URL} | ${json_body} | loki | ${DATASOURCE_UID} | headers=${HEADERS} |
+        """
+        url = f"{grafana_url.rstrip('/')}/api/ds/query"
+        data = body if isinstance(body, str) else json.dumps(body)
+        return self._request(
+            "POST", url, self._request_options(headers), params={"ds_type": ds_type}, data=data.encode("utf-8"),
+            extra_headers={
+                "Content-Type": "application/json",
+                "Accept": "application/json",
+                "X-Datasource-Uid": datasource_uid,
+                "X-Plugin-Id": ds_type,
+            },
+        )
+
+    def _fetch_loki_shard(
+        self, url: str, query: str, start_ns: int, end_ns: int, page_limit: int, options: dict, budget: _Budget
+    ) -> Tuple[List[Tuple[int, str]], int, bool]:
+        """Page backward through [start_ns, end_ns).
+
+        Returns the entries (newest first), the page count, and whether lines
+        were skipped because more of them share one timestamp than a single
+        Loki query returns.
+        """
+        entries: List[Tuple[int, str]] = []
+        pages = 0
+        skipped = False
+        end = end_ns
+        seen_at_boundary = set()
+        while not budget.exhausted:
+            params = {
+                "query": query, "start": str(start_ns), "end": str(end),
+                "limit": str(page_limit), "direction": "backward",
+            }
+            page = _loki_stream_entries(self._request("GET", url, options, params=params))
+            pages += 1
+            fresh = [entry for entry in page if entry[1] not in seen_at_boundary]
+            taken = budget.take(fresh)
+            entries.extend(fresh[:taken])
+            if taken < len(fresh) or len(page) < page_limit:
+                break
+            # Loki's end is exclusive: ask again up to and including the oldest timestamp
+            # seen, skipping the entries at that timestamp that were already returned.
+            oldest = page[-1][0]
+            if fresh:
+                end = oldest + 1
+                seen_at_boundary = {line for ts, line in page if ts == oldest}
+            else:
+                # At least a page of lines shares one timestamp. Read that timestamp
+                # alone, raising the limit until every line at it fits, then move past it.
+                limit = page_limit
+                while len(page) >= limit and limit < LOKI_MAX_ENTRIES_PER_QUERY:
+                    limit = min(limit * 2, LOKI_MAX_ENTRIES_PER_QUERY)
+                    params = dict(params, start=str(oldest), end=str(oldest + 1), limit=str(limit))
+                    page = _loki_stream_entries(self._request("GET", url, options, params=params))
+                    pages += 1
+                fresh = [entry for entry in page if entry[1] not in seen_at_boundary]
+                taken = budget.take(fresh)
+                entries.extend(fresh[:taken])
+                if taken < len(fresh):
+                    break
+                skipped = skipped or len(page) >= limit
+                end = oldest
+                seen_at_boundary = set()
+            if end <= start_ns:
+                break
+        return entries, pages, skipped
+
+    def _write_loki_shard(
+        self, path: str, url: str, query: str, start_ns: int, end_ns: int, page_limit: int, options: dict,
+        budget: _Budget
+    ) -> Tuple[int, int, int, bool]:
+        """Fetch one slice and write it to ``path`` in ascending order, so only running slices stay in memory.
+
+        Returns the line count, byte count, page count, and the skipped flag
+        of :meth:`_fetch_loki_shard`.
+        """
+        entries, pages, skipped = self._fetch_loki_shard(url, query, start_ns, end_ns, page_limit, options, budget)
+        written = 0
+        with open(path, "w", encoding="utf-8") as f:
+            for _, line in reversed(entries):
+                f.write(line)
+                f.write("\n")
+                written += len(line) + 1
+        return len(entries), written, pages, skipped
+
+    def loki_query_range_paged(
+        self, grafana_url: str, datasource: str, query: str, start_ns: int, end_ns: int, output_file: str,
+        page_limit: int = DEFAULT_LOKI_PAGE_LIMIT, shards: int = DEFAULT_LOKI_SHARDS,
+        max_workers: int = DEFAULT_LOKI_WORKERS, max_lines: int = DEFAULT_LOKI_MAX_LINES,
+        max_bytes: int = DEFAULT_LOKI_MAX_BYTES, headers=None
+    ) -> dict:
+        """
+        Read every log line of a Loki query over a time range, beyond a single ``limit``.
+
+        The range is split into ``shards`` equal time slices, fetched on at most
+        ``max_workers`` threads through the datasource proxy. Each slice is paged
+        backward from its end, using the oldest timestamp seen as the next end.
+        Lines are written to ``output_file`` as NDJSON in ascending time order,
+        one ``{"ts": "<ns>", "labels": {...}, "line": "..."}`` object per line.
+        Each slice is written to ``<output_file>.<n>.part`` as soon as it is
+        read and the parts are joined at the end, so only the slices being
+        fetched are held in memory.
+
+        Reading stops once ``max_lines`` lines or ``max_bytes`` bytes of NDJSON
+        were collected, and the result has ``truncated`` set. When more lines
+        share one timestamp than a page holds, that timestamp is read again on
+        its own with a larger limit; past Loki's 5000-entry query limit the
+        rest are skipped and ``truncated`` is set too. Newer slices are
+        started first, so a truncated result favours the most recent lines.
+
+        Args:
+            grafana_url: Base URL of Grafana (e.g. https://my-grafana.org)
+            datasource: Numeric datasource ID, or ``uid/<uid>``
+            query: LogQL log query
+            start_ns: Start of the range, in nanoseconds since the epoch
+            end_ns: End of the range (exclusive), in nanoseconds since the epoch
+            output_file: Path of the NDJSON file to write
+            page_limit: Lines requested per page, Loki's ``limit`` (default: 1000)
+            shards: Number of time slices (default: 8)
+            max_workers: Maximum number of slices fetched at once (default: 4)
+            max_lines: Stop after this many lines (default: 100000)
+            max_bytes: Stop after this many bytes of NDJSON (default: 64 MiB)
+            headers: HEADERS secret in cURL -K format (optional)
+
+        Returns:
+            Dictionary with ``output_file``, ``lines``, ``bytes``, ``pages``,
+            ``shards`` and ``truncated``
+
+        Example:
+            | ${start}    ${end}= | Convert Times To Epoch | 6h,${EMPTY} | unit=ns |
+            | ${logs}= | RW.Grafana.Loki Query Range Paged | ${GRAFANA_URL} | uid/${DATASOURCE_UID} | {app="api"} |= "error" | ${start} | ${end} | ${CODEBUNDLE_TEMP_DIR}/loki.jsonl | headers=${HEADERS} |
+        """
+        start_ns, end_ns = int(start_ns), int(end_ns)
+        if end_ns <= start_ns:
+            raise Exception(f"Loki range end {end_ns} is not after start {start_ns}")
+        url = f"{grafana_url.rstrip('/')}/api/datasources/proxy/{datasource.strip('/')}/loki/api/v1/query_range"
+        shards = max(1, min(int(shards), end_ns - start_ns))
+        bounds = [start_ns + (end_ns - start_ns) * i // shards for i in range(shards + 1)]
+        budget = _Budget(int(max_lines), int(max_bytes))
+        options = self._request_options(headers)
+
+        parts = [f"{output_file}.{i}.part" for i in range(shards)]
+        executor = ThreadPoolExecutor(max_workers=max(1, min(int(max_workers), shards)))
+        try:
+            # Newest slice first, so the budget goes to the most recent lines
+            futures = {
+                i: executor.submit(
+                    self._write_loki_shard, parts[i], url, query, bounds[i], bounds[i + 1], int(page_limit),
+                    options, budget
+                )
+                for i in reversed(range(shards))
+            }
+            wait(futures.values())
+
+            lines = written = pages = 0
+            skipped = False
+            with open(output_file, "w", encoding="utf-8") as f:
+                for i in range(shards):
+                    try:
+                        shard_lines, shard_bytes, shard_pages, shard_skipped = futures[i].result()
+                    except Exception as e:
+                        raise Exception(f"Failed to read Loki shard {bounds[i]}-{bounds[i + 1]}: {str(e)}")
+                    with open(parts[i], encoding="utf-8") as part:
+                        shutil.copyfileobj(part, f)
+                    lines += shard_lines
+                    written += shard_bytes
+                    pages += shard_pages
+                    skipped = skipped or shard_skipped
+        finally:
+            executor.shutdown(wait=True, cancel_futures=True)
+            for part in parts:
+                if os.path.exists(part):
+                    os.remove(part)
+        return {
+            "output_file": output_file,
+            "lines": lines,
+            "bytes": written,
+            "pages": pages,
+            "shards": shards,
+            "truncated": budget.exhausted or skipped,
+        }
+
+    def reduce_query_result(
+        self, data, reducer: str = "last", percentile: float = DEFAULT_PERCENTILE, default: Optional[float] = None
+    ) -> float:
+        """
+        Reduce a metric query response to a single number.
+
+        Accepts the response of a Prometheus-compatible or Loki metric query,
+        from the datasource proxy (matrix, vector or scalar) or from
+        /api/ds/query (data frames), as parsed data or a JSON string. Null and
+        NaN samples are ignored.
+
+        Reducers:
+        - ``last``: the latest value of each series, summed across series
+        - ``max``, ``min``, ``avg``, ``sum``: over every value of every series
+        - ``percentile``: the ``percentile``-th percentile of every value
+        - ``count``: the number of series
+
+        Args:
+            data: Parsed query response, or its JSON text
+            reducer: One of last, max, min, avg, sum, count, percentile (default: last)
+            percentile: Percentile for the ``percentile`` reducer, 0-100 (default: 95)
+            default: Value returned when there are no samples (default: raise an error)
+
+        Returns:
+            The reduced value as a float
+
+        Example:
+            | ${data}= | RW.Grafana.Datasource Proxy Get | ${GRAFANA_URL} | uid/${DATASOURCE_UID} | api/v1/query_range | ${params} |
+            | ${p99}= | RW.Grafana.Reduce Query Result | ${data} | percentile | percentile=99 |
+            | RW.Core.Push Metric | ${p99} |
+        """
+        reducer = reducer.strip().lower()
+        if reducer not in REDUCERS:
+            raise Exception(f"Unknown reducer '{reducer}'; expected one of {', '.join(REDUCERS)}")
+        percentile = float(percentile)
+        if not 0 <= percentile <= 100:
+            raise Exception(f"Percentile must be between 0 and 100, got {percentile}")
+        value = _reduce_series(_query_series(data), reducer, percentile)
+        if value is None:
+            if default is None:
+                raise Exception(f"Query returned no samples to reduce with '{reducer}'")
+            return float(default)
+        return value
+
+    def cluster_loki_log_lines(
+        self, source, top_k: int = DEFAULT_TOP_CLUSTERS, error_pattern: str = DEFAULT_ERROR_PATTERN,
+        max_examples: int = DEFAULT_CLUSTER_EXAMPLES, capacity: int = DEFAULT_CLUSTER_CAPACITY
+    ) -> dict:
+        """
+        Group Loki error lines by template and return the most frequent templates.
+
+        A line is an error when its ``level`` or ``detected_level`` label is an
+        error level, or when it matches ``error_pattern`` (an empty pattern
+        keeps every line). Its template is the line with UUIDs, IPs, hex IDs
+        and numbers replaced by ``<UUID>``, ``<IP>``, ``<HEX>`` and ``<NUM>``.
+
+        Lines are read one at a time, and memory stays bounded however many
+        there are: template counts are kept in a fixed-size count-min sketch,
+        and only the ``capacity`` most frequent templates keep their examples.
+        Counts can be slightly overestimated when there are many distinct
+        templates, but never underestimated.
+
+        Args:
+            source: NDJSON file written by Loki Query Range Paged, or a Loki
+                query_range response (parsed, or its JSON text) from the proxy or /api/ds/query
+            top_k: Number of clusters to return (default: 10)
+            error_pattern: Regular expression for error lines; empty keeps all lines
+            max_examples: Example lines kept per cluster (default: 3)
+            capacity: Templates tracked at once (default: 1000)
+
+        Returns:
+            Dictionary with ``lines`` (lines read), ``matched`` (error lines) and
+            ``clusters``, a list of ``template``, ``count``, ``examples`` and the
+            ``labels`` of the first line, most frequent first
+
+        Example:
+            | ${result}= | RW.Grafana.Cluster Loki Log Lines | ${CODEBUNDLE_TEMP_DIR}/loki_query.jsonl | top_k=5 |
+            | FOR | ${cluster} | IN | @{result}[clusters] |
+            |     | RW.Core.Add Issue | title=${cluster}[count] log lines like: ${cluster}[template] | ... |
+            | END |
+        """
+        matcher = re.compile(error_pattern) if error_pattern else None
+        top = _TopTemplates(max(int(capacity), int(top_k)), int(max_examples))
+        lines = matched = 0
+        for labels, line in _iter_loki_lines(source):
+            lines += 1
+            if matcher is not None:
+                level = str(labels.get("level") or labels.get("detected_level") or "").lower()
+                if level not in _ERROR_LEVELS and not matcher.search(line):
+                    continue
+            matched += 1
+            top.add(_mask_line(line), line, labels)
+        return {"lines": lines, "matched": matched, "clusters": top.top(int(top_k))}
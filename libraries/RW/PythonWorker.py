@@ -0,0 +1,487 @@
+"""
+RW.PythonWorker - Library for running generic python scripts in a warm worker
+
+The tool-builder and generics-editor codebundles run a user's python script
+with ``python << 'RW_GENERIC_EOF'`` through RW.CLI, so every run pays for a
+new interpreter and for re-importing requests, yaml or the kubernetes client.
+This library keeps a zygote process per user, python and preload list that has
+already imported those modules. Each run is a fresh fork of it: the child gets
+the run's environment (built the way RW.CLI builds it), works in
+CODEBUNDLE_TEMP_DIR, executes the script as ``__main__`` with the same
+trailer the heredoc appends, and is killed with its process group on timeout.
+The zygote exits by itself after ``idle_seconds`` without a request, or
+when asked to with ``Stop Python Worker``.
+
+Where fork or unix sockets are unavailable the script runs in a new
+``python -`` process instead, which is what the heredoc did.
+
+This module only uses the standard library so the zygote can run it as a
+script under whichever python is on PATH.
+
+Author: RunWhen
+"""
+
+import atexit
+import hashlib
+import importlib
+import json
+import os
+import re
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import traceback
+import types
+from collections import namedtuple
+
+
+DEFAULT_PRELOAD = 'json,os,re,datetime,subprocess,requests,yaml'
+DEFAULT_IDLE_SECONDS = 900
+DEFAULT_TIMEOUT_SECONDS = 300
+START_TIMEOUT_SECONDS = 30
+SECRET_PREFIX = 'secret__'
+SECRET_FILE_PREFIX = 'secret_file__'
+
+# Taken from the Robot process by RW.CLI before the run's env is overlaid
+_INHERITED_ENV_KEYS = (
+    'HTTP_PROXY', 'HTTPS_PROXY', 'NO_PROXY',
+    'REQUESTS_CA_BUNDLE', 'CURL_CA_BUNDLE',
+    'SSL_CERT_FILE', 'NODE_EXTRA_CA_CERTS',
+)
+# RW.CLI unescapes Robot's \%{ before handing the command to bash
+_RF_ENV_PATTERN = re.compile(r'\\%(?=\{)')
+_POLL_SECONDS = 0.005
+
+WorkerResult = namedtuple('WorkerResult', 'stdout stderr returncode errors')
+
+
+OUTPUT_FORMATS = ('json', 'ndjson')
+
+
+def _main_trailer(output_file, output_format='json'):
+    """The lines the codebundles append after the script in the heredoc.
+
+    In ndjson mode main() may be a generator; each item is written as one
+    line and reaches the file as soon as it is yielded.
+    """
+    path = f'path = os.path.join(os.environ["CODEBUNDLE_TEMP_DIR"], "{output_file}")'
+    if output_format == 'ndjson':
+        return [
+            'import json, os',
+            path,
+            'f = open(path, "w", encoding="utf-8", buffering=1)',
+            'for issue in main() or []: f.write(json.dumps(issue) + "\\n")',
+            'f.close()',
+        ]
+    return [
+        'import json, os',
+        'resp = main()',
+        path,
+        'f = open(path, "w", encoding="utf-8")',
+        'json.dump(resp, f)',
+        'f.close()',
+    ]
+
+
+def _read_all(conn):
+    chunks = []
+    while True:
+        chunk = conn.recv(65536)
+        if not chunk:
+            return b''.join(chunks)
+        chunks.append(chunk)
+
+
+def _exit_code(exc):
+    """Map SystemExit to the status the interpreter would exit with."""
+    code = exc.code
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code & 0xFF
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _finish(rc):
+    """Interpreter shutdown for a forked run: join threads, run atexit, flush."""
+    current = threading.current_thread()
+    for thread in threading.enumerate():
+        if thread is not current and not thread.daemon:
+            thread.join()
+    try:
+        atexit._run_exitfuncs()
+    except BaseException:
+        traceback.print_exc()
+    for stream in (sys.stdout, sys.stderr):
+        try:
+            stream.flush()
+        except Exception:
+            pass
+    return rc
+
+
+def _run_script(request, stdout_path, stderr_path):
+    """Body of the forked run; never returns."""
+    rc = 70
+    try:
+        os.setpgrp()
+        for signum in (signal.SIGCHLD, signal.SIGTERM, signal.SIGINT, signal.SIGPIPE):
+            signal.signal(signum, signal.SIG_DFL)
+        null = os.open(os.devnull, os.O_RDONLY)
+        os.dup2(null, 0)
+        os.close(null)
+        for target, path in ((1, stdout_path), (2, stderr_path)):
+            fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            os.dup2(fd, target)
+            os.close(fd)
+        os.environ.clear()
+        os.environ.update(request['env'])
+        os.chdir(request['cwd'])
+        # What python reading the heredoc from stdin sees
+        sys.argv = ['']
+        sys.path.insert(0, '')
+        main_module = types.ModuleType('__main__')
+        sys.modules['__main__'] = main_module
+        rc = 0
+        try:
+            exec(compile(request['source'], '<stdin>', 'exec'), main_module.__dict__)
+        except SystemExit as e:
+            rc = _exit_code(e)
+        except BaseException:
+            etype, value, tb = sys.exc_info()
+            traceback.print_exception(etype, value, tb.tb_next)
+            rc = 1
+        rc = _finish(rc)
+    finally:
+        os._exit(rc)
+
+
+def _wait(pid, timeout_seconds):
+    """Wait for the forked run; kill its process group at the deadline.
+
+    Returns the exit status, or None when it timed out.
+    """
+    deadline = time.monotonic() + timeout_seconds
+    while True:
+        wpid, status = os.waitpid(pid, os.WNOHANG)
+        if wpid:
+            return os.waitstatus_to_exitcode(status)
+        if time.monotonic() >= deadline:
+            try:
+                os.killpg(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                # The run has not called setpgrp yet, so it has no group (or children)
+                os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            return None
+        time.sleep(_POLL_SECONDS)
+
+
+def _serve(conn):
+    """Handle one request in a child of the zygote: fork the run and report back."""
+    request = json.loads(_read_all(conn))
+    if request.get('stop'):
+        # The zygote is this process's parent
+        os.kill(os.getppid(), signal.SIGTERM)
+        conn.sendall(json.dumps({'stopped': True}).encode())
+        conn.close()
+        return
+    scratch = tempfile.mkdtemp(prefix='rw_pyworker_')
+    try:
+        stdout_path = os.path.join(scratch, 'stdout')
+        stderr_path = os.path.join(scratch, 'stderr')
+        sys.stdout.flush()
+        sys.stderr.flush()
+        pid = os.fork()
+        if pid == 0:
+            conn.close()
+            _run_script(request, stdout_path, stderr_path)
+        returncode = _wait(pid, float(request['timeout']))
+        output = {}
+        for name, path in (('stdout', stdout_path), ('stderr', stderr_path)):
+            try:
+                with open(path, encoding='utf-8', errors='replace') as f:
+                    output[name] = f.read()
+            except FileNotFoundError:
+                output[name] = ''
+        errors = []
+        if returncode is None:
+            returncode = -1
+            errors.append(f"Command timed out after {request['timeout']} seconds")
+        conn.sendall(json.dumps({'returncode': returncode, 'errors': errors, **output}).encode())
+    finally:
+        shutil.rmtree(scratch, ignore_errors=True)
+        conn.close()
+
+
+def _bind(socket_path):
+    """Bind the zygote's socket, replacing a stale one. Returns None if a live zygote owns it."""
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        listener.bind(socket_path)
+        listener.listen(64)
+        return listener
+    except OSError:
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(socket_path)
+            listener.close()
+            return None
+        except OSError:
+            os.unlink(socket_path)
+            listener.bind(socket_path)
+            listener.listen(64)
+            return listener
+        finally:
+            probe.close()
+
+
+def _stop_zygote(signum, frame):
+    raise SystemExit(0)
+
+
+def _zygote_main(socket_path, preload, idle_seconds):
+    """Import the preload modules, then fork one child per request until idle."""
+    for name in preload:
+        try:
+            importlib.import_module(name)
+        except Exception:
+            pass
+    listener = _bind(socket_path)
+    if listener is None:
+        return
+    try:
+        os.chmod(socket_path, 0o600)
+        listener.settimeout(idle_seconds)
+        # Request children are reaped by the kernel; each one waits on its own run
+        signal.signal(signal.SIGCHLD, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, _stop_zygote)
+        while True:
+            try:
+                conn, _ = listener.accept()
+            except socket.timeout:
+                break
+            conn.settimeout(None)
+            sys.stdout.flush()
+            sys.stderr.flush()
+            pid = os.fork()
+            if pid == 0:
+                rc = 0
+                try:
+                    listener.close()
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                    _serve(conn)
+                except BaseException:
+                    traceback.print_exc()
+                    rc = 1
+                finally:
+                    os._exit(rc)
+            conn.close()
+    finally:
+        listener.close()
+        try:
+            os.unlink(socket_path)
+        except OSError:
+            pass
+
+
+class PythonWorker:
+    """Run generic python scripts from a pre-imported, forking zygote."""
+
+    ROBOT_LIBRARY_SCOPE = 'GLOBAL'
+
+    def __init__(self, preload=DEFAULT_PRELOAD, idle_seconds=DEFAULT_IDLE_SECONDS):
+        if isinstance(preload, str):
+            preload = [name.strip() for name in preload.split(',') if name.strip()]
+        self.preload = list(preload)
+        self.idle_seconds = float(idle_seconds)
+        # Interpreter name -> resolved paths of the zygotes this instance ran scripts on
+        self._zygotes = {}
+
+    def _socket_path(self, python):
+        key = hashlib.sha256(json.dumps([python, self.preload, __file__]).encode()).hexdigest()[:16]
+        directory = os.path.join(tempfile.gettempdir(), f'rw-pyworker-{os.getuid()}')
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        return os.path.join(directory, f'{key}.sock')
+
+    def _start_zygote(self, python, socket_path):
+        args = [python, os.path.abspath(__file__), socket_path, ','.join(self.preload), str(self.idle_seconds)]
+        subprocess.Popen(
+            args,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL,
+            start_new_session=True,
+            close_fds=True,
+        )
+
+    def _connect(self, python, start=True):
+        """Connect to the zygote for ``python``, starting it if needed (None if not running and not ``start``)."""
+        socket_path = self._socket_path(python)
+        started = False
+        deadline = time.monotonic() + START_TIMEOUT_SECONDS
+        while True:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                conn.connect(socket_path)
+                return conn
+            except (FileNotFoundError, ConnectionRefusedError):
+                conn.close()
+                if not start:
+                    return None
+            if not started:
+                self._start_zygote(python, socket_path)
+                started = True
+            if time.monotonic() >= deadline:
+                raise Exception(f'python worker for {python} did not start within {START_TIMEOUT_SECONDS}s')
+            time.sleep(0.02)
+
+    def _run_cold(self, python, source, env, cwd, timeout_seconds):
+        """The heredoc path: a new interpreter reading the script from stdin."""
+        try:
+            p = subprocess.run(
+                [python, '-'],
+                input=source,
+                text=True,
+                capture_output=True,
+                timeout=timeout_seconds,
+                env=env,
+                cwd=cwd,
+            )
+        except subprocess.TimeoutExpired:
+            return WorkerResult('', '', -1, [f'Command timed out after {timeout_seconds} seconds'])
+        return WorkerResult(p.stdout, p.stderr, p.returncode, [])
+
+    def run_python_main(
+        self,
+        script,
+        env=None,
+        output_file='run_output.json',
+        output_format='json',
+        timeout_seconds=DEFAULT_TIMEOUT_SECONDS,
+        python='python',
+        **kwargs,
+    ):
+        """Run a generic python script's main() and write its result to output_file.
+
+        Behaves like running the script through RW.CLI in a
+        ``python << 'RW_GENERIC_EOF'`` heredoc: the environment is built from the
+        proxy and CA variables of this process plus ``env``, ``secret_file__``
+        kwargs are written to CODEBUNDLE_TEMP_DIR with their path in the
+        environment, the script runs in CODEBUNDLE_TEMP_DIR and the value of
+        main() is dumped as JSON to CODEBUNDLE_TEMP_DIR/output_file. As with
+        RW.CLI, CODEBUNDLE_TEMP_DIR is added to ``env`` when missing.
+
+        Args:
+            script: decoded python source defining main()
+            env: environment variables for the run
+            output_file: file name for the result of main()
+            output_format: json (the value of main()) or ndjson (one line per item main() yields)
+            timeout_seconds: seconds before the run and its children are killed
+            python: interpreter to run the script with, looked up on PATH
+            kwargs: ``secret__NAME`` / ``secret_file__NAME`` secrets
+
+        Returns:
+            An object with stdout, stderr, returncode and errors, like RW.CLI.Run Cli;
+            a timeout gives returncode -1 and an error message
+
+        Example:
+            | ${rsp}= | RW.PythonWorker.Run Python Main | ${decoded_script} | env=${raw_env_vars} | &{secret_kwargs} |
+        """
+        if output_format not in OUTPUT_FORMATS:
+            raise Exception(f"output_format must be one of {', '.join(OUTPUT_FORMATS)}, got '{output_format}'")
+        env = {} if env is None else env
+        codebundle_temp_dir = os.getenv('CODEBUNDLE_TEMP_DIR')
+        if codebundle_temp_dir and 'CODEBUNDLE_TEMP_DIR' not in env:
+            env['CODEBUNDLE_TEMP_DIR'] = codebundle_temp_dir
+        cwd = codebundle_temp_dir or os.getcwd()
+        os.makedirs(cwd, exist_ok=True)
+
+        run_env = {key: os.environ[key] for key in _INHERITED_ENV_KEYS if os.environ.get(key)}
+        run_env.update(env)
+        for name, secret in kwargs.items():
+            if not name.startswith((SECRET_PREFIX, SECRET_FILE_PREFIX)):
+                continue
+            if not hasattr(secret, 'value'):
+                raise Exception(f'kwarg secret {name} should be a platform.Secret')
+            key = getattr(secret, 'key', None) or name.split('__', 1)[1]
+            if name.startswith(SECRET_FILE_PREFIX):
+                secret_path = os.path.join(cwd, key)
+                with open(secret_path, 'w') as f:
+                    f.write(secret.value)
+                run_env[key] = secret_path
+            else:
+                run_env[key] = secret.value
+        run_env = {k: str(v) for k, v in run_env.items() if v is not None}
+
+        source = _RF_ENV_PATTERN.sub('%', '\n'.join([script, *_main_trailer(output_file, output_format)]))
+        timeout_seconds = float(timeout_seconds)
+        requested, python = python, shutil.which(python, path=run_env.get('PATH')) or python
+        if not hasattr(os, 'fork') or not hasattr(socket, 'AF_UNIX'):
+            return self._run_cold(python, source, run_env, cwd, timeout_seconds)
+        self._zygotes.setdefault(requested, set()).add(python)
+
+        request = {'source': source, 'env': run_env, 'cwd': cwd, 'timeout': timeout_seconds}
+        conn = self._connect(python)
+        try:
+            conn.sendall(json.dumps(request).encode())
+            conn.shutdown(socket.SHUT_WR)
+            reply = _read_all(conn)
+        finally:
+            conn.close()
+        if not reply:
+            raise Exception('python worker closed the connection without a result')
+        result = json.loads(reply)
+        return WorkerResult(result['stdout'], result['stderr'], result['returncode'], result['errors'])
+
+
+    def stop_python_worker(self, python=None):
+        """Stop the zygotes this library ran scripts on.
+
+        Runs already forked from a zygote finish normally; the next Run Python
+        Main starts a new one. The interpreter is stopped as Run Python Main
+        resolved it, on the PATH of the run's ``env``.
+
+        Args:
+            python: only stop the zygote for this interpreter, as given to Run Python Main
+                (default: all of them)
+
+        Returns:
+            True if a running zygote was asked to stop
+
+        Example:
+            | RW.PythonWorker.Stop Python Worker |
+        """
+        if python is None:
+            names = list(self._zygotes)
+        else:
+            names = [python]
+        stopped = False
+        for name in names:
+            for resolved in self._zygotes.pop(name, set()):
+                stopped = self._stop_zygote(resolved) or stopped
+        return stopped
+
+    def _stop_zygote(self, python):
+        conn = self._connect(python, start=False)
+        if conn is None:
+            return False
+        try:
+            conn.sendall(json.dumps({'stop': True}).encode())
+            conn.shutdown(socket.SHUT_WR)
+            reply = _read_all(conn)
+        finally:
+            conn.close()
+        return bool(reply) and json.loads(reply).get('stopped', False)
+
+if __name__ == '__main__':
+    # Run as the zygote: keep this library's directory off the import path
+    del sys.path[0]
+    _zygote_main(sys.argv[1], [name for name in sys.argv[2].split(',') if name], float(sys.argv[3]))
@@ -8,6 +8,9 @@ Robot keywords (callable from .robot files):
 - ``Convert Relative Time To Nano Epoch``
 - ``Convert Duration To Sec``
 - ``Convert Duration To Ms``
+- ``Convert Times To Epoch``
+- ``Convert Durations``
+- ``Plan Range Query``
 
 All three accept a string like ``30m``, ``2h``, ``2d`` (suffix ``s/m/h/d``) and
 return the corresponding epoch value of "now - X" in the requested unit.
@@ -24,17 +27,121 @@ Example:
     | ${start_ns}=  | Convert Relative Time To Nano Epoch | 2h |
     | ${start_ms}=  | Convert Relative Time To Ms Epoch   | 2h |
     | ${start_sec}= | Convert Relative Time To Sec Epoch  | 2h |
+
+Batch keywords
+--------------
+
+``Convert Times To Epoch`` and ``Convert Durations`` convert a list (or a
+comma-separated string) in one call. They read the clock once per call, so a
+start and end computed together refer to the same "now", and they use
+``time.time_ns()`` so results keep sub-second precision. They also accept
+compound durations (``1h30m``, ``500ms``, ``1w``) and, for times, RFC3339 /
+ISO 8601 timestamps, which are parsed to epoch values:
+
+    | ${start_ms}  | ${end_ms}= | Convert Times To Epoch | 2h,30m | unit=ms |
+    | ${start_ns}  | ${end_ns}= | Convert Times To Epoch | 2024-05-01T10:00:00Z,1h30m | unit=ns |
+    | ${step_ms}=  | Convert Durations | 1m30s | unit=ms |
+
+Range query planning
+--------------------
+
+``Plan Range Query`` picks the step of a Prometheus-style range query from
+the range, a point budget and the scrape interval, and aligns start and end
+to multiples of the step so repeated queries hit upstream result caches:
+
+    | ${plan}= | Plan Range Query | 7d | ${EMPTY} | max_points=1000 | scrape_interval=30s |
+    | # ${plan}[start], ${plan}[end], ${plan}[step] ("15m"), ${plan}[step_ms], ${plan}[points] |
 """
 
 from __future__ import annotations
 
 import re
 import time
-from typing import Tuple, Union
+from datetime import datetime, timezone
+from typing import List, Sequence, Tuple, Union
+
+from dateutil import parser as date_parser
 
 _RELATIVE_RE = re.compile(r"^(\d+)([smhd])$")
 _UNIT_TO_SECONDS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
 
+# Compound durations such as "1h30m", "500ms" or "1.5s"
+_DURATION_PART_RE = re.compile(r"(\d+(?:\.\d+)?)(ns|us|µs|ms|s|m|h|d|w)")
+_DURATION_RE = re.compile(r"^(?:\d+(?:\.\d+)?(?:ns|us|µs|ms|s|m|h|d|w))+$")
+_DURATION_UNIT_TO_NS = {
+    "ns": 1,
+    "us": 1_000,
+    "µs": 1_000,
+    "ms": 1_000_000,
+    "s": 1_000_000_000,
+    "m": 60 * 1_000_000_000,
+    "h": 3600 * 1_000_000_000,
+    "d": 86400 * 1_000_000_000,
+    "w": 7 * 86400 * 1_000_000_000,
+}
+_EPOCH_UNIT_NS = {"s": 1_000_000_000, "ms": 1_000_000, "ns": 1}
+_EPOCH_RE = re.compile(r"^\d+$")
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+DEFAULT_MAX_POINTS = 1000
+DEFAULT_SCRAPE_INTERVAL = "15s"
+# Steps a planned range query rounds up to, in seconds; beyond a day, whole days are used
+_NICE_STEPS_SECONDS = (
+    1, 2, 5, 10, 15, 30, 60, 120, 300, 600, 900, 1800, 3600, 7200, 10800, 21600, 43200, 86400,
+)
+
+
+def _split_values(values: Union[str, Sequence, None]) -> List[str]:
+    """Accept a list, or a comma-separated string, of values."""
+    if values is None:
+        return [""]
+    if isinstance(values, str):
+        return [value.strip() for value in values.split(",")]
+    return ["" if value is None else str(value).strip() for value in values]
+
+
+def _parse_duration_ns(duration: str) -> Union[int, None]:
+    """Return the duration in nanoseconds, or None if it is not a (compound) duration."""
+    if not _DURATION_RE.match(duration):
+        return None
+    return sum(
+        round(float(amount) * _DURATION_UNIT_TO_NS[unit])
+        for amount, unit in _DURATION_PART_RE.findall(duration)
+    )
+
+
+def _parse_timestamp_ns(value: str) -> Union[int, None]:
+    """Return an RFC3339 / ISO 8601 timestamp as epoch nanoseconds (naive times are UTC), or None."""
+    try:
+        parsed = date_parser.isoparse(value)
+    except (ValueError, OverflowError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    delta = parsed - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1_000_000_000 + delta.microseconds * 1_000
+
+
+def _nice_step_seconds(minimum_seconds: float) -> int:
+    """Return the smallest step on the nice-step ladder that is at least ``minimum_seconds``."""
+    for step in _NICE_STEPS_SECONDS:
+        if step >= minimum_seconds:
+            return step
+    return -(-int(minimum_seconds) // 86400) * 86400
+
+
+def _format_step(step_seconds: int) -> str:
+    for unit, size in (("d", 86400), ("h", 3600), ("m", 60)):
+        if step_seconds % size == 0:
+            return f"{step_seconds // size}{unit}"
+    return f"{step_seconds}s"
+
+
+def _check_unit(unit: str, units) -> str:
+    if unit not in units:
+        raise ValueError(f"Unsupported unit {unit!r}; expected one of {', '.join(units)}")
+    return unit
+
 
 class Time:
     """Robot Framework library exposing relative-time helpers."""
@@ -115,3 +222,115 @@ class Time:
         if isinstance(secs, int):
             return secs * 1000
         return secs
+
+    def convert_times_to_epoch(self, times: Union[str, Sequence], unit: str = "s") -> List[Union[int, str]]:
+        """
+        Convert several times to epoch values in ``unit`` (``s``, ``ms`` or
+        ``ns``) against a single snapshot of the clock.
+
+        ``times`` is a list or a comma-separated string. Each entry may be
+        empty ("now"), a relative duration such as ``30m`` or ``1h30m``
+        ("now - X"), an RFC3339 / ISO 8601 timestamp, or an integer epoch,
+        which is assumed to be in ``unit`` already. Anything else is returned
+        unchanged.
+
+        Example:
+            | ${start_ms} | ${end_ms}= | Convert Times To Epoch | ${PROM_START},${PROM_END} | unit=ms |
+        """
+        divisor = _EPOCH_UNIT_NS[_check_unit(unit, _EPOCH_UNIT_NS)]
+        now_ns = time.time_ns()
+        results: List[Union[int, str]] = []
+        for value in _split_values(times):
+            if value == "":
+                results.append(now_ns // divisor)
+            elif _EPOCH_RE.match(value):
+                results.append(int(value))
+            else:
+                offset_ns = _parse_duration_ns(value)
+                epoch_ns = now_ns - offset_ns if offset_ns is not None else _parse_timestamp_ns(value)
+                results.append(epoch_ns // divisor if epoch_ns is not None else value)
+        return results
+
+    def convert_durations(self, durations: Union[str, Sequence], unit: str = "s") -> List[Union[int, float, str]]:
+        """
+        Convert several durations (``15s``, ``1h30m``, ``500ms``, ``1w``) to
+        ``unit`` (``ns``, ``us``, ``ms``, ``s``, ``m``, ``h``, ``d`` or ``w``).
+
+        ``durations`` is a list or a comma-separated string. Empty entries
+        return 0 and non-matching entries are returned unchanged. Whole results
+        are integers; fractional ones (``500ms`` in seconds) are floats.
+
+        Example:
+            | ${step_s} | ${window_s}= | Convert Durations | 1m30s,2h | unit=s |
+        """
+        divisor = _DURATION_UNIT_TO_NS[_check_unit(unit, _DURATION_UNIT_TO_NS)]
+        results: List[Union[int, float, str]] = []
+        for value in _split_values(durations):
+            duration_ns = 0 if value == "" else _parse_duration_ns(value)
+            if duration_ns is None:
+                results.append(value)
+            elif duration_ns % divisor == 0:
+                results.append(duration_ns // divisor)
+            else:
+                results.append(duration_ns / divisor)
+        return results
+
+    def plan_range_query(
+        self,
+        start: str,
+        end: str = "",
+        step: str = "",
+        max_points: int = DEFAULT_MAX_POINTS,
+        scrape_interval: str = DEFAULT_SCRAPE_INTERVAL,
+        unit: str = "s",
+    ) -> dict:
+        """
+        Plan the step and the aligned time range of a range query.
+
+        ``start`` and ``end`` take the same values as ``Convert Times To
+        Epoch`` and are resolved against one clock snapshot. Unless ``step``
+        is pinned, the step is the smallest of 1s, 2s, 5s, 10s, 15s, 30s, 1m,
+        2m, 5m, 10m, 15m, 30m, 1h, 2h, 3h, 6h, 12h or a whole number of days
+        that keeps the range within ``max_points`` points and is not shorter
+        than ``scrape_interval``. Start is then rounded down and end rounded
+        up to multiples of the step, so the aligned range still covers the
+        newest samples.
+
+        Returns a dictionary with ``start`` and ``end`` (epoch in ``unit``),
+        ``step`` (e.g. ``"30s"``), ``step_seconds``, ``step_ms`` and
+        ``points``.
+
+        Example:
+            | ${plan}= | Plan Range Query | ${PROM_START} | ${PROM_END} | step=${PROM_STEP} | unit=ms |
+        """
+        unit_ns = _EPOCH_UNIT_NS[_check_unit(unit, _EPOCH_UNIT_NS)]
+        # Integer inputs are epochs in ``unit``, so resolve in ``unit`` and plan in milliseconds
+        resolved = self.convert_times_to_epoch([start, end], unit=unit)
+        if not all(isinstance(value, int) for value in resolved):
+            raise ValueError(f"Cannot resolve the query range {start!r} to {end!r}")
+        start_ms, end_ms = (value * unit_ns // 1_000_000 for value in resolved)
+        if end_ms <= start_ms:
+            raise ValueError(f"The query range {start!r} to {end!r} is empty")
+
+        pinned = self.convert_durations(step, unit="ms")[0] if step else None
+        if pinned is not None and not isinstance(pinned, (int, float)):
+            raise ValueError(f"Invalid step {step!r}")
+        if pinned:
+            step_ms = int(pinned)
+        else:
+            floor_ms = self.convert_durations(scrape_interval or "0s", unit="ms")[0]
+            if not isinstance(floor_ms, (int, float)):
+                raise ValueError(f"Invalid scrape interval {scrape_interval!r}")
+            budget_ms = (end_ms - start_ms) / max(int(max_points), 1)
+            step_ms = _nice_step_seconds(max(budget_ms, floor_ms) / 1000) * 1000
+
+        aligned_start_ms = start_ms // step_ms * step_ms
+        aligned_end_ms = -(-end_ms // step_ms) * step_ms
+        return {
+            "start": aligned_start_ms * 1_000_000 // unit_ns,
+            "end": aligned_end_ms * 1_000_000 // unit_ns,
+            "step": _format_step(step_ms // 1000) if step_ms % 1000 == 0 else f"{step_ms}ms",
+            "step_seconds": step_ms / 1000 if step_ms % 1000 else step_ms // 1000,
+            "step_ms": step_ms,
+            "points": (aligned_end_ms - aligned_start_ms) // step_ms + 1,
+        }
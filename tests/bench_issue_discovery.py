@@ -0,0 +1,72 @@
+"""Benchmark: issues.json discovery on a synthetic 200k-file tree.
+
+Builds a CODEBUNDLE_TEMP_DIR that looks like a script cloned a large monorepo
+into it (a deep ``.git`` object store, a ``node_modules`` tree and a
+``vendor`` tree, plus a handful of real ``issues.json`` files) and times the
+original ``os.walk`` loop against ``_find_issues_files`` serial, pruned and
+fanned out.
+
+Not collected by pytest. Run:  python3 tests/bench_issue_discovery.py [n_files]
+"""
+
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+from RW.DynamicIssues import _find_issues_files  # noqa: E402
+
+FILES_PER_DIR = 100
+
+
+def build_tree(root, n_files):
+    trees = [("repo", ".git", "objects"), ("repo", "node_modules"), ("repo", "vendor"), ("repo", "src")]
+    per_tree = n_files // len(trees)
+    for tree in trees:
+        for d in range(per_tree // FILES_PER_DIR):
+            path = os.path.join(root, *tree, f"d{d // 50}", f"d{d}")
+            os.makedirs(path)
+            for f in range(FILES_PER_DIR):
+                open(os.path.join(path, f"f{f}"), "w").close()
+    for path in ("", "repo", "repo/src/d0", "reports"):
+        os.makedirs(os.path.join(root, path), exist_ok=True)
+        with open(os.path.join(root, path, "issues.json"), "w") as fh:
+            fh.write("[]")
+
+
+def walk(root):
+    return [os.path.join(r, "issues.json") for r, _d, files in os.walk(root) if "issues.json" in files]
+
+
+def timed(label, fn, baseline=None):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    speedup = f"  ({baseline / elapsed:5.1f}x)" if baseline else ""
+    print(f"{label:<38} {elapsed * 1000:9.1f} ms  {len(result)} file(s){speedup}")
+    return elapsed, result
+
+
+def main():
+    n_files = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+    root = tempfile.mkdtemp(prefix="bench_issues_")
+    try:
+        print(f"building {n_files} files under {root} ...")
+        build_tree(root, n_files)
+        base, expected = timed("os.walk (original)", lambda: walk(root))
+        _, unpruned = timed("scandir, no pruning", lambda: _find_issues_files(root, ignore_globs=""), base)
+        assert unpruned == expected, "unpruned scan must match os.walk"
+        _, pruned = timed("scandir, default pruning", lambda: _find_issues_files(root), base)
+        timed("scandir, default pruning, 8 workers", lambda: _find_issues_files(root, workers=8), base)
+        timed("scandir, no pruning, 8 workers", lambda: _find_issues_files(root, ignore_globs="", workers=8), base)
+        assert pruned == [p for p in expected if "node_modules" not in p and ".git" not in p]
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
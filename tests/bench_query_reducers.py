@@ -0,0 +1,83 @@
+"""Benchmark: reducing a synthetic 500-series x 2k-point matrix to one number.
+
+Builds a Prometheus query_range response and times the ``POST_PROCESS`` jq
+pipelines users write today (a fork plus a full re-parse of the JSON) against
+``Reduce Query Result``, both with the JSON text as input and on the already
+parsed response that ``Datasource Proxy Get`` returns.
+
+Not collected by pytest. Run:  python3 tests/bench_query_reducers.py [n_series] [n_points]
+"""
+
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+from RW.Grafana import Grafana  # noqa: E402
+
+JQ_FILTERS = {
+    "last": "[.data.result[].values[-1][1] | tonumber] | add",
+    "max": "[.data.result[].values[][1] | tonumber] | max",
+    "avg": "[.data.result[].values[][1] | tonumber] | add / length",
+    "count": ".data.result | length",
+    "percentile": "[.data.result[].values[][1] | tonumber] | sort | .[(length - 1) * 95 / 100 | floor]",
+}
+
+
+def build_matrix(n_series, n_points):
+    rng = random.Random(0)
+    return {"status": "success", "data": {"resultType": "matrix", "result": [
+        {"metric": {"__name__": "http_requests", "pod": f"api-{s}"},
+         "values": [[1714557600 + 15 * p, f"{rng.uniform(0, 100):.3f}"] for p in range(n_points)]}
+        for s in range(n_series)
+    ]}}
+
+
+def timed(label, fn, baseline=None):
+    start = time.perf_counter()
+    result = fn()
+    elapsed = time.perf_counter() - start
+    speedup = f"  ({baseline / elapsed:5.1f}x)" if baseline else ""
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {float(result):.3f}{speedup}")
+    return elapsed, float(result)
+
+
+def main():
+    n_series = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    n_points = int(sys.argv[2]) if len(sys.argv) > 2 else 2000
+    if shutil.which("jq") is None:
+        sys.exit("jq is not installed")
+    root = tempfile.mkdtemp(prefix="bench_reducers_")
+    try:
+        print(f"building {n_series} series x {n_points} points ...")
+        matrix = build_matrix(n_series, n_points)
+        path = os.path.join(root, "response.json")
+        with open(path, "w") as f:
+            json.dump(matrix, f)
+        with open(path) as f:
+            text = f.read()
+        print(f"response is {len(text) / 1e6:.1f} MB\n")
+        library = Grafana()
+        for reducer, jq_filter in JQ_FILTERS.items():
+            base, expected = timed(
+                f"{reducer}: jq", lambda: subprocess.run(["jq", jq_filter, path], capture_output=True, check=True).stdout
+            )
+            _, from_text = timed(f"{reducer}: library, from JSON text", lambda: library.reduce_query_result(text, reducer), base)
+            _, parsed = timed(f"{reducer}: library, parsed response", lambda: library.reduce_query_result(matrix, reducer), base)
+            # jq's percentile above is nearest-rank, the library interpolates
+            if reducer != "percentile":
+                assert abs(from_text - expected) < 1e-6 * max(1.0, abs(expected)) and parsed == from_text
+            print()
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark: ingesting 10k tool-builder issues under Robot Framework.
+
+Writes a run_output.json with N issues and runs two suites in-process, the
+way the runner does (output.xml written, no log/report):
+
+  * the Robot FOR loop tool-builder/runbook.robot used to run: an Evaluate,
+    an IF and an RW.Core.Add Issue with inline .get() lookups per issue
+  * the single RW.DynamicIssues.Process Tool Builder Issues call that
+    replaced it
+
+An empty suite is timed too, so Robot's start-up cost can be subtracted
+from the per-issue figures. RW.Core (rw-core-keywords) is replaced by a
+counting stand-in so only the codebundle's own ingestion cost is measured.
+
+Not collected by pytest. Run:  python3 tests/contract/bench_issue_ingestion.py [n_issues]
+"""
+
+import json
+import os
+import shutil
+import sys
+import tempfile
+import time
+import types
+
+REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO, "libraries"))
+
+import RW  # noqa: E402
+from robot import run as robot_run  # noqa: E402
+
+
+class Core:
+    """Counting stand-in for the RW.Core issue sink."""
+
+    ROBOT_LIBRARY_SCOPE = "GLOBAL"
+    issues = 0
+
+    def add_issue(self, title, severity, expected, actual, reproduce_hint, next_steps, details, observed_at=None):
+        Core.issues += 1
+
+
+SETTINGS = """*** Settings ***
+Library    Collections
+Library    RW.Core
+Library    RW.DynamicIssues
+
+*** Tasks ***
+Ingest
+"""
+
+EMPTY = SETTINGS + "    No Operation\n"
+
+FOR_LOOP = SETTINGS + """    ${run_output}=    Evaluate    json.load(open(r'''${OUTPUT_FILE}'''))    modules=json
+    ${malformed}=    Create List
+    FOR    ${issue}    IN    @{run_output}
+        ${issue_title}=    Evaluate    $issue.get('issue title') if isinstance($issue, dict) else None
+        IF    $issue_title is None
+            Append To List    ${malformed}    ${issue}
+            CONTINUE
+        END
+        RW.Core.Add Issue
+        ...    title=${issue_title}
+        ...    severity=${issue.get('issue severity', 4)}
+        ...    expected=The script should produce no issues, indicating no errors were found.
+        ...    actual=Found issues output produced by the provided script, indicating errors were found.
+        ...    reproduce_hint=look at the SLX description for more details.
+        ...    next_steps=${issue.get('issue next steps', '')}
+        ...    details=${issue.get('issue description', '')}
+        ...    observed_at=${issue.get('issue observed at', None)}
+    END
+"""
+
+KEYWORD = SETTINGS + """    ${ingest}=    RW.DynamicIssues.Process Tool Builder Issues    ${OUTPUT_FILE}
+"""
+
+
+def build_issues(n_issues):
+    return [{
+        "issue title": f"Pod api-{i} restarted {i % 7} times",
+        "issue severity": 1 + i % 4,
+        "issue description": f"Container api in pod api-{i} was OOMKilled; last exit code 137. " * 3,
+        "issue next steps": "Raise the memory limit or profile the allocation hot path.",
+    } for i in range(n_issues)]
+
+
+def run_suite(root, name, text, output_file):
+    path = os.path.join(root, f"{name}.robot")
+    with open(path, "w") as fh:
+        fh.write(text)
+    Core.issues = 0
+    with open(os.devnull, "w") as devnull:
+        start = time.perf_counter()
+        rc = robot_run(path, outputdir=root, output=f"{name}.xml", log="NONE", report="NONE",
+                       variable=[f"OUTPUT_FILE:{output_file}"], stdout=devnull, stderr=devnull)
+        elapsed = time.perf_counter() - start
+    assert rc == 0, f"{name} suite failed"
+    return elapsed
+
+
+def main():
+    n_issues = int(sys.argv[1]) if len(sys.argv) > 1 else 10_000
+    core_module = types.ModuleType("RW.Core")
+    core_module.Core = Core
+    sys.modules["RW.Core"] = RW.Core = core_module
+    root = tempfile.mkdtemp(prefix="bench_ingest_")
+    try:
+        output_file = os.path.join(root, "run_output.json")
+        with open(output_file, "w") as fh:
+            json.dump(build_issues(n_issues), fh)
+        print(f"{n_issues} issues, {os.path.getsize(output_file) / 1e6:.1f} MB of run_output.json\n")
+
+        baseline = run_suite(root, "empty", EMPTY, output_file)
+        print(f"{'robot start-up (empty suite)':<34} {baseline * 1000:9.1f} ms")
+        results = {}
+        for name, text in (("for_loop", FOR_LOOP), ("keyword", KEYWORD)):
+            elapsed = run_suite(root, name, text, output_file)
+            assert Core.issues == n_issues, f"{name}: {Core.issues} issues created"
+            per_issue = (elapsed - baseline) / n_issues
+            results[name] = per_issue
+            print(f"{name:<34} {elapsed * 1000:9.1f} ms  {per_issue * 1e6:8.1f} us/issue")
+        print(f"\nper-issue speedup: {results['for_loop'] / results['keyword']:.1f}x")
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,11 +9,17 @@ so we can test what the codebundle GUARANTEES regardless of what the script does
 
 Fidelity notes (line refs = codebundles/tool-builder/runbook.robot unless noted):
   * parse step uses the REAL Evaluate expression pulled from the .robot (:115).
-  * output read uses the REAL Evaluate expression from the .robot (:61 / sli :59).
-  * GEN_CMD decode runs the REAL `echo '<b64>' | base64 -d` (:29) via a subshell.
+  * sli output read uses the REAL Evaluate expression from sli.robot (:59).
+  * GEN_CMD decode calls the REAL RW.GenCmd.Decode Gen Cmd (:28) in-process; the
+    shell decode it replaced (`echo '<b64>' | base64 -d` through RW.CLI) is kept
+    as decode="shell" to prove both hand the interpreter the same script.
   * execution mirrors RW.CLI -> execute_local_command:
       subprocess.run(["bash","-c", <heredoc>], env=<dict>)   (local_process.py:149,157)
-  * issue extraction mirrors the FOR loop (:68-77): direct ['issue title'] etc.
+    or, for execution="worker", calls the REAL RW.PythonWorker.Run Python Main
+    (PYTHON_EXECUTION=worker) with the same env, so both paths can be compared.
+  * runbook output read + issue extraction run the REAL RW.DynamicIssues keywords
+    (Process Tool Builder Issues, or ... Issues Stream for OUTPUT_FORMAT=ndjson)
+    against a recording RW.Core.
   * 'python' is mapped to python3 locally (runner uses 'python').
 
 NOT covered (outside the codebundle contract): RW.Core.Add Issue severity
@@ -21,21 +27,35 @@ validation and RW.Core.Push Metric type handling live in RW.Core, not this
 codebundle; those are noted where relevant.
 """
 
+import atexit
 import base64
 import json
 import os
 import re
 import shutil
 import subprocess
+import sys
 import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 REPO = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.insert(0, os.path.join(REPO, "libraries"))
+
+from RW.DynamicIssues import DynamicIssues  # noqa: E402
+from RW.GenCmd import GenCmd  # noqa: E402
+from RW.PythonWorker import PythonWorker  # noqa: E402
+
 TB = os.path.join(REPO, "codebundles", "tool-builder")
 RUNBOOK = os.path.join(TB, "runbook.robot")
 SLI = os.path.join(TB, "sli.robot")
 
 DEFAULT_TIMEOUT = 30
 
+# One zygote for the whole test session, stopped when the session exits
+WORKER = PythonWorker(idle_seconds=60)
+atexit.register(WORKER.stop_python_worker)
+
 
 def _extract_expr(robot_path, marker):
     """Pull the real Python expression from an `Evaluate` line mentioning `marker`."""
@@ -48,7 +68,6 @@ def _extract_expr(robot_path, marker):
 
 
 PARSE_EXPR = _extract_expr(RUNBOOK, "env_vars_json")          # json.loads($env_vars_json) if ... else {}
-LOAD_EXPR_RB = _extract_expr(RUNBOOK, "run_output_file")      # json.load(open(r'''...''')) ... else []
 LOAD_EXPR_SLI = _extract_expr(SLI, "metric_file")            # json.load(open(r'''...''')) ... else 0
 
 
@@ -69,9 +88,9 @@ def _robot_eval(expr, **names):
     return eval(py, ns)  # noqa: S307
 
 
-def _decode_gen_cmd(script_src):
-    """Mirror runbook.robot:28-29 -> `echo '<b64>' | base64 -d`."""
-    b64 = base64.b64encode(script_src.encode()).decode()
+def _decode_gen_cmd_shell(b64):
+    """The decode the codebundles used to fork: RW.CLI running `echo '<b64>' | base64 -d`
+    (text-mode stdout, like execute_local_command)."""
     p = subprocess.run(
         ["bash", "-c", f"echo '{b64}' | base64 -d"],
         capture_output=True, text=True, timeout=DEFAULT_TIMEOUT,
@@ -79,21 +98,45 @@ def _decode_gen_cmd(script_src):
     return p.stdout, p.returncode, p.stderr
 
 
-def _build_heredoc(interpreter, decoded_script, mode):
+def _decode_gen_cmd(script_src, decode="library"):
+    """Mirror runbook.robot:28 -> RW.GenCmd.Decode Gen Cmd (or the old shell decode).
+    Returns (decoded, rc, stderr, forks)."""
+    b64 = base64.b64encode(script_src.encode()).decode()
+    if decode == "shell":
+        return (*_decode_gen_cmd_shell(b64), 1)
+    try:
+        return GenCmd().decode_gen_cmd(b64), 0, "", 0
+    except Exception as e:  # noqa: BLE001 - the keyword fails the task
+        return "", 1, str(e), 0
+
+
+def _output_name(mode, output_format):
+    if mode != "runbook":
+        return "metric_data.json"
+    return "run_output.jsonl" if output_format == "ndjson" else "run_output.json"
+
+
+def _build_heredoc(interpreter, decoded_script, mode, output_format="json"):
     """Mirror runbook.robot:31-50 / sli.robot:31-50 (python -> python3 locally)."""
-    out_name = "run_output.json" if mode == "runbook" else "metric_data.json"
+    out_name = _output_name(mode, output_format)
     if interpreter == "python":
-        return "\n".join([
-            "python3 << 'RW_GENERIC_EOF'",
-            decoded_script,
-            "import json, os",
-            "resp = main()",
-            f'path = os.path.join(os.environ["CODEBUNDLE_TEMP_DIR"], "{out_name}")',
-            'f = open(path, "w", encoding="utf-8")',
-            "json.dump(resp, f)",
-            "f.close()",
-            "RW_GENERIC_EOF",
-        ])
+        if output_format == "ndjson":
+            result = [
+                f'path = os.path.join(os.environ["CODEBUNDLE_TEMP_DIR"], "{out_name}")',
+                'f = open(path, "w", encoding="utf-8", buffering=1)',
+                'for issue in main() or []: f.write(json.dumps(issue) + "\\n")',
+                "f.close()",
+            ]
+        else:
+            result = [
+                "resp = main()",
+                f'path = os.path.join(os.environ["CODEBUNDLE_TEMP_DIR"], "{out_name}")',
+                'f = open(path, "w", encoding="utf-8")',
+                "json.dump(resp, f)",
+                "f.close()",
+            ]
+        return "\n".join(["python3 << 'RW_GENERIC_EOF'", decoded_script, "import json, os",
+                          *result, "RW_GENERIC_EOF"])
     file_var = "ISSUES_FILE" if mode == "runbook" else "METRIC_FILE"
     return "\n".join([
         "bash << 'RW_GENERIC_EOF'",
@@ -109,15 +152,46 @@ def _build_heredoc(interpreter, decoded_script, mode):
 SECRETS_EXPR = _extract_expr(RUNBOOK, "secrets_json")  # json.loads($secrets_json) if ... else []
 
 
+STAGES = ("parse", "decode", "exec", "load", "ingest")
+
+
+class _StageClock:
+    """Accumulates wall time per contract stage into a `timings` dict."""
+
+    def __init__(self, timings):
+        self.timings = timings
+        self._stage = None
+        self._start = 0.0
+
+    def start(self, stage):
+        self.stop()
+        self._stage, self._start = stage, time.perf_counter()
+
+    def stop(self):
+        if self._stage is not None:
+            self.timings[self._stage] += time.perf_counter() - self._start
+            self._stage = None
+
+
 def run_case(interpreter, config_env_serialized, script_src, mode="runbook",
-             timeout=DEFAULT_TIMEOUT, secret_env_serialized=None, secret_values=None):
+             timeout=DEFAULT_TIMEOUT, secret_env_serialized=None, secret_values=None,
+             decode="library", execution="heredoc", output_format="json"):
     """Run one contract case. `config_env_serialized` is the raw CONFIG_ENV_MAP
     string exactly as the runner would receive it (usually json.dumps of a dict,
-    but may be malformed/empty to test the parse contract). Returns a dict result."""
-    r = {"stage": None, "ok": False}
+    but may be malformed/empty to test the parse contract). `decode` picks the
+    GEN_CMD decode ("library", as the codebundle does now, or the old "shell").
+    `execution` runs python scripts through the "heredoc" or the warm "worker";
+    `output_format` is the runbook's OUTPUT_FORMAT ("json" or "ndjson").
+    Returns a dict result; `forks` counts the processes the codebundle spawned and
+    `timings` the seconds spent in each of STAGES (env assembly counts as exec;
+    for runbooks the output file is read by the ingest keyword, so load only
+    covers the probe file)."""
+    r = {"stage": None, "ok": False, "forks": 0, "timings": dict.fromkeys(STAGES, 0.0)}
+    clock = _StageClock(r["timings"])
     tmp = tempfile.mkdtemp(prefix="cb_")
     try:
         # STEP 1 — parse CONFIG_ENV_MAP (Suite Init, :115)
+        clock.start("parse")
         try:
             raw_env_vars = _robot_eval(PARSE_EXPR, env_vars_json=config_env_serialized)
         except Exception as e:  # noqa: BLE001
@@ -132,11 +206,15 @@ def run_case(interpreter, config_env_serialized, script_src, mode="runbook",
                            f"Dictionary would misbehave")
             return r
 
-        # STEP 2 — decode GEN_CMD (:28-29)
-        decoded, dec_rc, dec_err = _decode_gen_cmd(script_src)
+        # STEP 2 — decode GEN_CMD (:28)
+        clock.start("decode")
+        decoded, dec_rc, dec_err, forks = _decode_gen_cmd(script_src, decode)
+        r["forks"] += forks
+        r["decoded"] = decoded
 
         # SECRET_ENV_MAP parse (Suite Init :130-134) — object form
         if secret_env_serialized is not None:
+            clock.start("parse")
             try:
                 secret_names = _robot_eval(SECRETS_EXPR, secrets_json=secret_env_serialized)
             except Exception as e:  # noqa: BLE001
@@ -145,6 +223,7 @@ def run_case(interpreter, config_env_serialized, script_src, mode="runbook",
             r["secret_names_type"] = type(secret_names).__name__
 
         # STEP 3 — assemble env exactly like execute_local_command
+        clock.start("exec")
         raw_env_vars.setdefault("CODEBUNDLE_TEMP_DIR", tmp)  # injected-by-ref in real RW.CLI
         final_env = dict(os.environ)
         final_env["CODEBUNDLE_TEMP_DIR"] = tmp
@@ -159,81 +238,150 @@ def run_case(interpreter, config_env_serialized, script_src, mode="runbook",
             final_env[sname] = spath
 
         # STEP 4 — run the heredoc (:52-56 -> subprocess.run(["bash","-c",cmd], env=))
-        cmd = _build_heredoc(interpreter, decoded, mode)
-        try:
-            p = subprocess.run(["bash", "-c", cmd], env=final_env,
-                               capture_output=True, text=True, timeout=timeout)
-        except subprocess.TimeoutExpired:
-            r.update(stage="exec", error=f"timed out after {timeout}s (TIMEOUT_SECONDS)")
-            return r
+        # or fork the script from the warm worker (PYTHON_EXECUTION=worker)
+        r["forks"] += 1
+        output_format = output_format if mode == "runbook" else "json"
+        out_name = _output_name(mode, output_format)
+        if interpreter == "python" and execution == "worker":
+            try:
+                p = WORKER.run_python_main(decoded, env=final_env, output_file=out_name,
+                                           output_format=output_format,
+                                           timeout_seconds=timeout, python="python3")
+            except Exception as e:
+                r.update(stage="exec", error=f"python worker failed: {e}")
+                return r
+            if p.errors:
+                timed_out = p.returncode == -1 and any("timed out" in e for e in p.errors)
+                r.update(stage="exec", error=f"timed out after {timeout}s (TIMEOUT_SECONDS)" if timed_out
+                         else "; ".join(p.errors))
+                return r
+        else:
+            cmd = _build_heredoc(interpreter, decoded, mode, output_format)
+            try:
+                p = subprocess.run(["bash", "-c", cmd], env=final_env,
+                                   capture_output=True, text=True, timeout=timeout)
+            except subprocess.TimeoutExpired:
+                r.update(stage="exec", error=f"timed out after {timeout}s (TIMEOUT_SECONDS)")
+                return r
         r.update(script_rc=p.returncode, script_stdout=p.stdout[-4000:],
                  script_stderr=p.stderr[-4000:])
 
         # probe file (input-contract cases write the value they received here)
+        clock.start("load")
         probe_path = os.path.join(tmp, "probe.txt")
         if os.path.exists(probe_path):
             with open(probe_path, encoding="utf-8", errors="surrogateescape") as fh:
                 r["probe"] = fh.read()
 
+        out_file = os.path.join(tmp, out_name)
+        if mode == "runbook":
+            # STEPS 5+6 — one DynamicIssues keyword reads, validates and ingests
+            clock.start("ingest")
+            return _ingest_issues(r, out_file, output_format)
+
         # STEP 5 — read output; mirror the hardened TRY/EXCEPT around json.load.
-        out_file = os.path.join(tmp, "run_output.json" if mode == "runbook" else "metric_data.json")
-        load_expr = LOAD_EXPR_RB if mode == "runbook" else LOAD_EXPR_SLI
         r["warnings"] = []
         try:
-            output = _robot_eval(load_expr, run_output_file=out_file, metric_file=out_file)
+            output = _robot_eval(LOAD_EXPR_SLI, metric_file=out_file)
         except Exception as e:  # noqa: BLE001 - mirror EXCEPT AS ${output_err}
-            if mode == "sli":
-                r["warnings"].append(f"metric output not valid JSON; defaulting to 0: {type(e).__name__}")
-                output = 0
-            else:
-                # runbook: fundamental malformation -> the task FAILS loudly (visible run status)
-                r.update(stage="fail:output-not-json", ok=False, failed=True,
-                         error=f"Task script output could not be read as JSON: {type(e).__name__}: {e}")
-                return r
+            r["warnings"].append(f"metric output not valid JSON; defaulting to 0: {type(e).__name__}")
+            output = 0
         r["output_type"] = type(output).__name__
 
-        # STEP 6 — ingest
-        if mode == "runbook":
-            if not isinstance(output, list):
-                r.update(stage="fail:not-a-list", ok=False, failed=True,
-                         error=f"Task script did not return a JSON list of issues (got a {type(output).__name__})")
-                return r
-            issues, malformed = [], []
-            for issue in output:
-                title = issue.get("issue title") if isinstance(issue, dict) else None
-                if title is None:
-                    malformed.append(issue)   # collect; fail after adding the valid ones
-                    continue
-                issues.append({
-                    "title": title,
-                    "severity": issue.get("issue severity", 4),   # minor fixup, silent
-                    "next_steps": issue.get("issue next steps", ""),
-                    "details": issue.get("issue description", ""),
-                    "observed_at": issue.get("issue observed at", None),
-                })
-            r["issues"] = issues            # valid issues are recorded even if we fail below
-            if malformed:
-                r.update(stage="fail:malformed-issue", ok=False, failed=True,
-                         error=f"Task script produced {len(malformed)} malformed issue(s) "
-                               f"(each must be a JSON object with an 'issue title')")
-                return r
-        else:
-            # sli: coerce to a number; non-numeric metric -> 0 (health drops)
-            try:
-                metric = float(output) if not isinstance(output, bool) else 0
-            except (TypeError, ValueError):
-                metric = 0
-                r["warnings"].append(f"metric not numeric ({type(output).__name__}); set to 0")
-            r["metric"] = metric
-            r["metric_type"] = type(output).__name__
+        # STEP 6 — sli: coerce to a number; non-numeric metric -> 0 (health drops)
+        clock.start("ingest")
+        try:
+            metric = float(output) if not isinstance(output, bool) else 0
+        except (TypeError, ValueError):
+            metric = 0
+            r["warnings"].append(f"metric not numeric ({type(output).__name__}); set to 0")
+        r["metric"] = metric
+        r["metric_type"] = type(output).__name__
 
         r["ok"] = True
         r["stage"] = "complete"
         return r
     finally:
+        clock.stop()
         shutil.rmtree(tmp, ignore_errors=True)
 
 
+def run_cases(cases, max_workers=None):
+    """Run many cases concurrently on a thread pool; returns results in case order.
+
+    Each case is a dict of run_case keyword arguments. Cases are isolated: every
+    run_case works in its own mkdtemp and hands the script an explicit env, and
+    the time is spent in subprocesses, so threads overlap fully.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        return list(pool.map(lambda case: run_case(**case), cases))
+
+
+def stage_timing_report(results, wall=None):
+    """Per-stage breakdown (total / mean / p95 / max, in ms) of run_case `timings`."""
+    lines = [f"{'stage':<8} {'total':>10} {'mean':>9} {'p95':>9} {'max':>9}   ({len(results)} cases)"]
+    for stage in STAGES:
+        samples = sorted(r["timings"][stage] * 1000 for r in results)
+        if not samples:
+            continue
+        p95 = samples[min(len(samples) - 1, int(0.95 * len(samples)))]
+        lines.append(f"{stage:<8} {sum(samples):10.1f} {sum(samples) / len(samples):9.2f} "
+                     f"{p95:9.2f} {samples[-1]:9.2f}")
+    if wall is not None:
+        lines.append(f"wall     {wall * 1000:10.1f} ms")
+    return "\n".join(lines)
+
+
+class _RecordingCore:
+    """Stands in for the RW.Core instance DynamicIssues hands issues to."""
+
+    def __init__(self):
+        self.issues = []
+
+    def add_issue(self, **fields):
+        self.issues.append(fields)
+
+
+class _RecordingBuiltIn:
+    def __init__(self):
+        self.core = _RecordingCore()
+
+    def get_library_instance(self, name):
+        return self.core
+
+
+def _ingest_issues(r, out_file, output_format):
+    """Runbook STEPS 5+6: the single DynamicIssues keyword call plus the task's Fail."""
+    lib = DynamicIssues()
+    lib.builtin = _RecordingBuiltIn()
+    r["warnings"] = []
+    try:
+        if output_format == "ndjson":
+            ingest = lib.process_tool_builder_issues_stream(out_file)
+        else:
+            ingest = lib.process_tool_builder_issues(out_file)
+    except Exception as e:  # noqa: BLE001 - the keyword fails the task LOUDLY
+        stage = "fail:output-not-json" if "could not be read as JSON" in str(e) else "fail:not-a-list"
+        r.update(stage=stage, ok=False, failed=True, error=str(e))
+        return r
+    r["issues"] = [{
+        "title": fields["title"],
+        "severity": fields["severity"],
+        "next_steps": fields["next_steps"],
+        "details": fields["details"],
+        "observed_at": fields.get("observed_at"),
+    } for fields in lib.builtin.core.issues]
+    if ingest["malformed"]:
+        r.update(stage="fail:malformed-issue", ok=False, failed=True,
+                 error=f"Task script produced {ingest['malformed']} malformed issue(s) "
+                       f"(each must be a JSON object with an 'issue title')",
+                 first_malformed=ingest["first_malformed"])
+        return r
+    r["ok"] = True
+    r["stage"] = "complete"
+    return r
+
+
 # ---- reusable black-box scripts (the "user" side; contract-neutral) ----
 
 def echo_env_script(interpreter, varname):
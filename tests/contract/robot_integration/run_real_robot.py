@@ -56,7 +56,9 @@ def run(robot_name, script, interpreter="python", run_type="runbook", config="{}
         "SECRET_ENV_MAP": secrets,
     })
     # DEBUG loglevel so RW.Core.Push Metric's "Metric value=…" debug_log lands in output.xml.
+    # This repo's libraries (RW.GenCmd) sit next to the installed RW.Core/RW.CLI.
     p = subprocess.run([ROBOT, "--loglevel", "DEBUG", "--outputdir", out,
+                        "--pythonpath", os.path.join(REPO, "libraries"),
                         os.path.join(CB, robot_name + ".robot")],
                        env=env, capture_output=True, text=True, timeout=120)
     issues = _read_jsonl(os.path.join(out, "issues.jsonl"))
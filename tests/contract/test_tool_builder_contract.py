@@ -6,16 +6,20 @@ GUARANTEES: (1) runtime var values reach the script byte-for-byte and safely,
 opaque crash). See harness.py for how each step mirrors the real .robot.
 
 Bare python3 (no Robot needed): `python3 tests/contract/test_tool_builder_contract.py`
-or pytest. A stronger, real-Robot-Framework integration run lives in
+or pytest; add `--timings` to run the input cases in parallel and print a
+per-stage timing breakdown instead. A stronger, real-Robot-Framework integration run lives in
 tests/contract/robot_integration/.
 """
 
 import json
 import os
 import sys
+import time
 
 sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
-from harness import run_case, echo_env_script  # noqa: E402
+import harness  # noqa: E402
+from harness import STAGES, _decode_gen_cmd, echo_env_script, run_case, run_cases, stage_timing_report  # noqa: E402
+from RW.PythonWorker import PythonWorker, WorkerResult, _wait  # noqa: E402
 
 
 # ---------- INPUT CONTRACT: every value shape must reach the script intact ----------
@@ -37,21 +41,30 @@ INPUT_VALUES = {
 }
 
 
-def _check_input(interpreter, name, value):
-    cfg = json.dumps({"TESTVAR": value})
-    r = run_case(interpreter, cfg, echo_env_script(interpreter, "TESTVAR"), mode="runbook")
-    assert r["ok"], f"{interpreter}/{name}: errored at {r['stage']}: {r.get('error')}"
-    assert r.get("probe") == value, f"{interpreter}/{name}: value corrupted in transit"
+def _input_cases(interpreter):
+    return [dict(interpreter=interpreter, config_env_serialized=json.dumps({"TESTVAR": value}),
+                 script_src=echo_env_script(interpreter, "TESTVAR"), mode="runbook")
+            for value in INPUT_VALUES.values()]
+
+
+def _check_inputs(interpreter):
+    results = run_cases(_input_cases(interpreter))
+    for (name, value), r in zip(INPUT_VALUES.items(), results):
+        assert r["ok"], f"{interpreter}/{name}: errored at {r['stage']}: {r.get('error')}"
+        assert r.get("probe") == value, f"{interpreter}/{name}: value corrupted in transit"
+
+
+def _outcome(r):
+    """A result without the per-run bookkeeping (fork count, stage timings)."""
+    return {k: v for k, v in r.items() if k not in ("forks", "timings")}
 
 
 def test_input_values_reach_bash_intact():
-    for name, value in INPUT_VALUES.items():
-        _check_input("bash", name, value)
+    _check_inputs("bash")
 
 
 def test_input_values_reach_python_intact():
-    for name, value in INPUT_VALUES.items():
-        _check_input("python", name, value)
+    _check_inputs("python")
 
 
 def test_shell_metacharacters_are_not_executed():
@@ -151,6 +164,190 @@ def test_sli_no_output_is_zero():
     assert r["ok"] and r["metric"] == 0
 
 
+# ---------- GEN_CMD decode: in-process, same script as the old `base64 -d` shell ----------
+DECODE_SCRIPTS = {
+    "bash": 'main() {\n  echo "héllo — 🚀 $HOME `id`" >&2\n  printf \'[]\' >&3\n}\n',
+    "python_crlf": "def main():\r\n    return [{'issue title': 'crlf\\r\\n'}]\r\n",
+    "no_trailing_newline": "def main():\n    return []",
+    "trailing_blank_lines": "def main():\n    return []\n\n\n",
+    "eof_and_backslashes": "main() {\n  printf '%s' 'a\\\\b' > /dev/null\n  printf '[]' >&3\n}\nEOF\nRW_GENERIC\n",
+    "long": "def main():\n" + "    x = 'A' * 100  # padding\n" * 2000 + "    return []\n",
+}
+
+
+def test_library_decode_matches_shell_decode():
+    for name, src in DECODE_SCRIPTS.items():
+        shell, shell_rc, _, _ = _decode_gen_cmd(src, "shell")
+        library, library_rc, _, _ = _decode_gen_cmd(src, "library")
+        assert shell_rc == library_rc == 0, name
+        assert library == shell, f"{name}: decoded script differs from `base64 -d`"
+
+
+def test_library_decode_runs_the_same_with_one_fewer_fork():
+    for name, src in DECODE_SCRIPTS.items():
+        interpreter = "bash" if src.startswith("main()") else "python"
+        shell = run_case(interpreter, json.dumps({}), src, mode="runbook", decode="shell")
+        library = run_case(interpreter, json.dumps({}), src, mode="runbook")
+        assert library["forks"] == shell["forks"] - 1 == 1, name
+        assert _outcome(library) == _outcome(shell), f"{name}: run differs between decodes"
+
+
+# ---------- OUTPUT_FORMAT=ndjson: one issue per line, ingested as it is read ----------
+def test_ndjson_python_generator_issues_are_ingested():
+    script = ("def main():\n    for i in range(3):\n"
+              "        yield {'issue title': f't{i}', 'issue severity': 2, 'issue description': 'multi\\nline'}\n")
+    r = run_case("python", json.dumps({}), script, mode="runbook", output_format="ndjson")
+    assert r["ok"] and [i["title"] for i in r["issues"]] == ["t0", "t1", "t2"]
+    assert r["issues"][0]["details"] == "multi\nline" and r["issues"][0]["severity"] == 2
+
+
+def test_ndjson_bash_lines_on_fd3_are_ingested():
+    script = ("main() {\n  printf '%s\\n' '{\"issue title\": \"a\"}' >&3\n"
+              "  printf '\\n' >&3\n  printf '%s\\n' '{\"issue title\": \"b\", \"issue next steps\": \"fix\"}' >&3\n}\n")
+    r = run_case("bash", json.dumps({}), script, mode="runbook", output_format="ndjson")
+    assert r["ok"] and [i["title"] for i in r["issues"]] == ["a", "b"]
+    assert r["issues"][0]["severity"] == 4 and r["issues"][1]["next_steps"] == "fix"
+
+
+def test_ndjson_malformed_lines_are_counted_after_valid_issues_are_recorded():
+    script = ("main() {\n  echo '{\"issue title\": \"ok\"}' >&3\n  echo 'not json' >&3\n"
+              "  echo '{\"title\": \"no issue title\"}' >&3\n  echo '[1]' >&3\n}\n")
+    r = run_case("bash", json.dumps({}), script, mode="runbook", output_format="ndjson")
+    assert r["stage"] == "fail:malformed-issue" and "3 malformed" in r["error"]
+    assert r["first_malformed"] == "not json"
+    assert [i["title"] for i in r["issues"]] == ["ok"]
+
+
+def test_ndjson_keeps_issues_yielded_before_a_crash():
+    script = ("def main():\n    yield {'issue title': 'found early'}\n    raise RuntimeError('later failure')\n")
+    r = run_case("python", json.dumps({}), script, mode="runbook", output_format="ndjson")
+    assert r["script_rc"] == 1 and [i["title"] for i in r["issues"]] == ["found early"]
+    script = ("def main():\n    issues = [{'issue title': 'found early'}]\n"
+              "    raise RuntimeError('later failure')\n    return issues\n")
+    json_mode = run_case("python", json.dumps({}), script, mode="runbook")
+    assert json_mode["script_rc"] == 1 and json_mode["issues"] == []
+
+
+def test_ndjson_list_return_and_no_output():
+    r = run_case("python", json.dumps({}), "def main():\n    return [{'issue title': 'x'}]\n",
+                 mode="runbook", output_format="ndjson")
+    assert r["ok"] and [i["title"] for i in r["issues"]] == ["x"]
+    r = run_case("python", json.dumps({}), "def main():\n    return None\n", mode="runbook", output_format="ndjson")
+    assert r["ok"] and r["issues"] == []
+
+
+# ---------- Warm python worker: same results as the heredoc ----------
+WORKER_CASES = {
+    "issues": ("runbook", "def main():\n    return [{'issue title': 't\"1', 'issue severity': 2, 'issue description': 'café\\n🚀'}]\n"),
+    "returns_none": ("runbook", "def main():\n    return None\n"),
+    "malformed_issue": ("runbook", "def main():\n    return [{'issue title': 'ok'}, {'title': 'bad'}]\n"),
+    "raises": ("runbook", "def main():\n    raise ValueError('boom')\n"),
+    "sys_exit": ("runbook", "import sys\ndef main():\n    print('bye')\n    sys.exit(3)\n"),
+    "interpreter_state": ("runbook", "import os, sys\nprint(__name__, sys.argv, repr(sys.path[0]), os.getcwd())\n"
+                                     "def main():\n    print('to stderr', file=sys.stderr)\n    return []\n"),
+    "thread_outlives_main": ("runbook", "import threading, time\ndef main():\n"
+                                        "    threading.Thread(target=lambda: (time.sleep(0.2), print('late'))).start()\n"
+                                        "    return []\n"),
+    "sli_number": ("sli", "def main():\n    return 42\n"),
+    "sli_string": ("sli", "def main():\n    return '1.5'\n"),
+    "sli_not_numeric": ("sli", "def main():\n    return {'v': 1}\n"),
+}
+
+
+def test_worker_matches_heredoc():
+    for name, (mode, src) in WORKER_CASES.items():
+        heredoc = run_case("python", json.dumps({"K": "v"}), src, mode=mode)
+        worker = run_case("python", json.dumps({"K": "v"}), src, mode=mode, execution="worker")
+        assert _outcome(worker) == _outcome(heredoc), f"{name}: worker run differs from the heredoc"
+    src = "def main():\n    yield {'issue title': 'a'}\n    yield {'title': 'b'}\n"
+    heredoc = run_case("python", json.dumps({}), src, output_format="ndjson")
+    worker = run_case("python", json.dumps({}), src, output_format="ndjson", execution="worker")
+    assert _outcome(worker) == _outcome(heredoc) and heredoc["stage"] == "fail:malformed-issue"
+
+
+def test_worker_receives_input_values_and_secrets_intact():
+    for name, value in INPUT_VALUES.items():
+        if len(value) > 100_000:  # beyond the per-string exec limit of the heredoc path
+            continue
+        cfg = json.dumps({"TESTVAR": value})
+        script = echo_env_script("python", "TESTVAR")
+        heredoc = run_case("python", cfg, script, mode="runbook")
+        worker = run_case("python", cfg, script, mode="runbook", execution="worker")
+        assert worker["probe"] == heredoc["probe"] == value, name
+    script = ("def main():\n    import os\n"
+              "    open(os.path.join(os.environ['CODEBUNDLE_TEMP_DIR'], 'probe.txt'), 'w')"
+              ".write(open(os.environ['API_TOKEN']).read())\n    return []\n")
+    r = run_case("python", json.dumps({}), script, mode="runbook", secret_env_serialized='["API_TOKEN"]',
+                 secret_values={"API_TOKEN": "s3cr3t\n"}, execution="worker")
+    assert r["ok"] and r["probe"] == "s3cr3t\n"
+
+
+def test_worker_timeout_kills_the_run():
+    script = "import subprocess, time\ndef main():\n    subprocess.Popen(['sleep', '30'])\n    time.sleep(30)\n"
+    r = run_case("python", json.dumps({}), script, mode="runbook", timeout=1, execution="worker")
+    assert r["stage"] == "exec" and "timed out" in r["error"]
+
+
+def test_worker_reports_errors_other_than_timeouts(monkeypatch):
+    monkeypatch.setattr(harness.WORKER, "run_python_main",
+                        lambda *a, **kw: WorkerResult("", "", 1, ["worker lost the run"]))
+    r = run_case("python", json.dumps({}), "def main():\n    return []\n", execution="worker")
+    assert (r["stage"], r["error"]) == ("exec", "worker lost the run")
+
+
+def test_stopped_worker_restarts_on_the_next_run():
+    src = "def main():\n    return []\n"
+    assert run_case("python", json.dumps({}), src, execution="worker")["ok"]
+    assert harness.WORKER.stop_python_worker("python3") is True
+    assert harness.WORKER.stop_python_worker("python3") is False
+    assert run_case("python", json.dumps({}), src, execution="worker")["ok"]
+
+
+def test_worker_is_stopped_as_resolved_on_the_run_path(tmp_path):
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "python3").symlink_to(sys.executable)
+    worker = PythonWorker(idle_seconds=60)
+    env = {"PATH": f"{bin_dir}:{os.environ['PATH']}", "CODEBUNDLE_TEMP_DIR": str(tmp_path)}
+    result = worker.run_python_main("def main():\n    return []\n", env=env, python="python3")
+    assert result.returncode == 0
+    assert worker.stop_python_worker("python3") is True
+    assert worker.stop_python_worker() is False
+
+
+def test_worker_timeout_kills_a_run_that_has_no_process_group_yet():
+    pid = os.fork()
+    if pid == 0:
+        time.sleep(30)
+        os._exit(0)
+    started = time.monotonic()
+    assert _wait(pid, 0.05) is None
+    assert time.monotonic() - started < 5
+
+
+# ---------- Parallel runner + per-stage timings ----------
+def test_parallel_runner_matches_serial_runs():
+    cases = [dict(interpreter=i, config_env_serialized=json.dumps({"TESTVAR": f"v{n}"}),
+                  script_src=echo_env_script(i, "TESTVAR"), mode="runbook")
+             for n in range(6) for i in ("bash", "python")]
+    cases.append(dict(interpreter="python", config_env_serialized="{}",
+                      script_src="def main():\n    return '7'\n", mode="sli"))
+    serial = [run_case(**case) for case in cases]
+    parallel = run_cases(cases, max_workers=8)
+    assert [_outcome(r) for r in parallel] == [_outcome(r) for r in serial]
+    # every case saw its own temp dir and value
+    assert [r.get("probe") for r in parallel[:-1]] == [f"v{n}" for n in range(6) for _ in range(2)]
+
+
+def test_run_case_times_every_stage():
+    r = run_case("python", "{}", "def main():\n    return 1\n", mode="sli")
+    assert set(r["timings"]) == set(STAGES) and all(t > 0 for t in r["timings"].values())
+    r = run_case("python", "{not valid json", "def main():\n    return []\n")
+    assert r["timings"]["parse"] > 0 and r["timings"]["exec"] == 0
+    report = stage_timing_report([r], wall=0.5)
+    assert all(stage in report for stage in STAGES) and "wall" in report
+
+
 # ---------- Documented platform boundary (papi guarantees a valid JSON dict) ----------
 def test_malformed_config_env_map_fails_at_parse():
     """papi always emits a valid JSON dict, so this is unreachable in practice — but
@@ -159,7 +356,20 @@ def test_malformed_config_env_map_fails_at_parse():
     assert not r["ok"] and r["stage"].startswith("parse")
 
 
+def _print_input_timings():
+    """Run the input-contract cases in parallel and print the per-stage breakdown."""
+    # values past the kernel's per-string exec limit fail before any stage runs
+    cases = [case for case in _input_cases("bash") + _input_cases("python")
+             if len(case["config_env_serialized"]) < 100_000]
+    start = time.perf_counter()
+    results = run_cases(cases)
+    print(stage_timing_report(results, wall=time.perf_counter() - start))
+
+
 if __name__ == "__main__":
+    if "--timings" in sys.argv:
+        _print_input_timings()
+        raise SystemExit(0)
     fails = 0
     for _name, _fn in sorted(globals().items()):
         if _name.startswith("test_") and callable(_fn):
@@ -0,0 +1,570 @@
+"""Unit tests for RW.Azure.Cosmosdb against an in-process fake of the Cosmos SDK.
+
+``CosmosClient`` (and the credential / management classes) are replaced on
+the module with small fakes, so no Azure account or network is needed. The
+fake container pages its results the way ``ItemPaged`` does and records how
+many pages were fetched.
+
+Run:  python3 -m pytest tests/test_cosmosdb.py
+"""
+
+import json
+import os
+import sys
+
+import pytest
+from azure.cosmos import exceptions
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+import RW.Azure.Cosmosdb as cosmosdb_module  # noqa: E402
+from RW.Azure.Cosmosdb import Cosmosdb  # noqa: E402
+
+
+class FakePager:
+    """Page iterator exposing ``continuation_token`` like the SDK's page iterator."""
+
+    def __init__(self, container, items, page_size, continuation_token, response_hook=None):
+        self._container = container
+        self._response_hook = response_hook
+        self._items = items
+        self._page_size = page_size
+        self._start = int(continuation_token or 0)
+        self._done = False
+        self.continuation_token = continuation_token
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._done:
+            raise StopIteration
+        self._container.pages_fetched += 1
+        page = self._items[self._start:self._start + self._page_size]
+        self._start += self._page_size
+        self._done = self._start >= len(self._items)
+        self.continuation_token = None if self._done else str(self._start)
+        if self._response_hook:
+            self._response_hook({
+                "x-ms-request-charge": str(self._container.request_charge),
+                "x-ms-request-duration-ms": "1.5",
+                "Content-Length": str(len(json.dumps(page))),
+            }, {})
+        return iter(page)
+
+
+class FakePaged:
+    """Iterable of query results that fetches them page by page, like ItemPaged."""
+
+    def __init__(self, container, items, page_size, response_hook=None):
+        self._container = container
+        self._items = items
+        self._page_size = page_size
+        self._response_hook = response_hook
+
+    def by_page(self, continuation_token=None):
+        return FakePager(self._container, self._items, self._page_size, continuation_token, self._response_hook)
+
+    def __iter__(self):
+        for page in self.by_page():
+            yield from page
+
+
+class FakeContainer:
+    def __init__(self, items=None, responder=None, page_size=3):
+        self.items = list(items or [])
+        self.responder = responder
+        self.page_size = page_size
+        self.queries = []
+        self.pages_fetched = 0
+        self.request_charge = 2.5
+        self.fail_with = None
+
+    def query_items(self, query, parameters=None, enable_cross_partition_query=None, max_item_count=None, **kwargs):
+        self.queries.append({
+            "query": query, "parameters": parameters, "max_item_count": max_item_count, "timeout": kwargs.get("timeout"),
+        })
+        if self.fail_with is not None:
+            error, self.fail_with = self.fail_with, None
+            raise error
+        items = self.responder(query, parameters) if self.responder else self.items
+        return FakePaged(self, items, max_item_count or self.page_size, kwargs.get("response_hook"))
+
+
+class FakeCosmosClient:
+    instances = []
+    containers = {}
+
+    def __init__(self, endpoint, credential):
+        self.endpoint = endpoint
+        self.credential = credential
+        FakeCosmosClient.instances.append(self)
+
+    def get_database_client(self, database_name):
+        return _FakeDatabase(database_name)
+
+
+class _FakeDatabase:
+    def __init__(self, name):
+        self.name = name
+
+    def get_container_client(self, container_name):
+        return FakeCosmosClient.containers.setdefault((self.name, container_name), FakeContainer())
+
+
+class FakeManagementClient:
+    list_keys_calls = 0
+    next_key = "key-1"
+
+    def __init__(self, credential, subscription_id):
+        self.database_accounts = self
+
+    def list_keys(self, resource_group, account_name):
+        FakeManagementClient.list_keys_calls += 1
+        return type("Keys", (), {"primary_master_key": FakeManagementClient.next_key})()
+
+
+class FakeCredential:
+    created = 0
+
+    def __init__(self, *args):
+        FakeCredential.created += 1
+
+
+@pytest.fixture(autouse=True)
+def fake_sdk(monkeypatch):
+    monkeypatch.setattr(cosmosdb_module, "CosmosClient", FakeCosmosClient)
+    monkeypatch.setattr(cosmosdb_module, "CosmosDBManagementClient", FakeManagementClient)
+    for name in ("DefaultAzureCredential", "ChainedTokenCredential", "EnvironmentCredential", "AzureCliCredential"):
+        monkeypatch.setattr(cosmosdb_module, name, FakeCredential)
+    FakeCosmosClient.instances = []
+    FakeCosmosClient.containers = {}
+    FakeManagementClient.list_keys_calls = 0
+    FakeManagementClient.next_key = "key-1"
+    FakeCredential.created = 0
+    Cosmosdb().clear_cosmosdb_connection_cache()
+    Cosmosdb().clear_cosmosdb_result_cache()
+    yield
+    Cosmosdb().clear_cosmosdb_connection_cache()
+    Cosmosdb().clear_cosmosdb_result_cache()
+
+
+def container(database="db", name="c"):
+    return FakeCosmosClient.containers.setdefault((database, name), FakeContainer())
+
+
+ENDPOINT = "https://acct.documents.azure.com:443/"
+
+
+# ---------- connection cache ----------
+def test_key_connections_reuse_one_client_per_endpoint_and_key():
+    first, second = Cosmosdb(), Cosmosdb()
+    first.connect_to_cosmosdb(ENDPOINT, "k1")
+    second.connect_to_cosmosdb(ENDPOINT, "k1")
+    assert len(FakeCosmosClient.instances) == 1 and first.client is second.client
+    second.connect_to_cosmosdb(ENDPOINT, "k2")
+    second.connect_to_cosmosdb(ENDPOINT, "k1", use_cache=False)
+    assert len(FakeCosmosClient.instances) == 3
+
+
+def test_service_principal_credential_is_built_once():
+    lib = Cosmosdb()
+    for _ in range(3):
+        lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+    assert len(FakeCosmosClient.instances) == 1
+    assert FakeCredential.created == 3  # one chained credential wrapping its two members
+
+
+def test_retrieved_key_is_cached_until_ttl(monkeypatch):
+    lib = Cosmosdb(key_cache_ttl_seconds=60)
+    for _ in range(3):
+        lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    assert FakeManagementClient.list_keys_calls == 1
+    now = cosmosdb_module.time.monotonic()
+    monkeypatch.setattr(cosmosdb_module.time, "monotonic", lambda: now + 61)
+    lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    assert FakeManagementClient.list_keys_calls == 2
+
+
+def test_auth_failure_after_key_rotation_refetches_key_and_retries():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    container().items = [{"id": 1}]
+    container().fail_with = exceptions.CosmosHttpResponseError(status_code=401, message="key rotated")
+    FakeManagementClient.next_key = "key-2"
+    assert lib.count_query_results("db", "c", "SELECT * FROM c") == 1
+    assert FakeManagementClient.list_keys_calls == 2
+    assert lib.client.credential == "key-2"
+
+
+def test_auth_failure_with_static_key_invalidates_client_and_raises():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().fail_with = exceptions.CosmosHttpResponseError(status_code=401, message="bad key")
+    with pytest.raises(Exception, match="Cosmos DB query error"):
+        lib.query_container("db", "c", "SELECT * FROM c")
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    assert len(FakeCosmosClient.instances) == 2
+
+
+def _sign_in_as(monkeypatch, client_id, secret):
+    monkeypatch.setenv("AZURE_TENANT_ID", "tenant")
+    monkeypatch.setenv("AZURE_CLIENT_ID", client_id)
+    monkeypatch.setenv("AZURE_CLIENT_SECRET", secret)
+
+
+def test_azure_ad_connections_are_not_shared_across_identities(monkeypatch):
+    lib = Cosmosdb()
+    _sign_in_as(monkeypatch, "sp-a", "secret-a")
+    lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+    client_a = lib.client
+    _sign_in_as(monkeypatch, "sp-b", "secret-b")
+    lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+    assert lib.client is not client_a and lib.client.credential is not client_a.credential
+    _sign_in_as(monkeypatch, "sp-b", "rotated")
+    lib.connect_to_cosmosdb(ENDPOINT)
+    lib.connect_to_cosmosdb(ENDPOINT)
+    assert len(FakeCosmosClient.instances) == 3
+
+
+def test_retrieved_key_is_not_shared_across_identities(monkeypatch):
+    lib = Cosmosdb()
+    _sign_in_as(monkeypatch, "sp-a", "secret-a")
+    lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    _sign_in_as(monkeypatch, "sp-b", "secret-b")
+    lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    assert FakeManagementClient.list_keys_calls == 2
+
+
+def test_auth_failure_with_azure_ad_drops_cached_credential():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+    credential = lib.client.credential
+    container().fail_with = exceptions.CosmosHttpResponseError(status_code=403, message="revoked")
+    with pytest.raises(Exception, match="Cosmos DB query error"):
+        lib.query_container("db", "c", "SELECT * FROM c")
+    lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+    assert lib.client.credential is not credential
+
+
+# ---------- count_query_results ----------
+def _count_responder(query, parameters):
+    if "COUNT(1)" in query:
+        return [10]
+    return [{"id": i} for i in range(10)]
+
+
+def test_server_side_count_rewrites_plain_select():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().responder = _count_responder
+    count = lib.count_query_results(
+        "db", "c", "SELECT c.id, c.status FROM c WHERE c.status = 'error' ORDER BY c._ts DESC",
+        server_side_count=True,
+    )
+    assert count == 10
+    assert container().queries[-1]["query"] == "SELECT VALUE COUNT(1) FROM c WHERE c.status = 'error'"
+
+
+@pytest.mark.parametrize("query", [
+    "SELECT DISTINCT c.status FROM c",
+    "SELECT TOP 5 * FROM c",
+    "SELECT * FROM c OFFSET 0 LIMIT 5",
+    "SELECT VALUE c.missing FROM c",
+    "SELECT * FROM c WHERE c.id IN (SELECT VALUE t FROM t IN c.tags)",
+])
+def test_server_side_count_leaves_ineligible_queries(query):
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().responder = _count_responder
+    assert lib.count_query_results("db", "c", query, server_side_count=True) == 10
+    assert container().queries[-1]["query"] == query
+
+
+def test_row_count_pages_without_rewrite():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(10)]
+    assert lib.count_query_results("db", "c", "SELECT * FROM c") == 10
+    assert container().pages_fetched == 4
+
+
+def test_stop_after_ends_paging_once_threshold_is_crossed():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(1000)]
+    assert lib.count_query_results("db", "c", "SELECT * FROM c", stop_after=6) == 6
+    assert container().pages_fetched == 1
+    assert container().queries[-1]["max_item_count"] == 6
+
+
+# ---------- query_container_paged ----------
+def test_paged_query_returns_native_items():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(7)]
+    result = lib.query_container_paged("db", "c", "SELECT * FROM c", max_item_count=5)
+    assert result["items"] == container().items
+    assert (result["count"], result["pages"], result["truncated"], result["continuation_token"]) == (7, 2, False, None)
+
+
+def test_paged_query_max_items_resumes_from_continuation_token():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(10)]
+    seen = []
+    token = None
+    while True:
+        result = lib.query_container_paged("db", "c", "SELECT * FROM c", max_items=3, continuation_token=token)
+        seen.extend(item["id"] for item in result["items"])
+        token = result["continuation_token"]
+        if not result["truncated"]:
+            break
+    assert seen == list(range(10))
+
+
+def test_paged_query_mid_page_budget_points_token_at_that_page():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(10)]
+    result = lib.query_container_paged("db", "c", "SELECT * FROM c", max_items=4)
+    assert [item["id"] for item in result["items"]] == [0, 1, 2, 3]
+    assert result["truncated"] and result["continuation_token"] == "3"
+
+
+def test_paged_query_writes_compact_ndjson_within_byte_budget(tmp_path):
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(100)]
+    path = tmp_path / "results.jsonl"
+    result = lib.query_container_paged("db", "c", "SELECT * FROM c", max_bytes=100, output_file=str(path))
+    lines = path.read_text().splitlines()
+    assert "items" not in result and result["output_file"] == str(path)
+    assert lines[0] == '{"id":0}' and len(lines) == result["count"] and result["truncated"]
+    assert result["bytes"] == len(path.read_bytes()) <= 100
+
+
+# ---------- query_containers_concurrently ----------
+def test_concurrent_queries_return_results_in_spec_order():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container("db", "orders").items = [{"id": 1}, {"id": 2}]
+    container("db", "events").responder = lambda query, parameters: [5]
+    results = lib.query_containers_concurrently([
+        {"database": "db", "container": "orders", "query": "SELECT * FROM c"},
+        ["db", "events", "SELECT VALUE COUNT(1) FROM c WHERE c.level = @level", {"@level": "error"}],
+    ])
+    assert [(r["container"], r["count"], r["error"]) for r in results] == [("orders", 2, None), ("events", 5, None)]
+    assert container("db", "events").queries[0]["parameters"] == [{"name": "@level", "value": "error"}]
+    assert all(r["latency_ms"] is not None for r in results)
+    assert len(FakeCosmosClient.instances) == 1
+
+
+def test_concurrent_queries_report_errors_per_spec():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container("db", "bad").fail_with = exceptions.CosmosHttpResponseError(status_code=400, message="syntax error")
+    results = lib.query_containers_concurrently(
+        '[["db", "bad", "SELEC * FROM c"], ["db", "good", "SELECT * FROM c"]]'
+    )
+    assert "syntax error" in results[0]["error"] and results[1]["error"] is None
+
+
+def test_concurrent_queries_run_in_parallel_and_honour_global_timeout():
+    import threading
+    import time
+
+    release = threading.Event()
+
+    def slow(query, parameters):
+        release.wait(5)
+        return [{"id": 1}]
+
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    for name in ("a", "b", "c"):
+        container("db", name).responder = slow
+    container("db", "fast").items = [{"id": 1}]
+    started = time.monotonic()
+    results = lib.query_containers_concurrently(
+        [["db", name, "SELECT * FROM c"] for name in ("fast", "a", "b", "c")], max_workers=4, timeout=0.2
+    )
+    release.set()
+    assert time.monotonic() - started < 2
+    assert results[0]["count"] == 1
+    assert all(r["error"] == "Timed out after 0.2s" for r in results[1:])
+
+
+def test_concurrent_queries_apply_per_query_timeout(monkeypatch):
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(10)]
+    clock = iter(range(0, 1000, 4))
+    monkeypatch.setattr(cosmosdb_module.time, "monotonic", lambda: next(clock))
+    result, = lib.query_containers_concurrently([["db", "c", "SELECT * FROM c"]], query_timeout=5)
+    assert container().queries[0]["timeout"] == 5
+    assert result["error"].startswith("Query exceeded 5s")
+
+
+def test_concurrent_queries_default_query_timeout_to_overall_timeout():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    lib.query_containers_concurrently([["db", "c", "SELECT * FROM c"]], timeout=30)
+    assert container().queries[0]["timeout"] == 30
+
+
+def test_concurrent_auth_failures_reconnect_once():
+    import threading
+
+    both_failing = threading.Barrier(2, timeout=5)
+    calls = []
+
+    def rotated_key(query, parameters):
+        calls.append(query)
+        if len(calls) <= 2:
+            both_failing.wait()
+            raise exceptions.CosmosHttpResponseError(status_code=401, message="key rotated")
+        return [{"id": 1}]
+
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb_with_azure_credentials_and_retrieve_key(ENDPOINT, "sub", "rg", "acct")
+    container().responder = rotated_key
+    FakeManagementClient.next_key = "key-2"
+    results = lib.query_containers_concurrently([["db", "c", "SELECT * FROM c"]] * 2, max_workers=2)
+    assert [r["error"] for r in results] == [None, None]
+    assert FakeManagementClient.list_keys_calls == 2
+    assert lib.client.credential == "key-2"
+
+
+# ---------- query metrics ----------
+def test_query_metrics_sum_request_charge_over_pages():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(7)]
+    lib.query_container("db", "c", "SELECT * FROM c")
+    metrics = lib.get_last_query_metrics()
+    assert (metrics["pages"], metrics["items"], metrics["request_charge"], metrics["server_duration_ms"]) == (3, 7, 7.5, 4.5)
+    assert metrics["bytes"] == len(json.dumps(container().items[:3])) * 2 + len(json.dumps(container().items[6:]))
+    assert metrics["wall_time_ms"] >= 0 and metrics["container"] == "c"
+
+
+def test_query_metrics_follow_the_rewritten_count_query():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().responder = _count_responder
+    container().request_charge = 3.0
+    lib.count_query_results("db", "c", "SELECT * FROM c WHERE c.level = 'error'", server_side_count=True)
+    metrics = lib.get_last_query_metrics()
+    assert metrics["query"].startswith("SELECT VALUE COUNT(1)") and metrics["request_charge"] == 3.0
+
+
+def test_query_metrics_are_cleared_by_a_failed_query():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    lib.query_container("db", "c", "SELECT * FROM c")
+    container().fail_with = exceptions.CosmosHttpResponseError(status_code=400, message="syntax error")
+    with pytest.raises(Exception):
+        lib.query_container("db", "c", "SELEC * FROM c")
+    assert lib.get_last_query_metrics() is None
+
+
+# ---------- result cache ----------
+def test_result_cache_is_off_by_default():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    lib.query_container("db", "c", "SELECT * FROM c")
+    lib.query_container("db", "c", "SELECT * FROM c")
+    assert len(container().queries) == 2
+
+
+def test_result_cache_serves_normalized_repeats_within_ttl(monkeypatch):
+    lib = Cosmosdb(result_cache_ttl_seconds=30)
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": 1}]
+    first = lib.query_container("db", "c", "SELECT * FROM c WHERE c.s = @s", '{"@s": "error"}')
+    second = lib.query_container("db", "c", "SELECT *\n  FROM c   WHERE c.s = @s", '{"@s":"error"}')
+    assert first == second and len(container().queries) == 1
+    assert lib.get_last_query_metrics()["cached"] is True
+    lib.query_container("db", "c", "SELECT * FROM c WHERE c.s = @s", '{"@s": "warning"}')
+    lib.query_container("db", "c", "SELECT * FROM c WHERE c.s = @s", '{"@s": "error"}', use_result_cache=False)
+    assert len(container().queries) == 3
+    now = cosmosdb_module.time.monotonic()
+    monkeypatch.setattr(cosmosdb_module.time, "monotonic", lambda: now + 31)
+    lib.query_container("db", "c", "SELECT * FROM c WHERE c.s = @s", '{"@s": "error"}')
+    assert len(container().queries) == 4
+
+
+def test_result_cache_keeps_whitespace_inside_literals_apart():
+    lib = Cosmosdb(result_cache_ttl_seconds=30)
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    lib.count_query_results("db", "c", "SELECT * FROM c WHERE c.msg = 'a b'")
+    lib.count_query_results("db", "c", "SELECT * FROM c WHERE c.msg = 'a  b'")
+    lib.count_query_results("db", "c", "SELECT  *  FROM c WHERE c.msg = 'a  b'")
+    assert len(container().queries) == 2
+
+
+def test_result_cache_evicts_least_recently_used_past_byte_ceiling():
+    lib = Cosmosdb(result_cache_ttl_seconds=30, result_cache_max_bytes=150)  # room for two results
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    for name in ("a", "b", "c"):
+        container("db", name).items = [{"id": "x" * 40}]
+    for name in ("a", "b", "a", "c"):
+        lib.query_container("db", name, "SELECT * FROM c")
+    lib.query_container("db", "a", "SELECT * FROM c")
+    lib.query_container("db", "b", "SELECT * FROM c")
+    assert [len(container("db", name).queries) for name in ("a", "b", "c")] == [1, 2, 1]
+
+
+def test_result_cache_ceiling_is_per_instance():
+    shared = Cosmosdb(result_cache_ttl_seconds=30)
+    shared.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": "x" * 40}]
+    Cosmosdb(result_cache_ttl_seconds=30, result_cache_max_bytes=1)
+    shared.query_container("db", "c", "SELECT * FROM c")
+    shared.query_container("db", "c", "SELECT * FROM c")
+    assert len(container().queries) == 1
+
+
+def test_result_cache_is_not_shared_across_identities(monkeypatch):
+    lib = Cosmosdb(result_cache_ttl_seconds=30)
+    container().items = [{"id": 1}]
+    for client_id in ("sp-a", "sp-b", "sp-a"):
+        _sign_in_as(monkeypatch, client_id, f"secret-{client_id}")
+        lib.connect_to_cosmosdb_with_azure_credentials(ENDPOINT)
+        lib.query_container("db", "c", "SELECT * FROM c")
+    assert len(container().queries) == 2
+
+
+# ---------- count_query_results_with_sample ----------
+def test_count_with_sample_counts_all_rows_but_keeps_a_bounded_sample():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(10)]
+    result = lib.count_query_results_with_sample("db", "c", "SELECT * FROM c", sample_size=4)
+    assert (result["count"], result["complete"]) == (10, True)
+    assert result["sample"] == container().items[:4]
+    assert json.loads(result["sample_json"]) == result["sample"]
+    assert len(container().queries) == 1 and lib.get_last_query_metrics()["items"] == 10
+
+
+@pytest.mark.parametrize("first_item, expected", [
+    (7, 7), ({"$1": 8}, 8), ({"count": 9}, 9), ({"total": 5}, 5), ({}, 1),
+])
+def test_count_with_sample_reads_count_query_values(first_item, expected):
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [first_item]
+    result = lib.count_query_results_with_sample("db", "c", "SELECT COUNT(1) FROM c")
+    assert result["count"] == expected and result["sample"] == [first_item]
+
+
+def test_count_with_sample_stop_after_marks_count_incomplete():
+    lib = Cosmosdb()
+    lib.connect_to_cosmosdb(ENDPOINT, "k1")
+    container().items = [{"id": i} for i in range(100)]
+    result = lib.count_query_results_with_sample("db", "c", "SELECT * FROM c", stop_after=1)
+    assert (result["count"], result["complete"], container().pages_fetched) == (1, False, 1)
+    container().items = [{"id": 0}]
+    result = lib.count_query_results_with_sample("db", "c", "SELECT * FROM c", stop_after=1)
+    assert result["complete"] is True
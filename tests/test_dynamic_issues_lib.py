@@ -0,0 +1,508 @@
+"""Unit tests for RW.DynamicIssues.
+
+``RW.Core.Add Issue`` is only reachable inside a running Robot suite, so the
+library's ``builtin`` is swapped for a recorder that captures each keyword call
+as a dict. Everything else (file discovery, parsing, trigger matching) runs
+for real.
+
+Run:  python3 -m pytest tests/test_dynamic_issues_lib.py
+"""
+
+import io
+import json
+import os
+import sys
+import time
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+import RW.DynamicIssues as dynamic_issues_module  # noqa: E402
+from RW.DynamicIssues import DynamicIssues, _BoundedReader, _find_issues_files, _iter_json_array, _iter_json_lines  # noqa: E402
+
+
+class _RecordingBuiltIn:
+    """Stands in for robot's BuiltIn; records `RW.Core.Add Issue` calls."""
+
+    def __init__(self):
+        self.issues = []
+        self.report = []
+
+    def run_keyword(self, name, *args):
+        if name == "RW.Core.Add Pre To Report":
+            self.report.append(args[0])
+            return
+        assert name == "RW.Core.Add Issue"
+        self.issues.append(dict(arg.split("=", 1) for arg in args))
+
+    def get_library_instance(self, name):
+        raise RuntimeError(f"No library '{name}' found.")
+
+
+class _RecordingCore:
+    """Stands in for the RW.Core library instance (the direct issue sink)."""
+
+    def __init__(self):
+        self.issues = []
+        self.report = []
+
+    def add_issue(self, **fields):
+        self.issues.append(fields)
+
+    def add_pre_to_report(self, text):
+        self.report.append(text)
+
+
+class _CoreBuiltIn(_RecordingBuiltIn):
+    def __init__(self):
+        super().__init__()
+        self.core = _RecordingCore()
+
+    def get_library_instance(self, name):
+        assert name == "RW.Core"
+        return self.core
+
+
+def _library(**kwargs):
+    lib = DynamicIssues(**kwargs)
+    lib.builtin = _RecordingBuiltIn()
+    return lib
+
+
+def _write(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as fh:
+        fh.write(text)
+
+
+# ---------- file-based issues ----------
+def test_file_based_issues_found_recursively(tmp_path):
+    _write(str(tmp_path / "issues.json"), json.dumps([{"title": "top"}]))
+    _write(str(tmp_path / "repo" / "sub" / "issues.json"), json.dumps({"title": "nested"}))
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path)) == 2
+    assert sorted(i["title"] for i in lib.builtin.issues) == ["nested", "top"]
+
+
+class _FailingCore(_RecordingCore):
+    """An RW.Core stand-in whose Add Issue raises for some titles."""
+
+    def add_issue(self, **fields):
+        if "bad" in fields["title"] or "suppressed" in fields["title"]:
+            raise RuntimeError(f"sink rejected {fields['title']}")
+        super().add_issue(**fields)
+
+
+def test_failing_issue_sink_is_warned_per_file(tmp_path, monkeypatch):
+    _write(str(tmp_path / "a" / "issues.json"), json.dumps([{"title": "bad"}, {"title": "after bad"}]))
+    _write(str(tmp_path / "b" / "issues.json"), json.dumps([{"title": "good 1"}, {"title": "good 2"}]))
+    warnings = []
+    monkeypatch.setattr(dynamic_issues_module.logger, "warn", warnings.append)
+    lib = _library()
+    lib.builtin = _CoreBuiltIn()
+    lib.builtin.core = _FailingCore()
+    # The bad file is reported and skipped, like a parse error; the other file's issues are still created
+    assert lib.process_file_based_issues(str(tmp_path)) == 2
+    assert sorted(i["title"] for i in lib.builtin.core.issues) == ["good 1", "good 2"]
+    assert any("a/issues.json: sink rejected bad" in w for w in warnings)
+    # A failure while adding the suppression summary at the end is warned too, not raised
+    lib = _library(max_issues=1)
+    lib.builtin = _CoreBuiltIn()
+    lib.builtin.core = _FailingCore()
+    assert lib.process_file_based_issues(str(tmp_path / "b")) == 1
+    assert warnings[-1] == "Failed to create issues: sink rejected 1 more issues suppressed"
+
+
+def test_streaming_matches_json_load(tmp_path):
+    issues = [{"title": f"issue {n}", "severity": n % 4 + 1, "details": "x" * n} for n in range(500)]
+    _write(str(tmp_path / "issues.json"), json.dumps(issues, indent=2))
+    eager, streamed = _library(), _library()
+    assert eager.process_file_based_issues(str(tmp_path)) == 500
+    assert streamed.process_file_based_issues(str(tmp_path), streaming=True) == 500
+    assert streamed.builtin.issues == eager.builtin.issues
+
+
+def test_streaming_handles_elements_larger_than_a_chunk(tmp_path):
+    big = "y" * (300 * 1024)
+    _write(str(tmp_path / "issues.json"), json.dumps([{"title": "a", "details": big}, {"title": "b"}]))
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path), streaming="true") == 2
+    assert lib.builtin.issues[0]["details"] == big
+
+
+def test_streaming_single_object_file(tmp_path):
+    _write(str(tmp_path / "issues.json"), json.dumps({"title": "solo"}))
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path), streaming=True) == 1
+
+
+def test_streaming_reads_ndjson_and_skips_bad_lines(tmp_path):
+    lines = [json.dumps({"title": "one"}), "{not json", "", json.dumps({"title": "two"})]
+    _write(str(tmp_path / "issues.jsonl"), "\n".join(lines))
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path), streaming=True) == 2
+    # issues.jsonl is only picked up in streaming mode
+    assert _library().process_file_based_issues(str(tmp_path)) == 0
+
+
+def test_streaming_item_cap(tmp_path):
+    _write(str(tmp_path / "issues.json"), json.dumps([{"title": str(n)} for n in range(50)]))
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path), streaming=True, max_items="10") == 10
+
+
+def test_streaming_byte_cap_stops_cleanly(tmp_path):
+    issues = [{"title": f"issue {n}"} for n in range(1000)]
+    _write(str(tmp_path / "issues.json"), json.dumps(issues))
+    lib = _library()
+    created = lib.process_file_based_issues(str(tmp_path), streaming=True, max_file_bytes=2000)
+    assert 0 < created < 1000
+    assert [i["title"] for i in lib.builtin.issues] == [f"issue {n}" for n in range(created)]
+
+
+def test_streaming_values_cut_by_a_read_are_completed(monkeypatch):
+    monkeypatch.setattr(dynamic_issues_module, "_STREAM_CHUNK_SIZE", 3)
+    for pad in range(16):
+        # Shift the values so reads cut them at different offsets
+        text = "[" + " " * pad + '{"ok": false, "n": -1.5e3, "s": "caf\\u00e9 \\\\ \\"q\\""}, [true, null, "\\ud83d\\ude00"]]'
+        assert list(_iter_json_array(_BoundedReader(io.BytesIO(text.encode())))) == json.loads(text)
+
+
+def test_streaming_malformed_element_does_not_read_the_rest_of_the_file(tmp_path):
+    tail = ", ".join(json.dumps({"title": f"issue {n}", "details": "x" * 100}) for n in range(50_000))
+    text = '[{"title": "ok"}, {"title": oops}, ' + tail + ']'
+    raw = io.BytesIO(text.encode())
+    items = _iter_json_array(_BoundedReader(raw))
+    assert next(items) == {"title": "ok"}
+    with pytest.raises(json.JSONDecodeError):
+        next(items)
+    assert raw.tell() <= dynamic_issues_module._STREAM_CHUNK_SIZE < len(text) // 10
+    # The issues before the bad element are still created
+    _write(str(tmp_path / "issues.json"), text)
+    lib = _library()
+    assert lib.process_file_based_issues(str(tmp_path), streaming=True) == 1
+
+
+# ---------- issues file discovery ----------
+def _walk_issues_files(top):
+    """The original discovery loop, kept as the reference behaviour."""
+    return [os.path.join(root, "issues.json") for root, _dirs, files in os.walk(top) if "issues.json" in files]
+
+
+def _build_tree(root):
+    for path in ("issues.json", "a/issues.json", "a/b/c/issues.json", "z/issues.json",
+                 "a/.git/issues.json", "node_modules/pkg/issues.json", "m/vendor/x/issues.json"):
+        _write(os.path.join(root, path), "[]")
+    _write(os.path.join(root, "a", "b", "notes.txt"), "")
+
+
+def test_discovery_matches_os_walk_when_unpruned(tmp_path):
+    _build_tree(str(tmp_path))
+    expected = _walk_issues_files(str(tmp_path))
+    assert _find_issues_files(str(tmp_path), ignore_globs="") == expected
+    assert _find_issues_files(str(tmp_path), ignore_globs="", workers=4) == expected
+
+
+def test_discovery_prunes_by_default(tmp_path):
+    _build_tree(str(tmp_path))
+    found = _find_issues_files(str(tmp_path))
+    expected = [p for p in _walk_issues_files(str(tmp_path))
+                if not any(part in (".git", "node_modules", "vendor") for part in p.split(os.sep))]
+    assert found == expected
+    assert _find_issues_files(str(tmp_path), workers=3) == expected
+
+
+def test_discovery_custom_globs_and_max_depth(tmp_path):
+    _build_tree(str(tmp_path))
+    root = str(tmp_path)
+    assert _find_issues_files(root, ignore_globs="a,node_*", max_depth=1) == [
+        os.path.join(root, "issues.json"), os.path.join(root, "z", "issues.json")]
+    assert _find_issues_files(root, max_depth=0) == [os.path.join(root, "issues.json")]
+
+
+# ---------- batched emission ----------
+def test_emitter_writes_to_core_instance_when_available(tmp_path):
+    _write(str(tmp_path / "issues.json"), json.dumps([{"title": f"t{n}", "severity": "2"} for n in range(7)]))
+    lib = DynamicIssues(batch_size=3)
+    lib.builtin = _CoreBuiltIn()
+    assert lib.process_file_based_issues(str(tmp_path), report_data="out") == 7
+    assert lib.builtin.issues == []  # no keyword dispatch on the fast path
+    first = lib.builtin.core.issues[0]
+    assert first["severity"] == 2 and first["title"] == "t0"
+    assert first["details"] == "--- Command Output ---\nout"
+    assert [i["title"] for i in lib.builtin.core.issues] == [f"t{n}" for n in range(7)]
+
+
+def test_emitter_passes_core_the_arguments_a_keyword_call_would(tmp_path):
+    issue = {"title": 42, "severity": 1.0, "next_steps": ["drain", "restart"], "details": {"pod": "api"}}
+    _write(str(tmp_path / "issues.json"), json.dumps([issue, dict(issue, severity="high")]))
+    direct, dispatched = DynamicIssues(), _library()
+    direct.builtin = _CoreBuiltIn()
+    direct.process_file_based_issues(str(tmp_path))
+    dispatched.process_file_based_issues(str(tmp_path))
+    for core_issue, keyword_issue in zip(direct.builtin.core.issues, dispatched.builtin.issues):
+        assert {k: v for k, v in core_issue.items() if k != "severity"} == \
+            {k: v for k, v in keyword_issue.items() if k != "severity"}
+    assert [i["severity"] for i in direct.builtin.core.issues] == [1, "high"]
+
+
+def test_emitter_falls_back_to_keyword_calls():
+    lib = _library()
+    out = json.dumps({"issuesIdentified": True, "issues": [{"title": "a"}, {"title": "b", "details": "d"}]})
+    assert lib.process_json_query_issues(out, "issuesIdentified", "true", "issues") == 2
+    first, second = lib.builtin.issues
+    assert first["title"] == "a" and json.loads(first["details"]) == {"title": "a"}
+    assert second["details"] == "d" and second["severity"] == "3"
+
+
+# ---------- JSON embedded in text ----------
+def test_extracts_pretty_printed_json_from_noisy_output():
+    report = {"issuesIdentified": True, "issues": [{"title": "multi-line"}]}
+    out = (
+        "Starting scan {phase 1}\n"
+        + json.dumps(report, indent=2)
+        + "\n[INFO] done\n"
+        + json.dumps({"issuesIdentified": True, "issues": {"title": "inline"}})
+        + " trailing text\n"
+        + json.dumps({"issuesIdentified": False, "issues": [{"title": "ignored"}]})
+    )
+    lib = _library()
+    assert lib.process_json_query_issues(out, "issuesIdentified", "true", "issues") == 2
+    assert [i["title"] for i in lib.builtin.issues] == ["multi-line", "inline"]
+
+
+def _log_output(n_lines):
+    lines = []
+    for i in range(n_lines):
+        lines.append(f"2024-05-01T12:00:{i % 60:02d}Z [INFO] [pod api-{i % 7}] handled request {i} in {i % 300}ms")
+        if i % 10 == 0:
+            lines.append(f'[2024-05-01 12:00:00] WARN {{phase {i}}} payload={{"id": {i}, "ok": tru')
+    return "\n".join(lines) + "\n" + json.dumps({"issuesIdentified": True, "issues": [{"title": "x"}]}, indent=2)
+
+
+def _best_scan_seconds(text):
+    timings = []
+    for _ in range(3):
+        started = time.perf_counter()
+        lib = _library()
+        assert lib.process_json_query_issues(text, "issuesIdentified", "true", "issues") <= 1
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def test_embedded_json_scan_time_grows_linearly():
+    # 8x the output must cost about 8x the time; a quadratic scan would cost ~64x
+    for build in (_log_output, lambda n: '{"a": [1, {"b": 2 ' * n):
+        small, large = _best_scan_seconds(build(2_000)), _best_scan_seconds(build(16_000))
+        assert large < 20 * small + 0.05, (build, small, large)
+
+
+def _long_line_seconds(n_chars):
+    text = json.dumps({"title": "x" * n_chars}) + "\n"
+    timings = []
+    for _ in range(3):
+        # Small reads make a long line span thousands of chunks
+        reader = _BoundedReader(io.BytesIO(text.encode()))
+        reader.read = lambda read=reader.read: read(64)
+        started = time.perf_counter()
+        assert len(list(_iter_json_lines(reader, "long.jsonl"))) == 1
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def test_long_ndjson_line_read_time_grows_linearly():
+    small, large = _long_line_seconds(250_000), _long_line_seconds(2_000_000)
+    assert large < 20 * small + 0.02, (small, large)
+
+
+def test_deeply_nested_output_does_not_escape_the_scan():
+    report = json.dumps({"issuesIdentified": True, "issues": [{"title": "after the brackets"}]})
+    lib = _library()
+    assert lib.process_json_query_issues("[" * 5000 + "\n" + report, "issuesIdentified", "true", "issues") == 1
+    assert lib.process_json_query_issues("[" * 5000, "issuesIdentified", "true", "issues") == 0
+
+
+def test_valid_values_nested_in_a_malformed_one_are_still_found():
+    out = '[{"issuesIdentified": true, "issues": [{"title": "kept"}]}, truncated'
+    lib = _library()
+    assert lib.process_json_query_issues(out, "issuesIdentified", "true", "issues") == 1
+    assert [i["title"] for i in lib.builtin.issues] == ["kept"]
+
+
+def test_numeric_trigger_value_is_coerced():
+    out = 'log line\n{"errors": 3, "found": [{"title": "x"}]}\n'
+    lib = _library()
+    assert lib.process_json_query_issues(out, "errors", "3", "found") == 1
+
+
+# ---------- JMESPath selectors ----------
+SCAN_OUTPUT = json.dumps({
+    "summary": {"failed": 2},
+    "results": [
+        {"name": "disk", "status": "FAIL", "level": 2, "msg": {"text": "disk full"}},
+        {"name": "cpu", "status": "PASS", "level": 4},
+        {"name": "mem", "status": "FAIL", "level": 1},
+    ],
+})
+
+
+def test_jmespath_trigger_issues_and_field_queries():
+    lib = _library()
+    created = lib.process_json_query_issues(
+        SCAN_OUTPUT, "", "true", "",
+        trigger_query="summary.failed > `0`",
+        issues_query="results[?status=='FAIL']",
+        field_queries='{"title": "name", "severity": "level", "details": "msg.text"}',
+    )
+    assert created == 2
+    disk, mem = lib.builtin.issues
+    assert (disk["title"], disk["severity"], disk["details"]) == ("disk", "2", "disk full")
+    # unmatched field queries fall back to the issue's own keys / defaults
+    assert mem["title"] == "mem" and json.loads(mem["details"])["name"] == "mem"
+
+
+def test_jmespath_trigger_not_met_and_invalid_expression():
+    lib = _library()
+    assert lib.process_json_query_issues(SCAN_OUTPUT, "", "5", "", trigger_query="summary.failed",
+                                         issues_query="results") == 0
+    assert lib.process_json_query_issues(SCAN_OUTPUT, "", "true", "", trigger_query="summary.[") == 0
+    assert lib.builtin.issues == []
+
+
+def test_jmespath_applies_to_json_embedded_in_text():
+    out = "scan started\n" + json.dumps(json.loads(SCAN_OUTPUT), indent=2) + "\nscan finished\n"
+    lib = _library()
+    assert lib.process_json_query_issues(out, "", "2", "", trigger_query="summary.failed",
+                                         issues_query="results[?status=='FAIL']") == 2
+
+
+# ---------- dedup and cap ----------
+def test_duplicate_issues_are_kept_by_default(tmp_path):
+    issues = json.dumps([{"title": "dup", "severity": 2, "details": "same"}, {"title": "other"}])
+    _write(str(tmp_path / "clone1" / "issues.json"), issues)
+    _write(str(tmp_path / "clone2" / "issues.json"), issues)
+    assert _library().process_file_based_issues(str(tmp_path)) == 4
+
+
+def test_dedupe_emits_issues_identical_in_every_field_once(tmp_path):
+    issues = json.dumps([{"title": "dup", "severity": 2, "details": "same"}, {"title": "other"}])
+    _write(str(tmp_path / "clone1" / "issues.json"), issues)
+    _write(str(tmp_path / "clone2" / "issues.json"), issues)
+    assert _library(dedupe="true").process_file_based_issues(str(tmp_path), report_data="stdout") == 2
+    # same title but a different severity, next step or actual is a different issue
+    for n, change in enumerate(({"severity": 1}, {"next_steps": "Restart it"}, {"actual": "Seen twice"})):
+        issue = dict({"title": "dup", "severity": 2, "details": "same"}, **change)
+        _write(str(tmp_path / f"clone{n + 3}" / "issues.json"), json.dumps([issue]))
+    assert _library(dedupe="true").process_file_based_issues(str(tmp_path)) == 5
+
+
+def test_issue_cap_adds_one_summary_issue():
+    lines = [json.dumps({"issuesIdentified": True, "issues": [{"title": f"t{n}", "severity": 3 if n < 8 else 1}]})
+             for n in range(10)]
+    lib = DynamicIssues(max_issues="3")
+    lib.builtin = _RecordingBuiltIn()
+    assert lib.process_json_query_issues("\n".join(lines), "issuesIdentified", "true", "issues") == 4
+    titles = [i["title"] for i in lib.builtin.issues]
+    assert titles == ["t0", "t1", "t2", "7 more issues suppressed"]
+    assert lib.builtin.issues[-1]["severity"] == "1"  # most severe of the suppressed issues
+
+
+# ---------- command output attachment ----------
+def _many_issues_output(count):
+    return json.dumps({"issuesIdentified": True, "issues": [{"title": f"t{n}", "details": "d"} for n in range(count)]})
+
+
+def test_inline_report_mode_appends_full_output():
+    lib = _library()
+    lib.process_json_query_issues(_many_issues_output(2), "issuesIdentified", "true", "issues", report_data="OUT")
+    assert lib.builtin.issues[0]["details"] == "d\n\n--- Command Output ---\nOUT"
+    assert lib.builtin.report == []
+
+
+def test_reference_report_mode_attaches_output_once():
+    report = "line\n" * 100_000
+    lib = _library(report_mode="reference")
+    out = _many_issues_output(50)
+    assert lib.process_json_query_issues(out, "issuesIdentified", "true", "issues", report_data=report) == 50
+    assert len(lib.builtin.report) == 1 and lib.builtin.report[0].endswith(report)
+    details = {i["details"] for i in lib.builtin.issues}
+    assert len(details) == 1 and len(details.pop()) < 200
+
+
+def test_reference_report_mode_attaches_output_again_in_a_later_call(tmp_path):
+    # The library is GLOBAL: a later call (or suite) writes a report of its own, which must carry the output too
+    report = "same output\n"
+    lib = _library(report_mode="reference")
+    out = _many_issues_output(2)
+    assert lib.process_json_query_issues(out, "issuesIdentified", "true", "issues", report_data=report) == 2
+    _write(str(tmp_path / "issues.json"), json.dumps([{"title": "file issue"}]))
+    assert lib.process_file_based_issues(str(tmp_path), report_data=report) == 1
+    assert len(lib.builtin.report) == 2 and all(r.endswith(report) for r in lib.builtin.report)
+
+
+def test_excerpt_report_mode_keeps_head_and_tail_within_budget():
+    report = "HEAD" + "x" * 50_000 + "TAIL"
+    lib = _library(report_mode="excerpt", report_excerpt_bytes=64)
+    lib.process_json_query_issues(_many_issues_output(3), "issuesIdentified", "true", "issues", report_data=report)
+    details = lib.builtin.issues[0]["details"]
+    assert "HEAD" in details and "TAIL" in details and "bytes omitted" in details
+    assert len(details) < 300
+
+
+# ---------- tool-builder NDJSON output ----------
+def test_tool_builder_stream_maps_fields_and_defaults(tmp_path):
+    path = str(tmp_path / "run_output.jsonl")
+    _write(path, json.dumps({"issue title": "a", "issue severity": 2, "issue description": "d",
+                             "issue next steps": "n", "issue observed at": "2024-05-01T00:00:00Z"})
+           + "\n\n" + json.dumps({"issue title": "a"}) + "\n")
+    lib = _library()
+    lib.builtin = _CoreBuiltIn()
+    assert lib.process_tool_builder_issues_stream(path) == {"issues": 2, "malformed": 0, "first_malformed": None}
+    first, second = lib.builtin.core.issues
+    assert first["severity"] == 2 and first["details"] == "d" and first["next_steps"] == "n"
+    assert first["observed_at"] == "2024-05-01T00:00:00Z"
+    # no dedupe: the codebundle adds every reported issue
+    assert second["title"] == "a" and second["severity"] == 4 and "observed_at" not in second
+    assert second["expected"].startswith("The script should produce no issues")
+
+
+def test_tool_builder_stream_counts_malformed_lines(tmp_path):
+    path = str(tmp_path / "run_output.jsonl")
+    _write(path, '{"title": "x"}\n{"issue title": "ok"}\n{broken\n"text"\n')
+    lib = _library()
+    result = lib.process_tool_builder_issues_stream(path)
+    assert result == {"issues": 1, "malformed": 3, "first_malformed": {"title": "x"}}
+    assert [issue["title"] for issue in lib.builtin.issues] == ["ok"]
+
+
+def test_tool_builder_stream_missing_file_is_no_issues(tmp_path):
+    lib = _library()
+    assert lib.process_tool_builder_issues_stream(str(tmp_path / "none.jsonl"))["issues"] == 0
+
+
+# ---------- tool-builder JSON output ----------
+def test_tool_builder_issues_from_json_list(tmp_path):
+    path = str(tmp_path / "run_output.json")
+    _write(path, json.dumps([{"issue title": "a", "issue severity": "2"}, "stray", {"issue title": "b"}]))
+    lib = _library()
+    lib.builtin = _CoreBuiltIn()
+    assert lib.process_tool_builder_issues(path) == {"issues": 2, "malformed": 1, "first_malformed": "stray"}
+    assert [(i["title"], i["severity"]) for i in lib.builtin.core.issues] == [("a", 2), ("b", 4)]
+
+
+def test_tool_builder_issues_fail_on_bad_output(tmp_path):
+    path = str(tmp_path / "run_output.json")
+    lib = _library()
+    for text, message in (("not json", "could not be read as JSON"), ('{"issue title": "a"}', "got a dict")):
+        _write(path, text)
+        try:
+            lib.process_tool_builder_issues(path)
+        except Exception as e:
+            assert message in str(e)
+        else:
+            raise AssertionError(f"{text!r} was accepted")
+    _write(path, "")
+    assert lib.process_tool_builder_issues(path)["issues"] == 0
+    assert lib.builtin.issues == []
@@ -0,0 +1,58 @@
+"""Unit tests for RW.GenCmd.
+
+Run:  python3 -m pytest tests/test_gen_cmd.py
+"""
+
+import base64
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+from RW import GenCmd as gen_cmd_module  # noqa: E402
+from RW.GenCmd import GenCmd  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def _empty_cache():
+    GenCmd().clear_gen_cmd_cache()
+    yield
+    GenCmd().clear_gen_cmd_cache()
+
+
+def _b64(text):
+    return base64.b64encode(text.encode()).decode()
+
+
+def test_decode_tolerates_wrapping_and_missing_padding():
+    script = "main() {\n  echo 'café'\n}\n"
+    wrapped = "\n".join(_b64(script)[i:i + 12] for i in range(0, len(_b64(script)), 12)) + "\n"
+    assert GenCmd().decode_gen_cmd(wrapped) == script
+    assert GenCmd().decode_gen_cmd(_b64("ab").rstrip("=")) == "ab"
+
+
+@pytest.mark.parametrize("gen_cmd,message", [
+    ("", "empty"),
+    ("bWFpbigp!!", "not valid base64"),
+    (base64.b64encode(b"\xff\xfe main").decode(), "UTF-8"),
+])
+def test_decode_rejects_bad_input(gen_cmd, message):
+    with pytest.raises(Exception, match=message):
+        GenCmd().decode_gen_cmd(gen_cmd)
+
+
+def test_decoded_scripts_are_cached_by_content_hash(monkeypatch):
+    calls = []
+    real_decode = gen_cmd_module._decode
+    monkeypatch.setattr(gen_cmd_module, "_decode", lambda text: calls.append(text) or real_decode(text))
+    library = GenCmd(cache_entries=2)
+    first, second, third = _b64("echo 1"), _b64("echo 2"), _b64("echo 3")
+    assert library.decode_gen_cmd(first) == library.decode_gen_cmd(first + "\n") == "echo 1"
+    assert len(calls) == 1
+    library.decode_gen_cmd(second)
+    library.decode_gen_cmd(third)
+    library.decode_gen_cmd(first)
+    assert len(calls) == 4  # the oldest entry was evicted
@@ -0,0 +1,424 @@
+"""RW.Grafana against a local stand-in for Grafana, side by side with the curl path.
+
+The Grafana runbooks used to build ``echo <b64> | base64 -d | curl ...`` and
+run it through a shell. Each test here sends the same query both ways, with the
+curl command built the way the runbook builds it, to a local HTTP server that
+records what it receives. Both requests must look the same to the server, and
+both must produce the same parsed response.
+
+Run:  python3 -m pytest tests/test_grafana.py
+"""
+
+import base64
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+import RW.Grafana as grafana_module  # noqa: E402
+from RW.Grafana import Grafana, _mask_line, _parse_curl_config, _TopTemplates  # noqa: E402
+
+PROM_RESPONSE = {"status": "success", "data": {"resultType": "matrix", "result": [
+    {"metric": {"job": "api"}, "values": [[1714557600, "1"], [1714557630, "2"]]},
+]}}
+HEADERS_FILE = 'header = "Authorization: Bearer test-token"\nheader = "X-Grafana-Org-Id: 7"\n'
+# Quotes, braces and shell metacharacters that must reach the server unchanged
+QUERY = 'sum(rate(http_requests_total{job="api", path=~"/v1/.*"}[5m])) by (status) $HOME `id`'
+
+
+class _StandIn(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    requests = []
+    client_ports = []
+    status = 200
+    payload = PROM_RESPONSE
+
+    def _record(self, body):
+        url = urlsplit(self.path)
+        _StandIn.client_ports.append(self.client_address[1])
+        _StandIn.requests.append({
+            "method": self.command,
+            "path": url.path,
+            "params": parse_qs(url.query),
+            "authorization": self.headers.get("Authorization"),
+            "org": self.headers.get("X-Grafana-Org-Id"),
+            "datasource_uid": self.headers.get("X-Datasource-Uid"),
+            "body": json.loads(body) if body else None,
+        })
+        encoded = json.dumps(_StandIn.payload).encode()
+        self.send_response(_StandIn.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def do_GET(self):
+        self._record(None)
+
+    def do_POST(self):
+        self._record(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def grafana_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StandIn)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    _StandIn.requests = []
+    _StandIn.client_ports = []
+    _StandIn.status = 200
+    _StandIn.payload = PROM_RESPONSE
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+class _LokiStandIn(BaseHTTPRequestHandler):
+    """Serves query_range over LOKI_ENTRIES the way Loki does: start inclusive, end exclusive, newest first."""
+    protocol_version = "HTTP/1.1"
+    pages = 0
+
+    def do_GET(self):
+        params = {key: values[0] for key, values in parse_qs(urlsplit(self.path).query).items()}
+        start, end, limit = int(params["start"]), int(params["end"]), int(params["limit"])
+        assert params["direction"] == "backward"
+        matching = sorted((e for e in LOKI_ENTRIES if start <= e[0] < end), key=lambda e: e[0], reverse=True)[:limit]
+        streams = {}
+        for ts, app, line in matching:
+            streams.setdefault(app, []).append([str(ts), line])
+        encoded = json.dumps({"status": "success", "data": {"resultType": "streams", "result": [
+            {"stream": {"app": app}, "values": values} for app, values in streams.items()
+        ]}}).encode()
+        _LokiStandIn.pages += 1
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(encoded)))
+        self.end_headers()
+        self.wfile.write(encoded)
+
+    def log_message(self, *args):
+        pass
+
+
+# Two streams over [1000, 2000), with runs of lines sharing a timestamp so page boundaries split them
+LOKI_ENTRIES = [(1000 + i // 3, "api" if i % 2 else "worker", f"line {i}") for i in range(2400) if i % 7]
+
+
+@pytest.fixture
+def loki_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _LokiStandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    _LokiStandIn.pages = 0
+    yield f"http://127.0.0.1:{server.server_address[1]}"
+    server.shutdown()
+
+
+@pytest.fixture
+def headers_file(tmp_path):
+    path = tmp_path / "HEADERS"
+    path.write_text(HEADERS_FILE)
+    return path
+
+
+def _curl(command, cwd):
+    if shutil.which("curl") is None:
+        pytest.skip("curl is not installed")
+    result = subprocess.run(["bash", "-c", command], cwd=cwd, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout)
+
+
+def test_proxy_get_matches_curl_path(grafana_url, headers_file):
+    b64_query = base64.b64encode(QUERY.encode()).decode()
+    curl_output = _curl(
+        f'echo {b64_query} | base64 -d | curl -G "{grafana_url}/api/datasources/proxy/uid/prom/api/v1/query_range"'
+        ' --data-urlencode "query@-" --data-urlencode "start=1714557600"'
+        ' --data-urlencode "end=1714561200" --data-urlencode "step=30s" -K ./HEADERS',
+        headers_file.parent,
+    )
+    library_output = Grafana().datasource_proxy_get(
+        grafana_url, "uid/prom", "api/v1/query_range",
+        {"query": QUERY, "start": "1714557600", "end": "1714561200", "step": "30s"},
+        headers=str(headers_file),
+    )
+    via_curl, via_library = _StandIn.requests
+    assert library_output == curl_output == PROM_RESPONSE
+    assert via_library == via_curl
+    assert via_library["params"]["query"] == [QUERY] and via_library["authorization"] == "Bearer test-token"
+
+
+def test_ds_query_matches_curl_path(grafana_url, headers_file):
+    body = json.dumps({"queries": [{"refId": "A", "expr": QUERY, "queryType": "range", "maxLines": 100,
+                                    "datasource": {"type": "loki", "uid": "logs"}}], "from": "1", "to": "2"})
+    b64_body = base64.b64encode(body.encode()).decode()
+    curl_output = _curl(
+        f'echo {b64_body} | base64 -d | curl -sS -X POST "{grafana_url}/api/ds/query?ds_type=loki"'
+        ' -H "Content-Type: application/json" -H "Accept: application/json" -H "X-Datasource-Uid: logs"'
+        ' -H "X-Plugin-Id: loki" --data-binary @- -K ./HEADERS',
+        headers_file.parent,
+    )
+    library_output = Grafana().datasource_query(grafana_url, body, "loki", "logs", headers=HEADERS_FILE)
+    via_curl, via_library = _StandIn.requests
+    assert library_output == curl_output
+    assert via_library == via_curl and via_library["body"]["queries"][0]["expr"] == QUERY
+
+
+def test_http_errors_are_raised_with_the_response_body(grafana_url):
+    _StandIn.status = 401
+    _StandIn.payload = {"message": "invalid API key"}
+    with pytest.raises(Exception, match="HTTP 401.*invalid API key"):
+        Grafana().datasource_proxy_get(grafana_url, "42", "api/v1/query", {"query": "up"})
+
+
+def test_session_reuses_one_connection(grafana_url):
+    library = Grafana()
+    for _ in range(3):
+        library.datasource_proxy_get(grafana_url, "42", "api/v1/query", {"query": "up"})
+    assert len(_StandIn.client_ports) == 3 and len(set(_StandIn.client_ports)) == 1
+
+
+def test_loki_paged_reads_every_line_once_in_time_order(loki_url, tmp_path):
+    output = tmp_path / "loki.jsonl"
+    result = Grafana().loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(output), page_limit=50, shards=3, max_workers=2
+    )
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert result["lines"] == len(rows) == len(LOKI_ENTRIES) and not result["truncated"]
+    assert result["bytes"] == output.stat().st_size and result["pages"] == _LokiStandIn.pages
+    assert sorted((r["ts"], r["line"]) for r in rows) == sorted((str(ts), line) for ts, _, line in LOKI_ENTRIES)
+    assert [int(r["ts"]) for r in rows] == sorted(int(r["ts"]) for r in rows)
+    assert rows[0]["labels"] in ({"app": "api"}, {"app": "worker"})
+
+
+def test_loki_paged_stops_at_the_line_budget(loki_url, tmp_path):
+    output = tmp_path / "loki.jsonl"
+    result = Grafana().loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(output), page_limit=100, shards=4, max_workers=1,
+        max_lines=250,
+    )
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert result["truncated"] and result["lines"] == len(rows) == 250
+    # With one worker the newest slice is read first, so the budget holds the most recent lines
+    newest = sorted((ts for ts, _, _ in LOKI_ENTRIES), reverse=True)[:250]
+    assert sorted((int(r["ts"]) for r in rows), reverse=True) == newest
+
+
+def test_loki_paged_reads_more_lines_at_one_timestamp_than_a_page_holds(loki_url, tmp_path, monkeypatch):
+    burst = [(1500, "api", f"burst {i}") for i in range(130)]
+    entries = [(1000 + i, "worker", f"line {i}") for i in range(50, 1000, 100)] + burst
+    monkeypatch.setattr(sys.modules[__name__], "LOKI_ENTRIES", entries)
+    output = tmp_path / "loki.jsonl"
+    result = Grafana().loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(output), page_limit=50, shards=1
+    )
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert sorted(r["line"] for r in rows) == sorted(line for _, _, line in entries)
+    assert not result["truncated"]
+    # Past Loki's per-query limit the rest of the burst is skipped, and the result says so
+    monkeypatch.setattr(grafana_module, "LOKI_MAX_ENTRIES_PER_QUERY", 100)
+    result = Grafana().loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(output), page_limit=50, shards=1
+    )
+    assert result["truncated"] and result["lines"] == 100 + 10
+
+
+def test_loki_paged_writes_each_slice_out_before_the_next_one_is_read(loki_url, tmp_path, monkeypatch):
+    output = tmp_path / "loki.jsonl"
+    library = Grafana()
+    fetch = library._fetch_loki_shard
+    parts_seen = []
+
+    def fetch_after_earlier_slices_were_written(*args):
+        parts_seen.append(sorted(path.name for path in tmp_path.glob("*.part")))
+        return fetch(*args)
+
+    monkeypatch.setattr(library, "_fetch_loki_shard", fetch_after_earlier_slices_were_written)
+    result = library.loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(output), page_limit=50, shards=3, max_workers=1
+    )
+    # With one worker the slices are read newest first, each one already on disk when the next starts
+    assert parts_seen == [[], ["loki.jsonl.2.part"], ["loki.jsonl.1.part", "loki.jsonl.2.part"]]
+    assert result["lines"] == len(output.read_text().splitlines()) == len(LOKI_ENTRIES)
+    assert not list(tmp_path.glob("*.part"))
+
+
+MATRIX = {"status": "success", "data": {"resultType": "matrix", "result": [
+    {"metric": {"status": "200"}, "values": [[1, "1"], [2, "4"], [3, "NaN"], [4, "7"]]},
+    {"metric": {"status": "500"}, "values": [[1, "2"], [2, "10"]]},
+]}}
+DS_QUERY_FRAMES = {"results": {"A": {"status": 200, "frames": [
+    {"schema": {"fields": [{"name": "Time", "type": "time"}, {"name": "Value", "type": "number"}]},
+     "data": {"values": [[1000, 2000, 4000], [1, 4, 7]]}},
+    {"schema": {"fields": [{"name": "Time", "type": "time"}, {"name": "Value", "type": "number"}]},
+     "data": {"values": [[1000, 2000], [2, None]]}},
+]}}}
+
+
+@pytest.mark.parametrize("reducer,expected", [
+    ("last", 17.0), ("max", 10.0), ("min", 1.0), ("sum", 24.0), ("avg", 4.8), ("count", 2.0), ("percentile", 9.4),
+])
+def test_reducers_over_a_matrix(reducer, expected):
+    assert Grafana().reduce_query_result(MATRIX, reducer) == pytest.approx(expected)
+
+
+def test_reducers_over_other_response_shapes():
+    library = Grafana()
+    assert library.reduce_query_result(DS_QUERY_FRAMES, "last") == 9.0
+    assert library.reduce_query_result(DS_QUERY_FRAMES, "max") == 7.0
+    vector = {"data": {"resultType": "vector", "result": [{"metric": {}, "value": [1, "3"]}, {"metric": {}, "value": [1, "5"]}]}}
+    assert library.reduce_query_result(json.dumps(vector), "avg") == 4.0
+    assert library.reduce_query_result({"data": {"resultType": "scalar", "result": [1, "2.5"]}}, "max") == 2.5
+    assert library.reduce_query_result(MATRIX, "percentile", percentile=50) == 4.0
+
+
+def test_reducer_without_samples():
+    empty = {"data": {"resultType": "matrix", "result": []}}
+    assert Grafana().reduce_query_result(empty, "count") == 0.0
+    assert Grafana().reduce_query_result(empty, "max", default=0) == 0.0
+    with pytest.raises(Exception, match="no samples"):
+        Grafana().reduce_query_result(empty, "max")
+    with pytest.raises(Exception, match="Unknown reducer"):
+        Grafana().reduce_query_result(MATRIX, "median")
+    with pytest.raises(Exception, match="'streams'"):
+        Grafana().reduce_query_result({"data": {"resultType": "streams", "result": []}}, "max")
+
+
+def test_mask_line_templates_variable_tokens():
+    assert _mask_line("GET /users/1234 took 35.2ms from 10.0.0.12:5432 at 12:30:45") == (
+        "GET /users/<NUM> took <NUM>ms from <IP> at <NUM>:<NUM>:<NUM>"
+    )
+    assert _mask_line("req 3f2b8c1e-1a2b-4c3d-8e9f-0123456789ab trace=deadbeefcafe0123 peer fe80::1") == (
+        "req <UUID> trace=<HEX> peer <IP>"
+    )
+
+
+def test_cluster_loki_log_lines_groups_error_lines_by_template(tmp_path):
+    values = [[str(i), f"ERROR timeout calling db-{i % 3} after {i}ms"] for i in range(40)]
+    values += [[str(i), f"failed to parse request {i}"] for i in range(10)]
+    values += [[str(i), f"GET /healthz 200 in {i}ms"] for i in range(100)]
+    response = {"data": {"resultType": "streams", "result": [
+        {"stream": {"app": "api"}, "values": values},
+        {"stream": {"app": "worker", "level": "error"}, "values": [["1", "lost lease on shard 7"]]},
+    ]}}
+    result = Grafana().cluster_loki_log_lines(response, top_k=2, max_examples=2)
+    assert result["lines"] == 151 and result["matched"] == 51
+    first, second = result["clusters"]
+    assert first["template"] == "ERROR timeout calling db-<NUM> after <NUM>ms" and first["count"] == 40
+    assert first["examples"] == ["ERROR timeout calling db-0 after 0ms", "ERROR timeout calling db-1 after 1ms"]
+    assert second["template"] == "failed to parse request <NUM>" and second["count"] == 10
+
+    # The NDJSON written by Loki Query Range Paged gives the same clusters; an empty pattern keeps every line
+    path = tmp_path / "loki.jsonl"
+    path.write_text("".join(json.dumps({"ts": ts, "labels": {"app": "api"}, "line": line}) + "\n" for ts, line in values))
+    everything = Grafana().cluster_loki_log_lines(str(path), top_k=1, error_pattern="")
+    assert everything["matched"] == 150
+    assert everything["clusters"][0]["template"] == "GET /healthz <NUM> in <NUM>ms"
+    assert everything["clusters"][0]["count"] == 100
+
+
+def test_cluster_memory_stays_bounded_with_many_templates():
+    # Every line is a distinct template except one frequent error spread through the stream
+    values = []
+    for i in range(20000):
+        values.append([str(i), "error: " + " ".join(chr(97 + (i >> b) % 26) for b in range(0, 20, 4))])
+        if i % 20 == 0:
+            values.append([str(i), f"error: connection reset by peer 10.1.{i % 250}.3"])
+    response = {"data": {"resultType": "streams", "result": [{"stream": {}, "values": values}]}}
+    library = Grafana()
+    result = library.cluster_loki_log_lines(response, top_k=3, capacity=50)
+    top = result["clusters"][0]
+    assert top["template"] == "error: connection reset by peer <IP>"
+    assert 1000 <= top["count"] <= 1000 + result["matched"] // 100
+    assert len(result["clusters"]) == 3
+
+    top_templates = _TopTemplates(capacity=50, max_examples=3)
+    for _, line in values:
+        top_templates.add(_mask_line(line), line, {})
+        assert len(top_templates.entries) <= 50
+
+
+def _rising_templates(capacity, n_lines):
+    # Each block of templates repeats once more than the last, so every template of a new block evicts one
+    lines, block = [], 0
+    while len(lines) < n_lines:
+        for j in range(capacity):
+            lines.extend([f"block {block} template {j}"] * (block + 2))
+        block += 1
+    return lines[:n_lines]
+
+
+def _top_templates_seconds(capacity):
+    lines = _rising_templates(capacity, 40_000)
+    timings = []
+    for _ in range(3):
+        top_templates = _TopTemplates(capacity=capacity, max_examples=1)
+        started = time.perf_counter()
+        for template in lines:
+            top_templates.add(template, template, {})
+        timings.append(time.perf_counter() - started)
+        assert len(top_templates.entries) == capacity
+        assert not [t for t in top_templates.entries if t.startswith("block 0 ")]
+    return min(timings)
+
+
+def test_top_templates_eviction_does_not_scan_the_table():
+    # 16x the capacity must cost about the same per line; a scan per eviction would cost ~16x
+    small, large = _top_templates_seconds(100), _top_templates_seconds(1600)
+    assert large < 4 * small + 0.05, (small, large)
+
+
+def test_curl_config_forms():
+    options, unsupported = _parse_curl_config(
+        '# comment\nheader = "A: 1"\n-H "B: 2"\n--header: "C: x: y"\nheader="D: 4"\nuser = "me:pw"\n'
+        'cacert = "/etc/ca.pem"\nproxy = "http://proxy:3128"\n'
+    )
+    assert options == {
+        "headers": {"A": "1", "B": "2", "C": "x: y", "D": "4"}, "auth": ("me", "pw"), "verify": "/etc/ca.pem",
+        "proxies": {"http": "http://proxy:3128", "https": "http://proxy:3128"},
+    }
+    assert unsupported == []
+    options, unsupported = _parse_curl_config('cacert = "/etc/ca.pem"\ninsecure\nresolve = "grafana:443:10.0.0.1"\n')
+    assert options["verify"] is False and unsupported == ["resolve"]
+
+
+def test_unsupported_curl_options_send_the_request_with_curl(grafana_url, headers_file):
+    if shutil.which("curl") is None:
+        pytest.skip("curl is not installed")
+    headers_file.write_text(HEADERS_FILE + "retry = 2\ncompressed\n")
+    library = Grafana()
+    output = library.datasource_proxy_get(
+        grafana_url, "uid/prom", "api/v1/query", {"query": QUERY}, headers=str(headers_file)
+    )
+    assert output == PROM_RESPONSE
+    body = {"queries": [{"refId": "A", "expr": QUERY}], "from": "1", "to": "2"}
+    assert library.datasource_query(grafana_url, body, "loki", "logs", headers=str(headers_file)) == PROM_RESPONSE
+    via_get, via_post = _StandIn.requests
+    assert via_get["params"]["query"] == [QUERY] and via_get["authorization"] == "Bearer test-token"
+    assert via_post["body"] == body and via_post["datasource_uid"] == "logs" and via_post["org"] == "7"
+    # No pooled connection was used, and the session path is unchanged for supported configs
+    assert not library.session.adapters["http://"].poolmanager.pools.keys()
+    _StandIn.status = 401
+    with pytest.raises(Exception, match="HTTP 401"):
+        library.datasource_proxy_get(grafana_url, "42", "api/v1/query", {"query": "up"}, headers=str(headers_file))
+
+
+def test_headers_are_parsed_once_per_paged_read(loki_url, tmp_path, monkeypatch):
+    calls = []
+    parse = grafana_module._parse_curl_config
+    monkeypatch.setattr(grafana_module, "_parse_curl_config", lambda text: calls.append(text) or parse(text))
+    Grafana().loki_query_range_paged(
+        loki_url, "uid/logs", '{app=~".+"}', 1000, 2000, str(tmp_path / "loki.jsonl"), page_limit=50, shards=3,
+        headers=HEADERS_FILE,
+    )
+    assert _LokiStandIn.pages > 3 and len(calls) == 1
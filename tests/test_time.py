@@ -0,0 +1,91 @@
+"""Unit tests for the batch keywords of RW.Utils.Time.
+
+Run:  python3 -m pytest tests/test_time.py
+"""
+
+import os
+import sys
+
+import pytest
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(REPO_ROOT, "libraries"))
+
+import RW.Utils.Time as time_module  # noqa: E402
+from RW.Utils.Time import Time  # noqa: E402
+
+NOW_NS = 1_700_000_000_123_456_789
+
+
+@pytest.fixture
+def frozen_clock(monkeypatch):
+    calls = []
+
+    def time_ns():
+        calls.append(1)
+        return NOW_NS
+
+    monkeypatch.setattr(time_module.time, "time_ns", time_ns)
+    return calls
+
+
+def test_times_share_one_clock_snapshot(frozen_clock):
+    start, end = Time().convert_times_to_epoch("2h,", unit="ns")
+    assert end == NOW_NS and start == NOW_NS - 2 * 3600 * 10**9
+    assert len(frozen_clock) == 1
+
+
+def test_times_keep_sub_second_precision_and_compound_durations(frozen_clock):
+    assert Time().convert_times_to_epoch(["1h30m", "500ms", None], unit="ms") == [
+        (NOW_NS - 5400 * 10**9) // 10**6,
+        (NOW_NS - 500 * 10**6) // 10**6,
+        NOW_NS // 10**6,
+    ]
+
+
+def test_times_parse_rfc3339_and_pass_through_the_rest(frozen_clock):
+    converted = Time().convert_times_to_epoch(
+        "2024-05-01T10:00:00.25Z,2024-05-01T12:00:00+02:00,2024-05-01,1714557600,yesterday", unit="ms"
+    )
+    assert converted == [1714557600250, 1714557600000, 1714521600000, 1714557600, "yesterday"]
+
+
+def test_durations_convert_to_any_unit():
+    assert Time().convert_durations("1m30s,500ms,1w,,15x", unit="s") == [90, 0.5, 604800, 0, "15x"]
+    assert Time().convert_durations(["1h", "1.5m"], unit="ms") == [3_600_000, 90_000]
+
+
+def test_unknown_unit_is_rejected():
+    with pytest.raises(ValueError):
+        Time().convert_times_to_epoch("1h", unit="h")
+
+
+# ---------- plan_range_query ----------
+def test_plan_picks_step_within_point_budget(frozen_clock):
+    plan = Time().plan_range_query("7d", "", max_points=1000, scrape_interval="15s")
+    assert (plan["step"], plan["step_seconds"]) == ("15m", 900)
+    assert plan["points"] <= 1000
+    assert plan["start"] % 900 == 0 and plan["end"] % 900 == 0
+    # The end is rounded up, so the newest samples stay in range
+    assert plan["end"] - 900 < NOW_NS // 10**9 <= plan["end"]
+
+
+def test_plan_never_goes_below_scrape_interval(frozen_clock):
+    plan = Time().plan_range_query("10m", "", max_points=1000, scrape_interval="30s", unit="ms")
+    assert plan["step_ms"] == 30_000 and plan["start"] % 30_000 == 0
+
+
+def test_plan_honours_a_pinned_step_and_absolute_times():
+    plan = Time().plan_range_query("1714557601", "1714561200", step="1m30s")
+    assert (plan["step"], plan["start"], plan["end"]) == ("90s", 1714557600, 1714561200)
+    assert plan["points"] == 41
+
+
+def test_plan_rounds_the_end_up_to_keep_the_newest_sample():
+    plan = Time().plan_range_query("1714557600", "1714561201", step="1m")
+    assert (plan["start"], plan["end"], plan["points"]) == (1714557600, 1714561260, 62)
+
+
+def test_plan_rejects_an_empty_range():
+    with pytest.raises(ValueError):
+        Time().plan_range_query("1714561200", "1714557600")